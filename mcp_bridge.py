@@ -48,17 +48,14 @@ def send_to_freecad(tool: str, arguments: dict = None) -> dict:
         request = {"tool": tool, "arguments": arguments or {}}
         sock.sendall((json.dumps(request) + "\n").encode('utf-8'))
         
-        response = b""
-        while True:
-            chunk = sock.recv(4096)
-            if not chunk:
-                break
-            response += chunk
-            if b"\n" in response:
-                break
+        # Buffered line read: responses carry base64 screenshots, and growing
+        # a bytes object chunk by chunk (rescanning it for the newline each
+        # time) is quadratic in the response size
+        with sock.makefile('rb') as stream:
+            response = stream.readline()
         
         sock.close()
-        return json.loads(response.decode('utf-8').strip())
+        return json.loads(response)
     except ConnectionRefusedError:
         return {"success": False, "error": "FreeCAD server not running. Start it with: from freecad_mcp import start_server; start_server()"}
     except Exception as e:
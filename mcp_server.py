@@ -9,16 +9,65 @@ Includes automatic screenshot capture after every tool call for visual feedback.
 import asyncio
 import threading
 import json
-import socket
 import base64
 import tempfile
 import os
+import math
+import string
+import functools
+import itertools
+import collections
+import array
 from typing import Optional, Tuple, List
 
 import FreeCAD
 
 from .bridge import get_bridge, reset_bridge, MainThreadBridge
 
+# pybase64 provides SIMD encoders; fall back to the standard library
+try:
+    import pybase64 as _base64_impl
+except ImportError:
+    _base64_impl = base64
+
+# orjson encodes large responses (base64 screenshots, point lists) several
+# times faster; fall back to the standard library
+try:
+    import orjson
+    
+    _ORJSON_OPTIONS = orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    
+    def encode_json_line(obj) -> bytes:
+        """Serialize a response as one newline-terminated UTF-8 JSON line."""
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    
+    decode_json = orjson.loads
+except ImportError:
+    def encode_json_line(obj) -> bytes:
+        """Serialize a response as one newline-terminated UTF-8 JSON line."""
+        return (json.dumps(obj) + "\n").encode('utf-8')
+    
+    decode_json = json.loads
+
+# Geometry modules are needed by most tools; import them once at load
+try:
+    import Part
+    import Mesh
+except ImportError:
+    Part = Mesh = None
+
+try:
+    import MeshPart
+except ImportError:
+    MeshPart = None
+
+# GUI modules only exist in a GUI session; bind them once at load
+if getattr(FreeCAD, "GuiUp", False):
+    import FreeCADGui
+    from PySide2 import QtWidgets
+else:
+    FreeCADGui = QtWidgets = None
+
 
 # Global instances
 _server: Optional['SimpleMCPServer'] = None
@@ -32,6 +81,33 @@ _auto_screenshot_enabled = True
 _screenshot_width = 800
 _screenshot_height = 600
 
+# FreeCAD sets GuiUp once at startup; headless sessions skip all capture work
+_HAS_GUI: bool = bool(getattr(FreeCAD, "GuiUp", False))
+
+# Result key set by measurement tools that want a grid screenshot on their
+# own response; execute_tool (or execute_batch, once per batch) pops it
+GRID_CAPTURE_KEY = "_grid_capture"
+
+# Set when the scene or active view may have changed since the last Qt event pump
+_view_dirty: bool = True
+
+# Bumped by every mutating tool call; part of the auto-screenshot reuse key
+_scene_generation = 0
+
+# Last auto-screenshot as (view state key, base64 PNG), reused while the key holds
+_last_auto_screenshot: Optional[Tuple[tuple, str]] = None
+
+# Result key for a file write a handler leaves to execute_tool; the callable
+# must not touch documents or the GUI, since it runs off the main thread
+DEFERRED_IO_KEY = "_deferred_io"
+
+# Screenshots are transient and base64-inflated anyway, so favour fast
+# encoding over the last few percent of PNG size
+_PNG_SAVE_KW = {"format": "PNG", "compress_level": 1, "optimize": False}
+
+# Write transient screenshots to RAM-backed storage when the platform has it
+_screenshot_dir: Optional[str] = "/dev/shm" if os.access("/dev/shm", os.W_OK) else None
+
 # Dual document state for split-screen view
 _target_doc_name: Optional[str] = None
 _work_doc_name: Optional[str] = None
@@ -43,26 +119,103 @@ _grid_config = {
     "enabled": False,
     "columns": 8,
     "rows": 6,
-    # Zoom region (normalized 0-1 screen coordinates)
-    "region": {"x_min": 0.0, "x_max": 1.0, "y_min": 0.0, "y_max": 1.0}
 }
 
-# Point selection state
+# Grid zoom region (normalized 0-1 screen coordinates), indexed by the
+# REGION_* constants
+REGION_X_MIN, REGION_X_MAX, REGION_Y_MIN, REGION_Y_MAX = range(4)
+_FULL_GRID_REGION = array.array('d', (0.0, 1.0, 0.0, 1.0))
+_grid_region = array.array('d', _FULL_GRID_REGION)
+
+
+def grid_region_dict() -> dict:
+    """Return the current grid zoom region as a JSON-ready dict."""
+    return {
+        "x_min": _grid_region[REGION_X_MIN],
+        "x_max": _grid_region[REGION_X_MAX],
+        "y_min": _grid_region[REGION_Y_MIN],
+        "y_max": _grid_region[REGION_Y_MAX]
+    }
+
+
+class PointInfo:
+    """
+    A selected measurement point: its 3D coordinates, marker object and grid cell.
+    
+    ``xyz`` mirrors ``coords`` as a float64 (3,) array so point math and
+    formatting stay in NumPy; ``coords`` is kept for FreeCAD API calls.
+    """
+    __slots__ = ("coords", "xyz", "marker", "grid_cell")
+    
+    def __init__(self, coords, marker=None, grid_cell=None):
+        import numpy as np
+        
+        self.coords = coords
+        self.xyz = None if coords is None else np.array((coords.x, coords.y, coords.z), dtype=np.float64)
+        self.marker = marker
+        self.grid_cell = grid_cell
+
+
+# Point selection state (point_id -> PointInfo)
 _pending_points = {}    # Points selected but not yet confirmed
 _confirmed_points = {}  # Points locked in after confirmation
+_confirmed_index = None  # (point id tuple, nearest-point index) built on demand
 _point_counter = 0      # For generating point_1, point_2, etc.
 
 # Measurement visualization
 _measurement_objects = []  # Track measurement lines for cleanup
 
+# Scene bounding box cache: doc name -> (scene version token, bbox dict)
+_bbox_cache = {}
+
+# Doc names whose cached bbox was validated during the current dispatch; reused
+# without rebuilding the token until the dispatch ends or the observer sees a
+# document change
+_bbox_validated = set()
+
+
+class SceneChangeObserver:
+    """FreeCAD document observer that drops the per-dispatch bbox memo on any edit."""
+    
+    def slotCreatedDocument(self, doc):
+        _bbox_validated.clear()
+    
+    def slotDeletedDocument(self, doc):
+        _bbox_validated.clear()
+    
+    def slotCreatedObject(self, obj):
+        _bbox_validated.clear()
+    
+    def slotDeletedObject(self, obj):
+        _bbox_validated.clear()
+    
+    def slotChangedObject(self, obj, prop):
+        _bbox_validated.clear()
+
+
+# Registered while the server runs; the memo is only used when it is set
+_scene_observer: Optional[SceneChangeObserver] = None
+
+# Shape-object index: doc name -> ((name, type) key, positions of objects with a Shape)
+_shape_index = {}
+
+# Meshes built by export_stl, least recently used first:
+# (doc name, object names, tessellation) -> (exported shapes, Mesh.Mesh)
+_export_mesh_cache = collections.OrderedDict()
+EXPORT_MESH_CACHE_SIZE = 8
+
+# Fallback Coin clip plane nodes inserted by set_clipping_plane: doc name -> SoClipPlane
+_fallback_clip_planes = {}
+
 # High-contrast marker colors (cycle through these)
-_marker_colors = [
+_marker_colors = (
     (1.0, 0.0, 1.0),   # Magenta
     (0.0, 1.0, 1.0),   # Cyan
     (1.0, 1.0, 0.0),   # Yellow
     (0.0, 1.0, 0.0),   # Green
     (1.0, 0.5, 0.0),   # Orange
-]
+)
+_MARKER_COLOR_COUNT = len(_marker_colors)
 
 
 def is_dual_mode() -> bool:
@@ -87,18 +240,68 @@ def get_work_doc():
 def activate_document(doc_name: str) -> bool:
     """Activate a document by name, returns True if successful."""
     try:
-        import FreeCADGui
-        doc = FreeCAD.getDocument(doc_name)
-        if doc:
+        # Already-active documents (the common case) need no lookup or switch
+        active = FreeCAD.ActiveDocument
+        if active is None or active.Name != doc_name:
+            if not FreeCAD.getDocument(doc_name):
+                return False
             FreeCAD.setActiveDocument(doc_name)
-            if FreeCADGui.ActiveDocument is None or FreeCADGui.ActiveDocument.Document.Name != doc_name:
-                FreeCADGui.setActiveDocument(doc_name)
+        if FreeCADGui is None:
             return True
+        gui_active = FreeCADGui.ActiveDocument
+        if gui_active is None or gui_active.Document.Name != doc_name:
+            FreeCADGui.setActiveDocument(doc_name)
+            mark_view_dirty()
+        return True
     except Exception as e:
         FreeCAD.Console.PrintWarning(f"Failed to activate document {doc_name}: {e}\n")
     return False
 
 
+def resolve_docs_to_update(doc_param: Optional[str]) -> Optional[List[str]]:
+    """
+    Resolve a view tool's doc argument to the document names it applies to.
+    
+    Args:
+        doc_param: "target", "work" or "both" in dual mode; ignored otherwise
+    
+    Returns:
+        List of document names, or None if there is no active document with a view
+    """
+    if is_dual_mode():
+        if doc_param == "target":
+            return [_target_doc_name]
+        if doc_param == "both":
+            return [_target_doc_name, _work_doc_name]
+        return [_work_doc_name]
+    if FreeCADGui is None or FreeCADGui.ActiveDocument is None:
+        return None
+    return [FreeCAD.ActiveDocument.Name]
+
+
+def for_each_active_view(doc_names: List[str], fn) -> List[str]:
+    """
+    Activate each document in turn and apply fn to its active view.
+    
+    Args:
+        doc_names: Documents to visit
+        fn: Callable taking the view; returning False marks the document as not updated
+    
+    Returns:
+        Names of the documents that were updated
+    """
+    updated_docs = []
+    for doc_name in doc_names:
+        if not activate_document(doc_name):
+            continue
+        # activate_document made this the active GUI document
+        gui_doc = FreeCADGui.ActiveDocument
+        view = gui_doc.ActiveView if gui_doc else None
+        if view and fn(view) is not False:
+            updated_docs.append(doc_name)
+    return updated_docs
+
+
 def reset_dual_mode():
     """Reset dual document mode state."""
     global _target_doc_name, _work_doc_name, _dual_mode_enabled
@@ -109,77 +312,155 @@ def reset_dual_mode():
 
 def has_gui() -> bool:
     """Check if FreeCAD GUI is available."""
+    if FreeCADGui is None:
+        return False
     try:
-        import FreeCADGui
         return FreeCADGui.ActiveDocument is not None or FreeCAD.ActiveDocument is not None
-    except (ImportError, AttributeError):
+    except AttributeError:
         return False
 
 
-def capture_viewport_base64(width: int = None, height: int = None, background: str = "White") -> Optional[str]:
+def marker_color(index: int) -> Tuple[float, float, float]:
+    """Get the marker color for the given 1-based point number."""
+    return _marker_colors[(index - 1) % _MARKER_COLOR_COUNT]
+
+
+def mark_view_dirty():
+    """Flag that the next capture must pump Qt events before rendering."""
+    global _view_dirty
+    _view_dirty = True
+
+
+def flush_view_updates():
+    """Pump the Qt event queue once, only if the view may be stale."""
+    global _view_dirty
+    if not _view_dirty:
+        return
+    QtWidgets.QApplication.processEvents()
+    _view_dirty = False
+
+
+def sync_ui(arguments: dict):
     """
-    Capture current viewport as base64-encoded PNG.
+    Pump Qt events right away if the tool caller asked for it (sync_ui=true).
+    
+    Otherwise the view is left marked dirty and the next capture flushes it.
+    """
+    if arguments.get("sync_ui", False) and QtWidgets is not None:
+        QtWidgets.QApplication.processEvents()
+
+
+def png_to_base64(image_data) -> str:
+    """Encode PNG bytes (or any buffer) as a base64 string for JSON transport."""
+    return _base64_impl.b64encode(image_data).decode('ascii')
+
+
+def grab_view_png(view, width: int, height: int) -> Optional[bytes]:
+    """
+    Render a view to PNG and return the raw image bytes.
+    
+    FreeCAD's saveImage only writes to a path, so the image goes through a
+    short-lived file in RAM-backed storage where available.
+    
+    Args:
+        view: FreeCAD 3D view to capture
+        width: Image width in pixels
+        height: Image height in pixels
+    
+    Returns:
+        PNG data as bytes, or None if nothing usable was written
+    """
+    fd, path = tempfile.mkstemp(suffix=".png", dir=_screenshot_dir)
+    
+    try:
+        # Use "Current" to capture exactly what's on screen
+        view.saveImage(path, width, height, "Current")
+        
+        # saveImage rewrites the file in place, so the descriptor from mkstemp
+        # sees the image; unlink now and read through the fd
+        os.unlink(path)
+        path = None
+        
+        # An empty read means nothing was written; a corrupt payload is
+        # caught when the PNG is decoded
+        with os.fdopen(fd, "rb", closefd=False) as f:
+            raw = f.read()
+        if not raw:
+            return None
+        return raw
+    finally:
+        os.close(fd)
+        if path is not None:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def capture_viewport_png(width: int = None, height: int = None) -> Optional[bytes]:
+    """
+    Capture current viewport as raw PNG bytes.
     
     Args:
         width: Image width in pixels (default: 800)
         height: Image height in pixels (default: 600)
-        background: Background color ("White", "Black", "Transparent")
     
     Returns:
-        Base64-encoded PNG string, or None if capture fails
+        PNG data as bytes, or None if capture fails
     """
+    if not _HAS_GUI:
+        return None
     if width is None:
         width = _screenshot_width
     if height is None:
         height = _screenshot_height
     
     try:
-        import FreeCADGui
-        from PySide2 import QtCore, QtWidgets
-        
         # Ensure there's an active view
-        if FreeCADGui.ActiveDocument is None:
+        gui_doc = FreeCADGui.ActiveDocument
+        if gui_doc is None:
             FreeCAD.Console.PrintWarning("Screenshot: No active GUI document\n")
             return None
         
-        view = FreeCADGui.ActiveDocument.ActiveView
+        view = gui_doc.ActiveView
         if view is None:
             FreeCAD.Console.PrintWarning("Screenshot: No active view\n")
             return None
         
         # Force GUI update before capturing (do not change camera/zoom)
-        QtWidgets.QApplication.processEvents()
-        
-        # Create temp file for screenshot
-        fd, path = tempfile.mkstemp(suffix=".png")
-        os.close(fd)
+        flush_view_updates()
         
-        try:
-            # Save screenshot to file
-            # Use "Current" to capture exactly what's on screen
-            view.saveImage(path, width, height, "Current")
-            
-            # Verify file was created and has content
-            if os.path.exists(path) and os.path.getsize(path) > 100:
-                with open(path, "rb") as f:
-                    image_data = f.read()
-                return base64.b64encode(image_data).decode('utf-8')
-            else:
-                FreeCAD.Console.PrintWarning(f"Screenshot: File empty or not created\n")
-                return None
-        finally:
-            # Clean up temp file
-            if os.path.exists(path):
-                os.remove(path)
+        image_data = grab_view_png(view, width, height)
+        if image_data is None:
+            FreeCAD.Console.PrintWarning(f"Screenshot: File empty or not created\n")
+        return image_data
                 
     except Exception as e:
         FreeCAD.Console.PrintWarning(f"Screenshot capture failed: {e}\n")
         return None
 
 
-def capture_document_viewport(doc_name: str, width: int = None, height: int = None) -> Optional[str]:
+def capture_viewport_base64(width: int = None, height: int = None, background: str = "White") -> Optional[str]:
     """
-    Capture viewport of a specific document as base64-encoded PNG.
+    Capture current viewport as base64-encoded PNG.
+    
+    Args:
+        width: Image width in pixels (default: 800)
+        height: Image height in pixels (default: 600)
+        background: Background color ("White", "Black", "Transparent")
+    
+    Returns:
+        Base64-encoded PNG string, or None if capture fails
+    """
+    image_data = capture_viewport_png(width, height)
+    if image_data is None:
+        return None
+    return png_to_base64(image_data)
+
+
+def capture_document_png(doc_name: str, width: int = None, height: int = None) -> Optional[bytes]:
+    """
+    Capture viewport of a specific document as raw PNG bytes.
     
     Args:
         doc_name: Name of the document to capture
@@ -187,23 +468,23 @@ def capture_document_viewport(doc_name: str, width: int = None, height: int = No
         height: Image height in pixels
     
     Returns:
-        Base64-encoded PNG string, or None if capture fails
+        PNG data as bytes, or None if capture fails
     """
+    if not _HAS_GUI:
+        return None
     if width is None:
         width = _screenshot_width
     if height is None:
         height = _screenshot_height
     
     try:
-        import FreeCADGui
-        from PySide2 import QtWidgets
-        
         # Activate the target document
         if not activate_document(doc_name):
             FreeCAD.Console.PrintWarning(f"Screenshot: Cannot activate document {doc_name}\n")
             return None
         
-        QtWidgets.QApplication.processEvents()
+        # Force GUI update before capturing (do not change camera/zoom)
+        flush_view_updates()
         
         gui_doc = FreeCADGui.getDocument(doc_name)
         if gui_doc is None:
@@ -215,31 +496,191 @@ def capture_document_viewport(doc_name: str, width: int = None, height: int = No
             FreeCAD.Console.PrintWarning(f"Screenshot: No active view for {doc_name}\n")
             return None
         
-        # Force GUI update before capturing (do not change camera/zoom)
-        QtWidgets.QApplication.processEvents()
-        
-        # Create temp file for screenshot
-        fd, path = tempfile.mkstemp(suffix=".png")
-        os.close(fd)
-        
-        try:
-            view.saveImage(path, width, height, "Current")
-            
-            if os.path.exists(path) and os.path.getsize(path) > 100:
-                with open(path, "rb") as f:
-                    image_data = f.read()
-                return base64.b64encode(image_data).decode('utf-8')
-            else:
-                return None
-        finally:
-            if os.path.exists(path):
-                os.remove(path)
+        return grab_view_png(view, width, height)
                 
     except Exception as e:
         FreeCAD.Console.PrintWarning(f"Screenshot capture for {doc_name} failed: {e}\n")
         return None
 
 
+def capture_document_viewport(doc_name: str, width: int = None, height: int = None) -> Optional[str]:
+    """
+    Capture viewport of a specific document as base64-encoded PNG.
+    
+    Args:
+        doc_name: Name of the document to capture
+        width: Image width in pixels
+        height: Image height in pixels
+    
+    Returns:
+        Base64-encoded PNG string, or None if capture fails
+    """
+    image_data = capture_document_png(doc_name, width, height)
+    if image_data is None:
+        return None
+    return png_to_base64(image_data)
+
+
+# Gap in pixels between the two split-view panels
+SPLIT_VIEW_GAP = 4
+
+# Split-view canvases with labels pre-drawn: (width, height, label_height) -> image
+_split_canvas_cache = {}
+
+# Composition runs on worker threads; the cached canvases are shared
+_split_canvas_lock = threading.Lock()
+
+
+def get_split_canvas(width: int, height: int, label_height: int):
+    """
+    Get the reusable split-view canvas for a panel size.
+    
+    The background and the two labels depend only on the sizes, so they are
+    drawn once; each capture then just pastes the panels over the canvas.
+    
+    Args:
+        width: Width of each panel
+        height: Height of each panel
+        label_height: Height of the label bar above the panels
+    
+    Returns:
+        RGB PIL image of size (2 * width + gap, height + label_height)
+    """
+    key = (width, height, label_height)
+    canvas = _split_canvas_cache.get(key)
+    if canvas is not None:
+        return canvas
+    
+    from PIL import Image, ImageDraw
+    
+    gap = SPLIT_VIEW_GAP
+    total_width = width * 2 + gap
+    total_height = height + label_height
+    
+    canvas = Image.new('RGB', (total_width, total_height), color=(40, 40, 40))
+    draw = ImageDraw.Draw(canvas)
+    
+    # Draw labels
+    target_label = "TARGET (Reference)"
+    work_label = "YOUR CREATION"
+    
+    # Target label (left side)
+    try:
+        bbox = draw.textbbox((0, 0), target_label)
+        text_w = bbox[2] - bbox[0]
+        x = (width - text_w) // 2
+    except:
+        x = 10
+    draw.text((x, 5), target_label, fill=(255, 200, 100))
+    
+    # Work label (right side)
+    try:
+        bbox = draw.textbbox((0, 0), work_label)
+        text_w = bbox[2] - bbox[0]
+        x = width + gap + (width - text_w) // 2
+    except:
+        x = width + gap + 10
+    draw.text((x, 5), work_label, fill=(100, 200, 255))
+    
+    _split_canvas_cache[key] = canvas
+    return canvas
+
+
+def grab_split_view_pngs(width: int, height: int) -> Tuple[Optional[bytes], Optional[bytes]]:
+    """
+    Capture the target and work documents as raw PNG bytes (GUI thread only).
+    
+    Args:
+        width: Width of each panel
+        height: Height of each panel
+    
+    Returns:
+        Tuple of (target_png, work_png); either may be None if its capture failed
+    """
+    # Remember current active document
+    original_active = FreeCAD.ActiveDocument.Name if FreeCAD.ActiveDocument else None
+    
+    # Capture target document (raw PNG, only the merged image gets encoded)
+    target_png = capture_document_png(_target_doc_name, width, height)
+    
+    # Capture work document
+    work_png = capture_document_png(_work_doc_name, width, height)
+    
+    # Restore original active document
+    if original_active:
+        activate_document(original_active)
+    
+    return target_png, work_png
+
+
+def compose_split_view(target_png: Optional[bytes], work_png: Optional[bytes],
+                       width: int, height: int, label_height: int = 30) -> Optional[str]:
+    """
+    Merge two captured panels side-by-side with labels.
+    
+    Pure image work with no FreeCAD calls, so it is safe to run off the GUI thread.
+    
+    Args:
+        target_png: PNG bytes of the target document, or None
+        work_png: PNG bytes of the work document, or None
+        width: Width of each panel
+        height: Height of each panel
+        label_height: Height of the label bar at the top of each image
+    
+    Returns:
+        Base64-encoded PNG of the merged image, or None if both captures failed
+    """
+    if not target_png and not work_png:
+        return None
+    
+    from PIL import Image, ImageDraw
+    import io
+    
+    # Create placeholder images if one capture failed
+    def create_placeholder(w, h, text):
+        img = Image.new('RGB', (w, h), color=(200, 200, 200))
+        draw = ImageDraw.Draw(img)
+        try:
+            # Try to center the text
+            bbox = draw.textbbox((0, 0), text)
+            text_w = bbox[2] - bbox[0]
+            text_h = bbox[3] - bbox[1]
+            x = (w - text_w) // 2
+            y = (h - text_h) // 2
+            draw.text((x, y), text, fill=(100, 100, 100))
+        except:
+            draw.text((10, h // 2), text, fill=(100, 100, 100))
+        return img
+    
+    def decode_panel(png, placeholder_text):
+        if not png:
+            return create_placeholder(width, height, placeholder_text)
+        img = Image.open(io.BytesIO(png))
+        # saveImage normally renders at the requested size already
+        if img.size != (width, height):
+            img = img.resize((width, height))
+        img.load()
+        return img
+    
+    target_img = decode_panel(target_png, "Target: No view")
+    work_img = decode_panel(work_png, "Work: No view")
+    
+    buffer = io.BytesIO()
+    with _split_canvas_lock:
+        # Reuse the labelled canvas; pasting the panels overwrites everything else
+        combined = get_split_canvas(width, height, label_height)
+        gap = SPLIT_VIEW_GAP
+        
+        # Paste images
+        combined.paste(target_img, (0, label_height))
+        combined.paste(work_img, (width + gap, label_height))
+        
+        combined.save(buffer, **_PNG_SAVE_KW)
+    
+    # Encode to base64
+    return png_to_base64(buffer.getbuffer())
+
+
 def capture_split_view(width: int = None, height: int = None, label_height: int = 30) -> Optional[str]:
     """
     Capture both target and work documents and merge them side-by-side with labels.
@@ -262,96 +703,8 @@ def capture_split_view(width: int = None, height: int = None, label_height: int
         height = _screenshot_height
     
     try:
-        from PIL import Image, ImageDraw, ImageFont
-        import io
-        
-        # Remember current active document
-        original_active = FreeCAD.ActiveDocument.Name if FreeCAD.ActiveDocument else None
-        
-        # Capture target document
-        target_b64 = capture_document_viewport(_target_doc_name, width, height)
-        
-        # Capture work document
-        work_b64 = capture_document_viewport(_work_doc_name, width, height)
-        
-        # Restore original active document
-        if original_active:
-            activate_document(original_active)
-        
-        if not target_b64 and not work_b64:
-            return None
-        
-        # Create placeholder images if one capture failed
-        def create_placeholder(w, h, text):
-            img = Image.new('RGB', (w, h), color=(200, 200, 200))
-            draw = ImageDraw.Draw(img)
-            try:
-                # Try to center the text
-                bbox = draw.textbbox((0, 0), text)
-                text_w = bbox[2] - bbox[0]
-                text_h = bbox[3] - bbox[1]
-                x = (w - text_w) // 2
-                y = (h - text_h) // 2
-                draw.text((x, y), text, fill=(100, 100, 100))
-            except:
-                draw.text((10, h // 2), text, fill=(100, 100, 100))
-            return img
-        
-        # Decode images
-        if target_b64:
-            target_img = Image.open(io.BytesIO(base64.b64decode(target_b64)))
-        else:
-            target_img = create_placeholder(width, height, "Target: No view")
-        
-        if work_b64:
-            work_img = Image.open(io.BytesIO(base64.b64decode(work_b64)))
-        else:
-            work_img = create_placeholder(width, height, "Work: No view")
-        
-        # Ensure both images have the same size
-        target_img = target_img.resize((width, height))
-        work_img = work_img.resize((width, height))
-        
-        # Create combined image with labels
-        gap = 4  # Gap between images
-        total_width = width * 2 + gap
-        total_height = height + label_height
-        
-        combined = Image.new('RGB', (total_width, total_height), color=(40, 40, 40))
-        draw = ImageDraw.Draw(combined)
-        
-        # Draw labels
-        target_label = "TARGET (Reference)"
-        work_label = "YOUR CREATION"
-        
-        # Target label (left side)
-        try:
-            bbox = draw.textbbox((0, 0), target_label)
-            text_w = bbox[2] - bbox[0]
-            x = (width - text_w) // 2
-        except:
-            x = 10
-        draw.text((x, 5), target_label, fill=(255, 200, 100))
-        
-        # Work label (right side)
-        try:
-            bbox = draw.textbbox((0, 0), work_label)
-            text_w = bbox[2] - bbox[0]
-            x = width + gap + (width - text_w) // 2
-        except:
-            x = width + gap + 10
-        draw.text((x, 5), work_label, fill=(100, 200, 255))
-        
-        # Paste images
-        combined.paste(target_img, (0, label_height))
-        combined.paste(work_img, (width + gap, label_height))
-        
-        # Encode to base64
-        buffer = io.BytesIO()
-        combined.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        return base64.b64encode(buffer.read()).decode('utf-8')
+        target_png, work_png = grab_split_view_pngs(width, height)
+        return compose_split_view(target_png, work_png, width, height, label_height)
         
     except ImportError:
         FreeCAD.Console.PrintWarning("PIL/Pillow not available for split view. Install with: pip install Pillow\n")
@@ -370,6 +723,28 @@ def set_auto_screenshot(enabled: bool, width: int = 800, height: int = 600):
     _screenshot_height = height
 
 
+# Column letters and the bottom-right cell label of the grid, e.g. "H6"
+_GRID_LETTERS = string.ascii_uppercase[:_grid_config["columns"]]
+_GRID_LAST_CELL = f"{_GRID_LETTERS[-1]}{_grid_config['rows']}"
+
+# Pre-parsed cells for the default 8x6 grid; anything else takes the slow path
+_GRID_CELL_LUT = {
+    f"{letter}{r + 1}": (c, r)
+    for c, letter in enumerate(_GRID_LETTERS)
+    for r in range(_grid_config["rows"])
+}
+
+# zoom_grid_region target for each (column, row, size), as fractions of the
+# current grid region: (x_min, x_max, y_min, y_max)
+_GRID_ZOOM_LUT = {
+    (c, r, size): (c / _grid_config["columns"], min(1.0, (c + size) / _grid_config["columns"]),
+                   r / _grid_config["rows"], min(1.0, (r + size) / _grid_config["rows"]))
+    for c in range(_grid_config["columns"])
+    for r in range(_grid_config["rows"])
+    for size in range(1, min(_grid_config["columns"], _grid_config["rows"]) + 1)
+}
+
+
 def parse_grid_cell(cell: str) -> Tuple[int, int]:
     """
     Parse a grid cell string like 'C2' into column and row indices.
@@ -380,6 +755,14 @@ def parse_grid_cell(cell: str) -> Tuple[int, int]:
     Returns:
         Tuple of (column_index, row_index), both 0-based
     """
+    hit = _GRID_CELL_LUT.get(cell.upper())
+    if hit is not None:
+        return hit
+    return _parse_grid_cell_slow(cell)
+
+
+def _parse_grid_cell_slow(cell: str) -> Tuple[int, int]:
+    """Parse a grid cell string that is not in the precomputed lookup table."""
     cell = cell.upper().strip()
     if len(cell) < 2:
         raise ValueError(f"Invalid grid cell: {cell}")
@@ -399,103 +782,280 @@ def parse_grid_cell(cell: str) -> Tuple[int, int]:
     return col, row
 
 
-def render_grid_overlay(image_data: bytes, columns: int = 8, rows: int = 6) -> bytes:
+@functools.lru_cache(maxsize=16)
+def get_overlay_font(size: int):
     """
-    Render a grid overlay onto an image.
+    Load the font used for screenshot overlays, cached per size.
     
     Args:
-        image_data: PNG image data as bytes
+        size: Font size in points
+    
+    Returns:
+        PIL font object (falls back to Pillow's built-in font)
+    """
+    from PIL import ImageFont
+    
+    try:
+        return ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", size)
+    except:
+        try:
+            return ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", size)
+        except:
+            return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=64)
+def grid_label_size(font_size: int, label: str) -> Tuple[int, int]:
+    """Measure a fixed grid label (column letter or row number), cached."""
+    try:
+        bbox = get_overlay_font(font_size).getbbox(label)
+        return bbox[2] - bbox[0], bbox[3] - bbox[1]
+    except:
+        return 10, 12
+
+
+@functools.lru_cache(maxsize=8)
+def build_grid_overlay(width: int, height: int, columns: int = 8, rows: int = 6):
+    """
+    Render the measurement grid as a transparent RGBA layer.
+    
+    The grid depends only on the image size and grid shape, so the layer is
+    built once per combination and composited onto every frame.
+    
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
         columns: Number of columns (default 8 for A-H)
         rows: Number of rows (default 6 for 1-6)
     
     Returns:
-        PNG image data with grid overlay as bytes
+        RGBA PIL image (treat as read-only, it is shared)
     """
-    try:
-        from PIL import Image, ImageDraw, ImageFont
-        import io
-        
-        # Load image
-        img = Image.open(io.BytesIO(image_data))
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
+    from PIL import Image, ImageDraw
+    
+    # Create overlay
+    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    
+    w, h = width, height
+    cell_w = w / columns
+    cell_h = h / rows
+    
+    # Grid line color (semi-transparent white)
+    line_color = (255, 255, 255, 180)
+    text_color = (255, 255, 255, 220)
+    bg_color = (0, 0, 0, 100)  # Semi-transparent background for labels
+    
+    # Try to use a readable font size
+    font_size = max(12, min(20, int(cell_h / 4)))
+    font = get_overlay_font(font_size)
+    
+    # Draw vertical lines and column labels (A-H)
+    for i in range(columns + 1):
+        x = int(i * cell_w)
+        draw.line([(x, 0), (x, h)], fill=line_color, width=1)
         
-        # Create overlay
-        overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(overlay)
+        if i < columns:
+            label = string.ascii_uppercase[i]
+            text_w, text_h = grid_label_size(font_size, label)
+            
+            label_x = int(i * cell_w + cell_w / 2 - text_w / 2)
+            label_y = 5
+            
+            # Draw background for label
+            draw.rectangle([label_x - 2, label_y - 1, label_x + text_w + 2, label_y + text_h + 1], 
+                          fill=bg_color)
+            draw.text((label_x, label_y), label, fill=text_color, font=font)
+    
+    # Draw horizontal lines and row labels (1-6)
+    for j in range(rows + 1):
+        y = int(j * cell_h)
+        draw.line([(0, y), (w, y)], fill=line_color, width=1)
         
-        w, h = img.size
-        cell_w = w / columns
-        cell_h = h / rows
+        if j < rows:
+            label = str(j + 1)
+            text_w, text_h = grid_label_size(font_size, label)
+            
+            label_x = 5
+            label_y = int(j * cell_h + cell_h / 2 - text_h / 2)
+            
+            # Draw background for label
+            draw.rectangle([label_x - 2, label_y - 1, label_x + text_w + 2, label_y + text_h + 1],
+                          fill=bg_color)
+            draw.text((label_x, label_y), label, fill=text_color, font=font)
+    
+    return overlay
+
+
+def draw_grid_overlay(img, columns: int = 8, rows: int = 6):
+    """
+    Draw the measurement grid onto a PIL image in place.
+    
+    Args:
+        img: RGB PIL image to draw on
+        columns: Number of columns (default 8 for A-H)
+        rows: Number of rows (default 6 for 1-6)
+    """
+    overlay = build_grid_overlay(img.width, img.height, columns, rows)
+    # Using the layer's alpha as the mask blends it in a single pass
+    img.paste(overlay, (0, 0), overlay)
+
+
+def project_to_viewport(view, points):
+    """
+    Project 3D points to viewport pixel coordinates in a single batch.
+    
+    Reads the camera's combined view/projection matrix once and transforms all
+    points with one matrix multiply, instead of a getPointOnViewport call per point.
+    
+    Args:
+        view: FreeCAD view whose camera defines the projection
+        points: (N, 3) array-like of 3D points
+    
+    Returns:
+        List of (x, y) pixel positions (None for points that cannot be projected),
+        or None if the camera matrix is unavailable
+    """
+    import numpy as np
+    
+    try:
+        width, height = view.getSize()
+        view_volume = view.getCameraNode().getViewVolume(width / float(height))
+        matrix = view_volume.getMatrix()
+        mvp = np.array([[matrix[i][j] for j in range(4)] for i in range(4)], dtype=np.float64)
+    except Exception:
+        return None
+    
+    xyz = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    pts = np.hstack((xyz, np.ones((len(xyz), 1))))
+    # Coin3D matrices use the row-vector convention (p' = p * M)
+    clip = pts @ mvp
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ndc = clip[:, :2] / clip[:, 3:4]
+    screen_x = np.rint((ndc[:, 0] + 1.0) * 0.5 * width)
+    screen_y = np.rint((1.0 - ndc[:, 1]) * 0.5 * height)
+    valid = np.isfinite(screen_x) & np.isfinite(screen_y)
+    
+    return [(int(x), int(y)) if ok else None
+            for x, y, ok in zip(screen_x.tolist(), screen_y.tolist(), valid.tolist())]
+
+
+def draw_point_labels(img, pending: dict, confirmed: dict, view):
+    """
+    Draw coordinate labels for point markers onto a PIL image in place.
+    
+    Args:
+        img: RGB PIL image to draw on
+        pending: Dictionary of point_id -> point info for unconfirmed points
+        confirmed: Dictionary of point_id -> point info for confirmed points
+        view: FreeCAD view for 3D to 2D coordinate conversion
+    """
+    from PIL import ImageDraw
+    
+    labels = []
+    for points, status, text_color in (
+        (pending, "?", (255, 200, 100, 255)),
+        (confirmed, "✓", (255, 255, 0, 255)),
+    ):
+        for point_id, info in points.items():
+            if info.xyz is not None:
+                labels.append((point_id, status, text_color, info))
+    
+    if not labels:
+        return
+    
+    # Project all points at once; fall back to per-point lookups if the
+    # camera matrix cannot be read
+    positions = project_to_viewport(view, [info.xyz for _, _, _, info in labels])
+    if positions is None:
+        positions = []
+        for _, _, _, info in labels:
+            try:
+                screen_pos = view.getPointOnViewport(info.coords)
+                positions.append((int(screen_pos[0]), int(screen_pos[1])) if screen_pos else None)
+            except:
+                positions.append(None)
+    
+    draw = ImageDraw.Draw(img, 'RGBA')
+    
+    # Font setup
+    font = get_overlay_font(12)
+    bg_color = (0, 0, 0, 180)
+    
+    for (point_id, status, text_color, info), screen_pos in zip(labels, positions):
+        if screen_pos is None:
+            continue
+        x, y = screen_pos
         
-        # Grid line color (semi-transparent white)
-        line_color = (255, 255, 255, 180)
-        text_color = (255, 255, 255, 220)
-        bg_color = (0, 0, 0, 100)  # Semi-transparent background for labels
+        # Create label text
+        px, py, pz = info.xyz.tolist()
+        label = f"{point_id}{status}: ({px:.1f}, {py:.1f}, {pz:.1f})"
         
-        # Try to use a readable font size
-        font_size = max(12, min(20, int(cell_h / 4)))
+        # Draw background
         try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", font_size)
+            bbox = draw.textbbox((0, 0), label, font=font)
+            text_w = bbox[2] - bbox[0]
+            text_h = bbox[3] - bbox[1]
         except:
-            try:
-                font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", font_size)
-            except:
-                font = ImageFont.load_default()
+            text_w, text_h = len(label) * 7, 14
         
-        # Draw vertical lines and column labels (A-H)
-        for i in range(columns + 1):
-            x = int(i * cell_w)
-            draw.line([(x, 0), (x, h)], fill=line_color, width=1)
-            
-            if i < columns:
-                label = chr(ord('A') + i)
-                # Get text size
-                try:
-                    bbox = draw.textbbox((0, 0), label, font=font)
-                    text_w = bbox[2] - bbox[0]
-                    text_h = bbox[3] - bbox[1]
-                except:
-                    text_w, text_h = 10, 12
-                
-                label_x = int(i * cell_w + cell_w / 2 - text_w / 2)
-                label_y = 5
-                
-                # Draw background for label
-                draw.rectangle([label_x - 2, label_y - 1, label_x + text_w + 2, label_y + text_h + 1], 
-                              fill=bg_color)
-                draw.text((label_x, label_y), label, fill=text_color, font=font)
-        
-        # Draw horizontal lines and row labels (1-6)
-        for j in range(rows + 1):
-            y = int(j * cell_h)
-            draw.line([(0, y), (w, y)], fill=line_color, width=1)
-            
-            if j < rows:
-                label = str(j + 1)
-                try:
-                    bbox = draw.textbbox((0, 0), label, font=font)
-                    text_w = bbox[2] - bbox[0]
-                    text_h = bbox[3] - bbox[1]
-                except:
-                    text_w, text_h = 10, 12
-                
-                label_x = 5
-                label_y = int(j * cell_h + cell_h / 2 - text_h / 2)
-                
-                # Draw background for label
-                draw.rectangle([label_x - 2, label_y - 1, label_x + text_w + 2, label_y + text_h + 1],
-                              fill=bg_color)
-                draw.text((label_x, label_y), label, fill=text_color, font=font)
+        label_x = x + 10
+        label_y = y - 5
         
-        # Composite overlay onto image
-        img = Image.alpha_composite(img, overlay)
+        # Keep label on screen
+        label_x = min(label_x, img.width - text_w - 5)
+        label_y = max(label_y, 5)
         
-        # Convert back to bytes
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        return buffer.read()
+        draw.rectangle([label_x - 2, label_y - 1, label_x + text_w + 2, label_y + text_h + 1],
+                      fill=bg_color)
+        draw.text((label_x, label_y), label, fill=text_color, font=font)
+
+
+def decode_rgb(image_data: bytes):
+    """Decode PNG bytes into an RGB PIL image (RGBA drawing blends into it)."""
+    from PIL import Image
+    import io
+    
+    img = Image.open(io.BytesIO(image_data))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+def encode_png(img) -> bytes:
+    """Encode a PIL image as PNG bytes."""
+    import io
+    
+    buffer = io.BytesIO()
+    img.save(buffer, **_PNG_SAVE_KW)
+    return buffer.getvalue()
+
+
+def encode_png_base64(img) -> str:
+    """Encode a PIL image as PNG and base64 it straight from the in-memory buffer."""
+    import io
+    
+    buffer = io.BytesIO()
+    img.save(buffer, **_PNG_SAVE_KW)
+    return png_to_base64(buffer.getbuffer())
+
+
+def render_grid_overlay(image_data: bytes, columns: int = 8, rows: int = 6) -> bytes:
+    """
+    Render a grid overlay onto an image.
+    
+    Args:
+        image_data: PNG image data as bytes
+        columns: Number of columns (default 8 for A-H)
+        rows: Number of rows (default 6 for 1-6)
+    
+    Returns:
+        PNG image data with grid overlay as bytes
+    """
+    try:
+        img = decode_rgb(image_data)
+        draw_grid_overlay(img, columns, rows)
+        return encode_png(img)
         
     except ImportError:
         FreeCAD.Console.PrintWarning("PIL not available for grid overlay\n")
@@ -505,87 +1065,26 @@ def render_grid_overlay(image_data: bytes, columns: int = 8, rows: int = 6) -> b
         return image_data
 
 
-def add_point_labels_overlay(image_data: bytes, points: dict, view) -> bytes:
+def add_point_labels_overlay(image_data: bytes, pending: dict, confirmed: dict, view) -> bytes:
     """
     Add coordinate labels for point markers onto an image.
     
     Args:
         image_data: PNG image data as bytes
-        points: Dictionary of point_id -> point info
+        pending: Dictionary of point_id -> point info for unconfirmed points
+        confirmed: Dictionary of point_id -> point info for confirmed points
         view: FreeCAD view for 3D to 2D coordinate conversion
     
     Returns:
         PNG image data with labels as bytes
     """
-    if not points:
+    if not pending and not confirmed:
         return image_data
     
     try:
-        from PIL import Image, ImageDraw, ImageFont
-        import io
-        
-        img = Image.open(io.BytesIO(image_data))
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
-        
-        draw = ImageDraw.Draw(img)
-        
-        # Font setup
-        try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 12)
-        except:
-            try:
-                font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 12)
-            except:
-                font = ImageFont.load_default()
-        
-        for point_id, info in points.items():
-            coords = info.get("coords")
-            if coords is None:
-                continue
-            
-            # Try to get 2D screen position
-            try:
-                screen_pos = view.getPointOnViewport(coords)
-                if screen_pos:
-                    x, y = int(screen_pos[0]), int(screen_pos[1])
-                else:
-                    continue
-            except:
-                # Fallback: just place label at a fixed offset
-                continue
-            
-            # Create label text
-            status = "✓" if info.get("confirmed", False) else "?"
-            label = f"{point_id}{status}: ({coords.x:.1f}, {coords.y:.1f}, {coords.z:.1f})"
-            
-            # Draw background
-            try:
-                bbox = draw.textbbox((0, 0), label, font=font)
-                text_w = bbox[2] - bbox[0]
-                text_h = bbox[3] - bbox[1]
-            except:
-                text_w, text_h = len(label) * 7, 14
-            
-            label_x = x + 10
-            label_y = y - 5
-            
-            # Keep label on screen
-            label_x = min(label_x, img.width - text_w - 5)
-            label_y = max(label_y, 5)
-            
-            bg_color = (0, 0, 0, 180)
-            text_color = (255, 255, 0, 255) if info.get("confirmed") else (255, 200, 100, 255)
-            
-            draw.rectangle([label_x - 2, label_y - 1, label_x + text_w + 2, label_y + text_h + 1],
-                          fill=bg_color)
-            draw.text((label_x, label_y), label, fill=text_color, font=font)
-        
-        # Convert back to bytes
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        return buffer.read()
+        img = decode_rgb(image_data)
+        draw_point_labels(img, pending, confirmed, view)
+        return encode_png(img)
         
     except ImportError:
         return image_data
@@ -603,67 +1102,147 @@ def capture_with_grid_and_labels(width: int = None, height: int = None) -> Optio
     """
     global _grid_config, _pending_points, _confirmed_points
     
+    if not _HAS_GUI:
+        return None
     if width is None:
         width = _screenshot_width
     if height is None:
         height = _screenshot_height
     
     try:
-        import FreeCADGui
-        from PySide2 import QtWidgets
-        
         # Force GUI update
-        QtWidgets.QApplication.processEvents()
+        flush_view_updates()
         
-        if FreeCADGui.ActiveDocument is None:
+        gui_doc = FreeCADGui.ActiveDocument
+        if gui_doc is None:
             return None
         
-        view = FreeCADGui.ActiveDocument.ActiveView
+        view = gui_doc.ActiveView
         if view is None:
             return None
         
         # Capture base screenshot
-        fd, path = tempfile.mkstemp(suffix=".png")
-        os.close(fd)
+        image_data = grab_view_png(view, width, height)
+        if image_data is None:
+            return None
         
-        try:
-            view.saveImage(path, width, height, "Current")
-            
-            if not os.path.exists(path) or os.path.getsize(path) < 100:
-                return None
-            
-            with open(path, "rb") as f:
-                image_data = f.read()
-            
-            # Add grid overlay if measurement mode is active
-            if _measurement_mode and _grid_config.get("enabled", False):
-                image_data = render_grid_overlay(
-                    image_data,
-                    _grid_config.get("columns", 8),
-                    _grid_config.get("rows", 6)
-                )
-            
-            # Add point labels
-            all_points = {}
-            for pid, pinfo in _pending_points.items():
-                all_points[pid] = {**pinfo, "confirmed": False}
-            for pid, pinfo in _confirmed_points.items():
-                all_points[pid] = {**pinfo, "confirmed": True}
-            
-            if all_points:
-                image_data = add_point_labels_overlay(image_data, all_points, view)
-            
-            return base64.b64encode(image_data).decode('utf-8')
-            
-        finally:
-            if os.path.exists(path):
-                os.remove(path)
+        show_grid = _measurement_mode and _grid_config.get("enabled", False)
+        show_labels = bool(_pending_points or _confirmed_points)
+        
+        # Decode once, draw both overlays, encode once
+        if show_grid or show_labels:
+            try:
+                img = decode_rgb(image_data)
+                if show_grid:
+                    draw_grid_overlay(
+                        img,
+                        _grid_config.get("columns", 8),
+                        _grid_config.get("rows", 6)
+                    )
+                if show_labels:
+                    draw_point_labels(img, _pending_points, _confirmed_points, view)
+                return encode_png_base64(img)
+            except ImportError:
+                FreeCAD.Console.PrintWarning("PIL not available for grid overlay\n")
+            except Exception as e:
+                FreeCAD.Console.PrintWarning(f"Screenshot overlay failed: {e}\n")
+        
+        return png_to_base64(image_data)
                 
     except Exception as e:
         FreeCAD.Console.PrintWarning(f"Capture with grid failed: {e}\n")
         return None
 
 
+def shape_objects(doc) -> list:
+    """
+    List the objects in a document that carry a Shape.
+    
+    Whether an object has a Shape depends only on its type, so the positions
+    of the shape objects are cached per document and reused while the
+    object names and types are unchanged, skipping the Shape probe on every
+    object.
+    
+    Args:
+        doc: FreeCAD document to scan
+    
+    Returns:
+        List of shape-bearing document objects, in document order
+    """
+    objects = doc.Objects
+    key = tuple((obj.Name, obj.TypeId) for obj in objects)
+    cached = _shape_index.get(doc.Name)
+    if cached is None or cached[0] != key:
+        cached = (key, [i for i, obj in enumerate(objects) if hasattr(obj, "Shape")])
+        _shape_index[doc.Name] = cached
+    return [objects[i] for i in cached[1]]
+
+
+def collect_bounding_boxes(doc):
+    """
+    Gather the bounding boxes of all shape and mesh objects in a document.
+    
+    Args:
+        doc: FreeCAD document to scan
+    
+    Returns:
+        (N, 6) float64 array of [XMin, YMin, ZMin, XMax, YMax, ZMax] rows
+    """
+    import numpy as np
+    
+    boxes = []
+    for obj in doc.Objects:
+        bb = None
+        shape = getattr(obj, "Shape", None)
+        if shape is not None and hasattr(shape, "BoundBox"):
+            bb = shape.BoundBox
+        elif obj.TypeId == "Mesh::Feature" and hasattr(obj, "Mesh"):
+            bb = obj.Mesh.BoundBox
+        
+        if bb:
+            boxes.append((bb.XMin, bb.YMin, bb.ZMin, bb.XMax, bb.YMax, bb.ZMax))
+    
+    return np.array(boxes, dtype=np.float64).reshape(-1, 6)
+
+
+def scene_version_token(doc) -> Tuple[tuple, list]:
+    """
+    Build a cheap token that changes whenever scene geometry changes.
+    
+    Shapes are kept in the token itself and compared with isSame(), which
+    changes on recompute and on placement changes without computing any
+    bounding boxes. Holding them keeps their OCC data alive, so a recomputed
+    shape cannot reuse a freed address and pass for the old one (as a bare
+    hashCode could).
+    
+    Args:
+        doc: FreeCAD document to fingerprint
+    
+    Returns:
+        (hashable key of object names and mesh state, list of shapes);
+        compare tokens with scene_tokens_match
+    """
+    key = []
+    shapes = []
+    for obj in doc.Objects:
+        if hasattr(obj, "Shape"):
+            try:
+                shapes.append(obj.Shape)
+                key.append((obj.Name, True))
+            except Exception:
+                key.append((obj.Name, None))
+        elif obj.TypeId == "Mesh::Feature" and hasattr(obj, "Mesh"):
+            pl = obj.Placement
+            key.append((obj.Name, obj.Mesh.CountPoints, obj.Mesh.CountFacets,
+                        tuple(pl.Base), tuple(pl.Rotation.Q)))
+    return (doc.Name, tuple(key)), shapes
+
+
+def scene_tokens_match(old: Tuple[tuple, list], new: Tuple[tuple, list]) -> bool:
+    """Check whether two scene_version_token results describe the same geometry."""
+    return old[0] == new[0] and all(a.isSame(b) for a, b in zip(old[1], new[1]))
+
+
 def estimate_marker_size() -> float:
     """
     Estimate an appropriate marker sphere size based on the model's bounding box.
@@ -672,29 +1251,12 @@ def estimate_marker_size() -> float:
         Recommended marker radius in mm
     """
     try:
-        doc = FreeCAD.ActiveDocument
-        if not doc:
-            return 2.0
-        
-        # Find bounding box of all objects
-        min_coords = [float('inf')] * 3
-        max_coords = [float('-inf')] * 3
-        
-        for obj in doc.Objects:
-            if hasattr(obj, "Shape") and hasattr(obj.Shape, "BoundBox"):
-                bb = obj.Shape.BoundBox
-                min_coords = [min(min_coords[i], [bb.XMin, bb.YMin, bb.ZMin][i]) for i in range(3)]
-                max_coords = [max(max_coords[i], [bb.XMax, bb.YMax, bb.ZMax][i]) for i in range(3)]
-            elif obj.TypeId == "Mesh::Feature" and hasattr(obj, "Mesh"):
-                bb = obj.Mesh.BoundBox
-                min_coords = [min(min_coords[i], [bb.XMin, bb.YMin, bb.ZMin][i]) for i in range(3)]
-                max_coords = [max(max_coords[i], [bb.XMax, bb.YMax, bb.ZMax][i]) for i in range(3)]
-        
-        if float('inf') in min_coords:
+        bbox = get_scene_bounding_box()
+        if not bbox:
             return 2.0
         
         # Calculate diagonal
-        diagonal = sum((max_coords[i] - min_coords[i]) ** 2 for i in range(3)) ** 0.5
+        diagonal = bbox["diagonal"]
         
         # Marker should be about 1-2% of diagonal, but at least 0.5mm and at most 5mm
         marker_size = max(0.5, min(5.0, diagonal * 0.015))
@@ -711,98 +1273,582 @@ def get_scene_bounding_box():
         if not doc:
             return None
         
-        min_coords = [float('inf')] * 3
-        max_coords = [float('-inf')] * 3
-        found_objects = False
+        # Reuse the last result while the scene geometry is unchanged; within
+        # one dispatch and with no edit seen by the observer, skip the token walk
+        cached = _bbox_cache.get(doc.Name)
+        if cached is not None and doc.Name in _bbox_validated:
+            return cached[1]
+        token = scene_version_token(doc)
+        if cached is not None and scene_tokens_match(cached[0], token):
+            if _scene_observer is not None:
+                _bbox_validated.add(doc.Name)
+            return cached[1]
         
-        for obj in doc.Objects:
-            bb = None
-            if hasattr(obj, "Shape") and hasattr(obj.Shape, "BoundBox"):
-                bb = obj.Shape.BoundBox
-            elif obj.TypeId == "Mesh::Feature" and hasattr(obj, "Mesh"):
-                bb = obj.Mesh.BoundBox
-            
-            if bb:
-                found_objects = True
-                min_coords = [min(min_coords[i], [bb.XMin, bb.YMin, bb.ZMin][i]) for i in range(3)]
-                max_coords = [max(max_coords[i], [bb.XMax, bb.YMax, bb.ZMax][i]) for i in range(3)]
-        
-        if not found_objects:
+        boxes = collect_bounding_boxes(doc)
+        if len(boxes) == 0:
             return None
         
-        return {
-            "min": min_coords,
-            "max": max_coords,
-            "center": [(min_coords[i] + max_coords[i]) / 2 for i in range(3)],
-            "size": [max_coords[i] - min_coords[i] for i in range(3)]
+        min_coords = boxes[:, :3].min(axis=0)
+        max_coords = boxes[:, 3:].max(axis=0)
+        
+        size = max_coords - min_coords
+        bbox = {
+            "min": min_coords.tolist(),
+            "max": max_coords.tolist(),
+            "center": ((min_coords + max_coords) / 2).tolist(),
+            "size": size.tolist(),
+            "max_dim": float(size.max()),
+            "diagonal": math.sqrt(float(size.dot(size)))
         }
+        _bbox_cache[doc.Name] = (token, bbox)
+        if _scene_observer is not None:
+            _bbox_validated.add(doc.Name)
+        return bbox
         
     except Exception:
         return None
 
-# Tool definitions
-TOOLS = {
-    "setup_dual_docs": {
-        "description": "Initialize dual-document mode: creates TargetDoc (with reference STL) and WorkDoc (for your creations). Screenshots will show both side-by-side.",
-        "parameters": {
-            "target_stl_path": "string (path to reference STL file)",
-            "target_doc_name": "string (optional, default 'TargetDoc')",
-            "work_doc_name": "string (optional, default 'WorkDoc')"
-        }
-    },
-    "new_document": {
-        "description": "Create a new FreeCAD document",
-        "parameters": {"name": "string (optional, default 'Unnamed')"}
-    },
-    "list_documents": {
-        "description": "List all open FreeCAD documents",
-        "parameters": {}
-    },
-    "list_objects": {
-        "description": "List all objects in a document",
-        "parameters": {
-            "doc": "string (optional: 'target', 'work', default 'work' in dual mode)"
-        }
-    },
-    "create_box": {
-        "description": "Create a box primitive",
-        "parameters": {"length": "number (mm)", "width": "number (mm)", "height": "number (mm)", "name": "string (optional)"}
-    },
-    "create_cylinder": {
-        "description": "Create a cylinder primitive",
-        "parameters": {"radius": "number (mm)", "height": "number (mm)", "name": "string (optional)"}
-    },
-    "create_sphere": {
-        "description": "Create a sphere primitive",
-        "parameters": {"radius": "number (mm)", "name": "string (optional)"}
-    },
-    "create_cone": {
-        "description": "Create a cone primitive",
-        "parameters": {"radius1": "number (mm)", "radius2": "number (mm)", "height": "number (mm)", "name": "string (optional)"}
-    },
-    "boolean_union": {
-        "description": "Create a union of two objects",
-        "parameters": {"object1": "string", "object2": "string", "name": "string (optional)"}
-    },
-    "boolean_cut": {
-        "description": "Cut one object from another",
-        "parameters": {"base": "string", "tool": "string", "name": "string (optional)"}
-    },
-    "move_object": {
-        "description": "Move an object by offset",
-        "parameters": {"name": "string", "x": "number (optional)", "y": "number (optional)", "z": "number (optional)"}
-    },
-    "delete_object": {
-        "description": "Delete an object",
-        "parameters": {"name": "string"}
-    },
-    "export_stl": {
-        "description": "Export to STL file",
-        "parameters": {"path": "string", "objects": "array of strings (optional)"}
-    },
-    "export_step": {
-        "description": "Export to STEP file",
-        "parameters": {"path": "string", "objects": "array of strings (optional)"}
+
+# Binary STL triangle record: normal, three vertices, attribute byte count
+_STL_RECORD_DTYPE = [('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attr', '<u2')]
+
+
+def read_binary_stl(path: str):
+    """
+    Read a binary STL file straight into NumPy, bypassing FreeCAD's parser.
+    
+    Args:
+        path: Path to the STL file
+    
+    Returns:
+        (F, 3, 3) float32 array of triangle corners, or None if the file is
+        not a well-formed binary STL (e.g. ASCII STL)
+    """
+    import numpy as np
+    
+    size = os.path.getsize(path)
+    if size < 84:
+        return None
+    
+    with open(path, "rb") as f:
+        f.seek(80)
+        count = int.from_bytes(f.read(4), "little")
+        # A binary STL is exactly header + count + 50 bytes per triangle
+        if size != 84 + 50 * count:
+            return None
+        records = np.fromfile(f, dtype=np.dtype(_STL_RECORD_DTYPE), count=count)
+    
+    return records['vertices']
+
+
+@functools.lru_cache(maxsize=4)
+def _load_reference_mesh(abs_path: str, mtime_ns: int, size: int):
+    """
+    Load a reference STL and return its points and metrics.
+    
+    Cached on (path, mtime, size) so repeated comparisons against the same
+    file skip re-parsing it, while edits to the file invalidate the entry.
+    
+    Returns:
+        Tuple of (points as read-only float32 (N, 3) array, volume, area)
+    """
+    import numpy as np
+    
+    triangles = read_binary_stl(abs_path)
+    if triangles is not None:
+        # Binary STL: measure the triangle soup directly, keep unique vertices
+        corners = triangles.reshape(-1, 3)
+        volume, area = triangle_mesh_metrics(corners, np.arange(len(corners)).reshape(-1, 3))
+        points = np.unique(corners, axis=0)
+        points.setflags(write=False)
+        return points, volume, area
+    
+    ref_mesh = Mesh.Mesh(abs_path)
+    # Topology hands back plain vectors in one call (lighter than MeshPoint
+    # objects); single precision is plenty for mm-scale meshes
+    vertices, _ = ref_mesh.Topology
+    points = vectors_to_array(vertices).astype(np.float32)
+    points.setflags(write=False)
+    return points, ref_mesh.Volume, ref_mesh.Area
+
+
+def reference_cache_key(path: str) -> Tuple[str, int, int]:
+    """Key for the reference caches: (absolute path, mtime, size) of the STL."""
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+
+@functools.lru_cache(maxsize=4)
+def _load_reference_index(abs_path: str, mtime_ns: int, size: int):
+    """Build a nearest-neighbour index over a reference STL's points, cached like the points themselves."""
+    points, _, _ = _load_reference_mesh(abs_path, mtime_ns, size)
+    return build_nearest_index(points)
+
+
+# References with more points than this are decimated for use as query points
+REFERENCE_DECIMATION_MIN_POINTS = 100_000
+
+# Voxel size for reference decimation, as a fraction of the bounding-box diagonal
+REFERENCE_DECIMATION_VOXEL_FRACTION = 1.0 / 2000
+
+
+@functools.lru_cache(maxsize=4)
+def _load_reference_queries(abs_path: str, mtime_ns: int, size: int):
+    """
+    Get the reference points used as queries for the reference-to-shape sweep.
+    
+    Large references are voxel-downsampled once, keeping one real vertex per
+    occupied voxel, so the distance can be off by at most one voxel diagonal
+    (about 0.09% of the model diagonal). Smaller references are used whole.
+    
+    Returns:
+        Read-only float32 (N, 3) array
+    """
+    import numpy as np
+    
+    points, _, _ = _load_reference_mesh(abs_path, mtime_ns, size)
+    if len(points) <= REFERENCE_DECIMATION_MIN_POINTS:
+        return points
+    
+    lo = points.min(axis=0)
+    diagonal = float(np.linalg.norm(points.max(axis=0) - lo))
+    voxel = max(diagonal * REFERENCE_DECIMATION_VOXEL_FRACTION, 1e-9)
+    cells = np.floor((points - lo) / voxel).astype(np.int64)
+    _, keep = np.unique(cells, axis=0, return_index=True)
+    decimated = points[np.sort(keep)]
+    decimated.setflags(write=False)
+    return decimated
+
+
+@functools.lru_cache(maxsize=None)
+def get_kdtree_class():
+    """Return SciPy's cKDTree if SciPy is installed, else None (checked once)."""
+    try:
+        from scipy.spatial import cKDTree
+        return cKDTree
+    except ImportError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_numba_nearest_sq():
+    """
+    Return a Numba-compiled brute-force nearest-neighbour kernel, or None without Numba.
+    
+    The kernel maps (source, target) to each source point's squared distance
+    to its nearest target point. Used when SciPy is missing; compiled on
+    first use and reused afterwards.
+    """
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return None
+    
+    import numpy as np
+    
+    @njit(parallel=True, fastmath=True)
+    def _nearest_sq(source, target):
+        best_per_point = np.empty(source.shape[0])
+        for i in prange(source.shape[0]):
+            best = 1e300
+            for j in range(target.shape[0]):
+                dx = source[i, 0] - target[j, 0]
+                dy = source[i, 1] - target[j, 1]
+                dz = source[i, 2] - target[j, 2]
+                d = dx * dx + dy * dy + dz * dz
+                if d < best:
+                    best = d
+            best_per_point[i] = best
+        return best_per_point
+    
+    return _nearest_sq
+
+
+# Element budget for one broadcast tile in brute-force nearest-neighbour search (~16 MB of float32)
+HAUSDORFF_TILE_BUDGET = 4 * 1024 * 1024
+
+# compare_to_stl stops measuring once the distance exceeds tolerance times this
+HAUSDORFF_EARLY_EXIT_FACTOR = 2.0
+
+# Cells along the longest axis of a VoxelGrid
+VOXEL_GRID_RESOLUTION = 64
+
+# Queries processed per batch in VoxelGrid.nearest_distances
+VOXEL_GRID_QUERY_CHUNK = 4096
+
+
+def iter_nearest_sq_tiles(source, target):
+    """
+    Brute-force squared nearest-neighbour distances, one tile of sources at a time.
+    
+    Each tile of source points is broadcast against all targets at once; the
+    tile height keeps the (rows, M, 3) difference array around HAUSDORFF_TILE_BUDGET
+    elements.
+    
+    Args:
+        source: (N, 3) array of query points
+        target: (M, 3) array of candidate points (non-empty)
+    
+    Yields:
+        1-D arrays of squared nearest distances for consecutive source tiles
+    """
+    import numpy as np
+    
+    rows = max(1, min(1024, HAUSDORFF_TILE_BUDGET // (3 * len(target))))
+    for start in range(0, len(source), rows):
+        diff = source[start:start + rows, None, :] - target[None, :, :]
+        yield np.einsum('ijk,ijk->ij', diff, diff).min(axis=1)
+
+
+class VoxelGrid:
+    """
+    Uniform grid of cubic cells over a point cloud for nearest-neighbour queries.
+    
+    Used when SciPy is unavailable. A query scans the 3x3x3 cells around it;
+    any point outside that neighbourhood is at least one cell size away, so a
+    hit within one cell size is exact. Remaining queries fall back to brute force.
+    """
+    __slots__ = ("points", "origin", "cell_size", "dims", "cell_start", "cell_end")
+    
+    def __init__(self, points, resolution: int = VOXEL_GRID_RESOLUTION):
+        import numpy as np
+        
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        lo = pts.min(axis=0)
+        extent = pts.max(axis=0) - lo
+        self.origin = lo
+        self.cell_size = max(float(extent.max()) / resolution, 1e-9)
+        self.dims = np.maximum(np.ceil(extent / self.cell_size).astype(np.int64), 1)
+        
+        # Sort points by cell so each cell is one contiguous slice
+        cells = np.minimum(((pts - lo) / self.cell_size).astype(np.int64), self.dims - 1)
+        linear = np.ravel_multi_index(cells.T, self.dims)
+        order = np.argsort(linear, kind='stable')
+        self.points = pts[order]
+        sorted_linear = linear[order]
+        all_cells = np.arange(int(np.prod(self.dims)))
+        self.cell_start = np.searchsorted(sorted_linear, all_cells, side='left')
+        self.cell_end = np.searchsorted(sorted_linear, all_cells, side='right')
+    
+    def nearest_distances(self, source, upper_bound: float = None):
+        """
+        Distance from each query point to its nearest grid point.
+        
+        Args:
+            source: (N, 3) array of query points
+            upper_bound: Optional cutoff; distances beyond it come back as
+                infinity, and once one does the brute-force fallback stops
+                and leaves the remaining unresolved queries at infinity
+        
+        Returns:
+            (N,) float64 array of nearest distances
+        """
+        import numpy as np
+        
+        queries = np.asarray(source, dtype=np.float64).reshape(-1, 3)
+        best = np.full(len(queries), np.inf)
+        offsets = np.array([(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)])
+        
+        for start in range(0, len(queries), VOXEL_GRID_QUERY_CHUNK):
+            q = queries[start:start + VOXEL_GRID_QUERY_CHUNK]
+            chunk_best = best[start:start + VOXEL_GRID_QUERY_CHUNK]
+            home = np.floor((q - self.origin) / self.cell_size).astype(np.int64)
+            
+            for offset in offsets:
+                cell = home + offset
+                inside = np.all((cell >= 0) & (cell < self.dims), axis=1)
+                linear = np.ravel_multi_index(np.clip(cell, 0, self.dims - 1).T, self.dims)
+                counts = np.where(inside, self.cell_end[linear] - self.cell_start[linear], 0)
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                
+                # Expand every (query, candidate) pair of this neighbour cell
+                seg_starts = np.cumsum(counts) - counts
+                query_idx = np.repeat(np.arange(len(q)), counts)
+                point_idx = np.repeat(self.cell_start[linear] - seg_starts, counts) + np.arange(total)
+                diff = q[query_idx] - self.points[point_idx]
+                d2 = np.einsum('ij,ij->i', diff, diff)
+                
+                hit = counts > 0
+                chunk_best[hit] = np.minimum(chunk_best[hit], np.minimum.reduceat(d2, seg_starts[hit]))
+        
+        # Anything not found within one cell may have a closer point further out
+        unresolved = np.flatnonzero(best > self.cell_size * self.cell_size)
+        if upper_bound is not None:
+            bound_sq = upper_bound * upper_bound
+            best[best > bound_sq] = np.inf
+            if len(unresolved) and upper_bound <= self.cell_size:
+                # Unresolved queries are over one cell size, so over the bound
+                best[unresolved] = np.inf
+                return np.sqrt(best)
+        
+        if len(unresolved):
+            numba_kernel = get_numba_nearest_sq()
+            if numba_kernel is not None:
+                best[unresolved] = numba_kernel(queries[unresolved], self.points)
+            elif upper_bound is None:
+                best[unresolved] = np.concatenate(list(iter_nearest_sq_tiles(queries[unresolved], self.points)))
+            else:
+                best[unresolved] = np.inf
+                done = 0
+                for tile in iter_nearest_sq_tiles(queries[unresolved], self.points):
+                    best[unresolved[done:done + len(tile)]] = tile
+                    done += len(tile)
+                    if tile.max() > bound_sq:
+                        break
+            if upper_bound is not None:
+                best[best > bound_sq] = np.inf
+        
+        return np.sqrt(best)
+
+
+def build_nearest_index(points):
+    """Build a nearest-neighbour index: a cKDTree with SciPy, else a VoxelGrid."""
+    kdtree = get_kdtree_class()
+    if kdtree is not None:
+        return kdtree(points)
+    return VoxelGrid(points)
+
+
+def directed_hausdorff(source, target, upper_bound: float = None, target_index=None) -> float:
+    """
+    Directed Hausdorff distance from one point set to another.
+    
+    Args:
+        source: (N, 3) array of points to measure from
+        target: (M, 3) array of points to measure to
+        upper_bound: Optional cutoff; once any distance exceeds it the
+            search stops and infinity is returned
+        target_index: Optional prebuilt index over target (from
+            build_nearest_index), reused instead of building one
+    
+    Returns:
+        Largest distance from any source point to its nearest target point,
+        or infinity if that exceeds upper_bound
+    """
+    if len(source) == 0 or len(target) == 0:
+        return 0.0
+    
+    if target_index is None:
+        target_index = build_nearest_index(target)
+    
+    if isinstance(target_index, VoxelGrid):
+        return float(target_index.nearest_distances(source, upper_bound).max())
+    
+    # A KD-tree answers each nearest-neighbour query in O(log M)
+    if upper_bound is None:
+        distances, _ = target_index.query(source, k=1, workers=-1)
+    else:
+        # Points with no neighbour inside the bound come back as inf and
+        # prune their traversal early
+        distances, _ = target_index.query(
+            source, k=1, workers=-1, distance_upper_bound=upper_bound
+        )
+    return float(distances.max())
+
+
+def vectors_to_array(vertices):
+    """
+    Convert a sequence of FreeCAD vectors into an (N, 3) float64 array.
+    
+    Streams the coordinates straight into a preallocated buffer instead of
+    building an intermediate list of lists; FreeCAD.Vector is a sequence,
+    so the flattening runs in C via itertools.
+    
+    Args:
+        vertices: Sequence of FreeCAD.Vector (e.g. from Shape.tessellate)
+    
+    Returns:
+        (N, 3) float64 NumPy array
+    """
+    import numpy as np
+    
+    count = len(vertices)
+    return np.fromiter(
+        itertools.chain.from_iterable(vertices),
+        dtype=np.float64,
+        count=3 * count,
+    ).reshape(count, 3)
+
+
+def facets_to_array(facets):
+    """
+    Convert a sequence of triangle index tuples into an (M, 3) index array.
+    
+    Much faster than np.asarray on a list of tuples, which has to inspect
+    every tuple to discover the array shape.
+    
+    Args:
+        facets: Sequence of (i, j, k) tuples (e.g. from Shape.tessellate)
+    
+    Returns:
+        (M, 3) intp NumPy array
+    """
+    import numpy as np
+    
+    count = len(facets)
+    return np.fromiter(
+        itertools.chain.from_iterable(facets),
+        dtype=np.intp,
+        count=3 * count,
+    ).reshape(count, 3)
+
+
+# Default STL export deflection as a fraction of the shape's bounding-box diagonal
+EXPORT_RELATIVE_DEFLECTION = 0.001
+
+
+def export_deflection(shape) -> float:
+    """
+    Pick a mesh export deflection proportional to a shape's size.
+    
+    A fixed absolute value over-tessellates small parts and under-tessellates
+    large ones; scaling by the bounding-box diagonal keeps the relative error
+    constant.
+    
+    Args:
+        shape: Part shape to be meshed
+    
+    Returns:
+        Linear deflection in mm (at least 0.001)
+    """
+    return max(0.001, shape.BoundBox.DiagonalLength * EXPORT_RELATIVE_DEFLECTION)
+
+
+def tessellate_objects(objs, accuracy: float):
+    """
+    Tessellate objects and measure each tessellation's volume and area.
+    
+    Tessellation stays on the calling thread (OCC shapes belong to the
+    document); the NumPy metrics are tiny next to it and run inline.
+    
+    Args:
+        objs: Objects with a Shape to tessellate
+        accuracy: Tessellation tolerance in mm
+    
+    Returns:
+        Tuple of (list of (object, float64 (N, 3) vertex array), total volume, total area);
+        objects that fail to tessellate are skipped with a warning
+    """
+    meshes = []
+    total_volume = 0.0
+    total_area = 0.0
+    
+    for obj in objs:
+        try:
+            vertices, faces = obj.Shape.tessellate(accuracy)
+            arr = vectors_to_array(vertices)
+        except Exception as e:
+            FreeCAD.Console.PrintWarning(f"Failed to tessellate {obj.Name}: {e}\n")
+            continue
+        meshes.append((obj, arr))
+        volume, area = triangle_mesh_metrics(arr, faces)
+        total_volume += volume
+        total_area += area
+    
+    return meshes, total_volume, total_area
+
+
+def triangle_mesh_metrics(points, facets) -> Tuple[float, float]:
+    """
+    Compute volume and surface area of a triangle mesh.
+    
+    Works on the tessellation directly (divergence theorem for the volume),
+    which avoids an extra OCCT integration pass and matches how the
+    reference STL's metrics are measured.
+    
+    Args:
+        points: (N, 3) array of vertex coordinates
+        facets: (M, 3) array of vertex indices per triangle
+    
+    Returns:
+        Tuple of (volume, area)
+    """
+    import numpy as np
+    
+    pts = np.asarray(points, dtype=np.float64)
+    if isinstance(facets, np.ndarray):
+        tris = facets.astype(np.intp, copy=False).reshape(-1, 3)
+    else:
+        tris = facets_to_array(facets)
+    if len(tris) == 0:
+        return 0.0, 0.0
+    
+    v0, v1, v2 = pts[tris[:, 0]], pts[tris[:, 1]], pts[tris[:, 2]]
+    volume = abs(float(np.einsum('ij,ij->i', v0, np.cross(v1, v2)).sum())) / 6.0
+    area = 0.5 * float(np.linalg.norm(np.cross(v1 - v0, v2 - v0), axis=1).sum())
+    return volume, area
+
+
+# Tool definitions
+TOOLS = {
+    "setup_dual_docs": {
+        "description": "Initialize dual-document mode: creates TargetDoc (with reference STL) and WorkDoc (for your creations). Screenshots will show both side-by-side.",
+        "parameters": {
+            "target_stl_path": "string (path to reference STL file)",
+            "target_doc_name": "string (optional, default 'TargetDoc')",
+            "work_doc_name": "string (optional, default 'WorkDoc')",
+            "sync_ui": "boolean (optional, default false; pump Qt events before returning instead of leaving it to the next capture)"
+        }
+    },
+    "new_document": {
+        "description": "Create a new FreeCAD document",
+        "parameters": {"name": "string (optional, default 'Unnamed')"}
+    },
+    "list_documents": {
+        "description": "List all open FreeCAD documents",
+        "parameters": {}
+    },
+    "list_objects": {
+        "description": "List all objects in a document",
+        "parameters": {
+            "doc": "string (optional: 'target', 'work', default 'work' in dual mode)"
+        }
+    },
+    "create_box": {
+        "description": "Create a box primitive",
+        "parameters": {"length": "number (mm)", "width": "number (mm)", "height": "number (mm)", "name": "string (optional)", "recompute": "boolean (optional, default true)"}
+    },
+    "create_cylinder": {
+        "description": "Create a cylinder primitive",
+        "parameters": {"radius": "number (mm)", "height": "number (mm)", "name": "string (optional)", "recompute": "boolean (optional, default true)"}
+    },
+    "create_sphere": {
+        "description": "Create a sphere primitive",
+        "parameters": {"radius": "number (mm)", "name": "string (optional)", "recompute": "boolean (optional, default true)"}
+    },
+    "create_cone": {
+        "description": "Create a cone primitive",
+        "parameters": {"radius1": "number (mm)", "radius2": "number (mm)", "height": "number (mm)", "name": "string (optional)", "recompute": "boolean (optional, default true)"}
+    },
+    "boolean_union": {
+        "description": "Create a union of two objects",
+        "parameters": {"object1": "string", "object2": "string", "name": "string (optional)"}
+    },
+    "boolean_cut": {
+        "description": "Cut one object from another",
+        "parameters": {"base": "string", "tool": "string", "name": "string (optional)"}
+    },
+    "move_object": {
+        "description": "Move an object by offset",
+        "parameters": {"name": "string", "x": "number (optional)", "y": "number (optional)", "z": "number (optional)", "recompute": "boolean (optional, default true)"}
+    },
+    "delete_object": {
+        "description": "Delete an object",
+        "parameters": {"name": "string", "recompute": "boolean (optional, default true)"}
+    },
+    "export_stl": {
+        "description": "Export to STL file",
+        "parameters": {
+            "path": "string",
+            "objects": "array of strings (optional)",
+            "tessellation": "number (mm, optional, linear deflection; default scales with the model size)"
+        }
+    },
+    "export_step": {
+        "description": "Export to STEP file",
+        "parameters": {"path": "string", "objects": "array of strings (optional)"}
     },
     "get_object_info": {
         "description": "Get object information (volume, bounds, etc.)",
@@ -816,7 +1862,7 @@ TOOLS = {
         "parameters": {"path": "string (optional)"}
     },
     "recompute": {
-        "description": "Recompute the document",
+        "description": "Recompute the document (call once after tools run with recompute=false)",
         "parameters": {}
     },
     "compare_to_stl": {
@@ -824,14 +1870,16 @@ TOOLS = {
         "parameters": {
             "reference_path": "string (path to reference STL file)",
             "tolerance": "number (mm, optional, default 1.0)",
-            "tessellation": "number (mm, optional, tessellation accuracy, default 0.1)"
+            "tessellation": "number (mm, optional, tessellation accuracy, default 0.1)",
+            "exact_distance": "boolean (optional, default false; by default the Hausdorff search stops past 2x tolerance, leaving hausdorff_distance null with hausdorff_lower_bound set and hausdorff_exact false)"
         }
     },
     "get_mesh_points": {
         "description": "Export current shapes as point cloud for external comparison",
         "parameters": {
             "tessellation": "number (mm, optional, default 0.1)",
-            "sample_rate": "number (optional, sample every Nth point, default 1)"
+            "sample_rate": "number (optional, sample every Nth point, default 1)",
+            "encoding": "string (optional: 'list' for a points array, 'base64' for points_b64 holding little-endian float32 x,y,z triples; default 'list')"
         }
     },
     # === View and Screenshot Tools ===
@@ -848,13 +1896,15 @@ TOOLS = {
         "description": "Set camera to a preset view angle for a specific document",
         "parameters": {
             "preset": "string (front/back/top/bottom/left/right/isometric)",
-            "doc": "string (optional: 'target', 'work', or 'both', default 'work' in dual mode)"
+            "doc": "string (optional: 'target', 'work', or 'both', default 'work' in dual mode)",
+            "sync_ui": "boolean (optional, default false; pump Qt events before returning instead of leaving it to the next capture)"
         }
     },
     "fit_all": {
         "description": "Fit camera to show all objects in the viewport",
         "parameters": {
-            "doc": "string (optional: 'target', 'work', or 'both', default 'work' in dual mode)"
+            "doc": "string (optional: 'target', 'work', or 'both', default 'work' in dual mode)",
+            "sync_ui": "boolean (optional, default false; pump Qt events before returning instead of leaving it to the next capture)"
         }
     },
     "import_stl": {
@@ -877,7 +1927,8 @@ TOOLS = {
             "yaw": "number (degrees, rotation around Z axis, optional)",
             "pitch": "number (degrees, rotation around X axis, optional)",
             "roll": "number (degrees, rotation around Y axis, optional)",
-            "doc": "string (optional: 'target', 'work', or 'both', default 'work' in dual mode)"
+            "doc": "string (optional: 'target', 'work', or 'both', default 'work' in dual mode)",
+            "sync_ui": "boolean (optional, default false; pump Qt events before returning instead of leaving it to the next capture)"
         }
     },
     # === Display Mode Tools ===
@@ -894,7 +1945,8 @@ TOOLS = {
         "parameters": {
             "axis": "string ('X', 'Y', or 'Z')",
             "percent": "number (0-100, position along axis as percentage of bounding box)",
-            "enabled": "boolean (true to enable, false to disable)"
+            "enabled": "boolean (true to enable, false to disable)",
+            "sync_ui": "boolean (optional, default false; pump Qt events before returning instead of leaving it to the next capture)"
         }
     },
     # === Camera Navigation Tools ===
@@ -902,7 +1954,8 @@ TOOLS = {
         "description": "Zoom camera in or out by a percentage",
         "parameters": {
             "percent": "number (>100 zooms in, <100 zooms out, e.g. 150 = 1.5x zoom)",
-            "doc": "string (optional: 'target', 'work', or 'both', default 'work' in dual mode)"
+            "doc": "string (optional: 'target', 'work', or 'both', default 'work' in dual mode)",
+            "sync_ui": "boolean (optional, default false; pump Qt events before returning instead of leaving it to the next capture)"
         }
     },
     "pan": {
@@ -910,7 +1963,8 @@ TOOLS = {
         "parameters": {
             "x": "number (-100 to 100, percentage to pan horizontally)",
             "y": "number (-100 to 100, percentage to pan vertically)",
-            "doc": "string (optional: 'target', 'work', or 'both', default 'work' in dual mode)"
+            "doc": "string (optional: 'target', 'work', or 'both', default 'work' in dual mode)",
+            "sync_ui": "boolean (optional, default false; pump Qt events before returning instead of leaving it to the next capture)"
         }
     },
     # === Measurement Mode Tools ===
@@ -941,6 +1995,14 @@ TOOLS = {
             "offset_y": "number (optional, 0-1, position within cell vertically, default 0.5)"
         }
     },
+    "select_points_batch": {
+        "description": "Select several points at once, one per grid cell. Places a visible marker for each surface hit.",
+        "parameters": {
+            "grid_cells": "array of strings (e.g. ['B2', 'C4', 'F5'])",
+            "offset_x": "number (optional, 0-1, position within each cell horizontally, default 0.5)",
+            "offset_y": "number (optional, 0-1, position within each cell vertically, default 0.5)"
+        }
+    },
     "confirm_point": {
         "description": "Confirm a pending point selection, locking it in for measurement",
         "parameters": {
@@ -957,6 +2019,14 @@ TOOLS = {
         "description": "List all current point markers with their coordinates and status",
         "parameters": {}
     },
+    "nearest_point": {
+        "description": "Find the confirmed point closest to a 3D location",
+        "parameters": {
+            "x": "number (mm)",
+            "y": "number (mm)",
+            "z": "number (mm)"
+        }
+    },
     "measure_distance": {
         "description": "Measure distance between two confirmed points. Draws a visual line between them.",
         "parameters": {
@@ -964,6 +2034,12 @@ TOOLS = {
             "point_b": "string (second point ID, e.g. 'point_2')"
         }
     },
+    "measure_distances": {
+        "description": "Measure distances between several pairs of confirmed points at once. Does not draw lines.",
+        "parameters": {
+            "pairs": "array of [point_a, point_b] ID pairs (e.g. [['point_1', 'point_2'], ['point_2', 'point_3']])"
+        }
+    },
     "clear_measurements": {
         "description": "Remove all measurement lines and markers",
         "parameters": {}
@@ -971,1642 +2047,2285 @@ TOOLS = {
 }
 
 
-def execute_tool(name: str, arguments: dict) -> dict:
-    """Execute a tool on the main thread."""
+# Tools that never change the scene or camera
+_READ_ONLY_TOOLS = {
+    "list_tools", "list_documents", "list_objects", "get_object_info",
+    "compare_to_stl", "get_mesh_points", "take_screenshot", "list_points",
+    "nearest_point", "measure_distances",
+    "confirm_point",
+}
+
+# Tools that only read plain Python state; execute_tool runs them on the
+# calling thread instead of queuing them on the main-thread bridge
+_THREADSAFE_TOOLS = {"list_tools", "list_points"}
+
+# Skip auto-screenshots for tools with large data responses or their own
+# capture, and for point queries that leave the view exactly as it was
+_SKIP_SCREENSHOT_TOOLS = {
+    "list_tools", "get_mesh_points", "take_screenshot",
+    "confirm_point", "list_points", "nearest_point", "measure_distances",
+}
+
+
+def capture_response_screenshot(grid: bool, auto: bool) -> Optional[str]:
+    """
+    Take the screenshot attached to a tool or batch response.
     
-    def _execute():
-        global _target_doc_name, _work_doc_name, _dual_mode_enabled
-        global _measurement_mode, _grid_config
-        global _pending_points, _confirmed_points, _point_counter
-        global _measurement_objects
-        
-        # For most tools, use work doc in dual mode, else active document
-        if is_dual_mode():
-            doc = get_work_doc()
-        else:
-            doc = FreeCAD.ActiveDocument
-        
-        if name == "setup_dual_docs":
-            import Mesh
-            import os as os_module
-            
-            stl_path = arguments.get("target_stl_path")
-            if not stl_path:
-                return {"success": False, "error": "target_stl_path is required"}
-            
-            if not os_module.path.exists(stl_path):
-                return {"success": False, "error": f"File not found: {stl_path}"}
-            
-            target_name = arguments.get("target_doc_name", "TargetDoc")
-            work_name = arguments.get("work_doc_name", "WorkDoc")
-            
-            try:
-                # Close existing docs if they exist
-                for existing_name in [target_name, work_name]:
-                    try:
-                        existing = FreeCAD.getDocument(existing_name)
-                        if existing:
-                            FreeCAD.closeDocument(existing_name)
-                    except:
-                        pass
-                
-                # Create TargetDoc and import STL
-                target_doc = FreeCAD.newDocument(target_name)
-                _target_doc_name = target_doc.Name
-                
-                # Import STL into target doc
-                Mesh.insert(stl_path, target_doc.Name)
-                
-                # Find the imported mesh object
-                mesh_objects = [o for o in target_doc.Objects if o.TypeId == "Mesh::Feature"]
-                target_mesh_name = None
-                target_mesh_info = {}
-                if mesh_objects:
-                    imported = mesh_objects[-1]
-                    imported.Label = "TargetMesh"
-                    target_mesh_name = imported.Name
-                    target_mesh_info = {
-                        "name": imported.Name,
-                        "label": imported.Label,
-                        "points": imported.Mesh.CountPoints,
-                        "facets": imported.Mesh.CountFacets
-                    }
-                
-                target_doc.recompute()
-                
-                # Create WorkDoc (empty, for agent to build in)
-                work_doc = FreeCAD.newDocument(work_name)
-                _work_doc_name = work_doc.Name
-                
-                # Set work doc as active (all creation tools will use this)
-                FreeCAD.setActiveDocument(work_doc.Name)
-                
-                # Enable dual mode
-                _dual_mode_enabled = True
-                
-                # Set up views
-                try:
-                    import FreeCADGui
-                    from PySide2 import QtWidgets
-                    
-                    # Set isometric view for both
-                    for doc_name in [_target_doc_name, _work_doc_name]:
-                        activate_document(doc_name)
-                        gui_doc = FreeCADGui.getDocument(doc_name)
-                        if gui_doc and gui_doc.ActiveView:
-                            gui_doc.ActiveView.viewIsometric()
-                            gui_doc.ActiveView.fitAll()
-                    
-                    # Re-activate work doc
-                    activate_document(_work_doc_name)
-                    QtWidgets.QApplication.processEvents()
-                except Exception as e:
-                    FreeCAD.Console.PrintWarning(f"View setup warning: {e}\n")
-                
-                return {
-                    "success": True,
-                    "target_doc": _target_doc_name,
-                    "work_doc": _work_doc_name,
-                    "target_mesh": target_mesh_info,
-                    "dual_mode": True,
-                    "message": f"Dual mode enabled. Target STL loaded into '{_target_doc_name}'. Create objects in '{_work_doc_name}'."
-                }
-                
-            except Exception as e:
-                reset_dual_mode()
-                return {"success": False, "error": f"Failed to setup dual docs: {e}"}
-        
-        elif name == "new_document":
-            doc_name = arguments.get("name", "Unnamed")
-            doc = FreeCAD.newDocument(doc_name)
-            return {"success": True, "document": doc.Name}
-        
-        elif name == "list_documents":
-            docs = [{"name": d, "objects": len(FreeCAD.getDocument(d).Objects)} 
-                    for d in FreeCAD.listDocuments()]
-            return {"success": True, "documents": docs}
-        
-        elif name == "list_objects":
-            # Allow querying specific document in dual mode
-            doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
-            query_doc = doc
-            if is_dual_mode():
-                if doc_param == "target":
-                    query_doc = get_target_doc()
-                elif doc_param == "work":
-                    query_doc = get_work_doc()
-            
-            if query_doc is None:
-                return {"success": False, "error": "No active document"}
-            objects = []
-            for obj in query_doc.Objects:
-                info = {"name": obj.Name, "type": obj.TypeId}
-                if hasattr(obj, "Shape") and hasattr(obj.Shape, "Volume"):
-                    info["volume"] = round(obj.Shape.Volume, 2)
-                # For mesh objects, include mesh info
-                if obj.TypeId == "Mesh::Feature" and hasattr(obj, "Mesh"):
-                    info["points"] = obj.Mesh.CountPoints
-                    info["facets"] = obj.Mesh.CountFacets
-                objects.append(info)
-            return {"success": True, "objects": objects, "document": query_doc.Name}
-        
-        elif name == "create_box":
-            if doc is None:
-                doc = FreeCAD.newDocument("Unnamed")
-            obj = doc.addObject("Part::Box", arguments.get("name", "Box"))
-            obj.Length = arguments["length"]
-            obj.Width = arguments["width"]
-            obj.Height = arguments["height"]
-            doc.recompute()
-            return {"success": True, "name": obj.Name, "volume": round(obj.Shape.Volume, 2)}
-        
-        elif name == "create_cylinder":
-            if doc is None:
-                doc = FreeCAD.newDocument("Unnamed")
-            obj = doc.addObject("Part::Cylinder", arguments.get("name", "Cylinder"))
-            obj.Radius = arguments["radius"]
-            obj.Height = arguments["height"]
-            doc.recompute()
-            return {"success": True, "name": obj.Name, "volume": round(obj.Shape.Volume, 2)}
-        
-        elif name == "create_sphere":
-            if doc is None:
-                doc = FreeCAD.newDocument("Unnamed")
-            obj = doc.addObject("Part::Sphere", arguments.get("name", "Sphere"))
-            obj.Radius = arguments["radius"]
-            doc.recompute()
-            return {"success": True, "name": obj.Name, "volume": round(obj.Shape.Volume, 2)}
-        
-        elif name == "create_cone":
-            if doc is None:
-                doc = FreeCAD.newDocument("Unnamed")
-            obj = doc.addObject("Part::Cone", arguments.get("name", "Cone"))
-            obj.Radius1 = arguments["radius1"]
-            obj.Radius2 = arguments["radius2"]
-            obj.Height = arguments["height"]
-            doc.recompute()
-            return {"success": True, "name": obj.Name, "volume": round(obj.Shape.Volume, 2)}
-        
-        elif name == "boolean_union":
-            if doc is None:
-                return {"success": False, "error": "No active document"}
-            obj1 = doc.getObject(arguments["object1"])
-            obj2 = doc.getObject(arguments["object2"])
-            if not obj1 or not obj2:
-                return {"success": False, "error": "Objects not found"}
-            fusion = doc.addObject("Part::MultiFuse", arguments.get("name", "Union"))
-            fusion.Shapes = [obj1, obj2]
-            doc.recompute()
-            return {"success": True, "name": fusion.Name, "volume": round(fusion.Shape.Volume, 2)}
-        
-        elif name == "boolean_cut":
-            if doc is None:
-                return {"success": False, "error": "No active document"}
-            base = doc.getObject(arguments["base"])
-            tool = doc.getObject(arguments["tool"])
-            if not base or not tool:
-                return {"success": False, "error": "Objects not found"}
-            cut = doc.addObject("Part::Cut", arguments.get("name", "Cut"))
-            cut.Base = base
-            cut.Tool = tool
-            doc.recompute()
-            return {"success": True, "name": cut.Name, "volume": round(cut.Shape.Volume, 2)}
-        
-        elif name == "move_object":
-            if doc is None:
-                return {"success": False, "error": "No active document"}
-            obj = doc.getObject(arguments["name"])
-            if not obj:
-                return {"success": False, "error": f"Object not found"}
-            pos = obj.Placement.Base
-            obj.Placement.Base = FreeCAD.Vector(
-                pos.x + arguments.get("x", 0),
-                pos.y + arguments.get("y", 0),
-                pos.z + arguments.get("z", 0)
-            )
-            doc.recompute()
-            p = obj.Placement.Base
-            return {"success": True, "position": [p.x, p.y, p.z]}
-        
-        elif name == "delete_object":
-            if doc is None:
-                return {"success": False, "error": "No active document"}
-            if not doc.getObject(arguments["name"]):
-                return {"success": False, "error": "Object not found"}
-            doc.removeObject(arguments["name"])
-            doc.recompute()
-            return {"success": True}
-        
-        elif name == "export_stl":
-            import Mesh
-            import MeshPart
-            if doc is None:
-                return {"success": False, "error": "No active document"}
-            objs = [doc.getObject(n) for n in arguments.get("objects", [])] if arguments.get("objects") else \
-                   [o for o in doc.Objects if hasattr(o, "Shape")]
-            objs = [o for o in objs if o and hasattr(o, "Shape")]
-            if not objs:
-                return {"success": False, "error": "No objects"}
-            
-            # Use MeshPart to properly convert shapes to mesh
-            combined_mesh = Mesh.Mesh()
-            for o in objs:
-                try:
-                    shape_mesh = MeshPart.meshFromShape(o.Shape, LinearDeflection=0.1)
-                    combined_mesh.addMesh(shape_mesh)
-                except Exception as e:
-                    FreeCAD.Console.PrintWarning(f"Failed to mesh {o.Name}: {e}\n")
-            
-            if combined_mesh.CountPoints == 0:
-                return {"success": False, "error": "Failed to create mesh from shapes"}
-            
-            combined_mesh.write(arguments["path"])
-            return {"success": True, "path": arguments["path"], "points": combined_mesh.CountPoints}
-        
-        elif name == "export_step":
-            import Part
-            if doc is None:
-                return {"success": False, "error": "No active document"}
-            objs = [doc.getObject(n) for n in arguments.get("objects", [])] if arguments.get("objects") else \
-                   [o for o in doc.Objects if hasattr(o, "Shape")]
-            objs = [o for o in objs if o]
-            if not objs:
-                return {"success": False, "error": "No objects"}
-            Part.export(objs, arguments["path"])
-            return {"success": True, "path": arguments["path"]}
-        
-        elif name == "get_object_info":
-            # Allow querying specific document in dual mode
-            doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
-            query_doc = doc
-            if is_dual_mode():
-                if doc_param == "target":
-                    query_doc = get_target_doc()
-                elif doc_param == "work":
-                    query_doc = get_work_doc()
-            
-            if query_doc is None:
-                return {"success": False, "error": "No active document"}
-            obj = query_doc.getObject(arguments["name"])
-            if not obj:
-                return {"success": False, "error": f"Object '{arguments['name']}' not found in {query_doc.Name}"}
-            info = {"name": obj.Name, "type": obj.TypeId, "document": query_doc.Name}
-            if hasattr(obj, "Shape"):
-                s = obj.Shape
-                info["volume"] = round(s.Volume, 2)
-                info["area"] = round(s.Area, 2)
-                b = s.BoundBox
-                info["bounds"] = {"min": [b.XMin, b.YMin, b.ZMin], "max": [b.XMax, b.YMax, b.ZMax]}
-            # For mesh objects, include mesh-specific info
-            if obj.TypeId == "Mesh::Feature" and hasattr(obj, "Mesh"):
-                mesh = obj.Mesh
-                info["points"] = mesh.CountPoints
-                info["facets"] = mesh.CountFacets
-                info["volume"] = round(mesh.Volume, 2)
-                info["area"] = round(mesh.Area, 2)
-                b = mesh.BoundBox
-                info["bounds"] = {"min": [b.XMin, b.YMin, b.ZMin], "max": [b.XMax, b.YMax, b.ZMax]}
-            return {"success": True, "info": info}
-        
-        elif name == "save_document":
-            if doc is None:
-                return {"success": False, "error": "No active document"}
-            path = arguments.get("path")
-            if path:
-                doc.saveAs(path)
-            elif doc.FileName:
-                doc.save()
-            else:
-                return {"success": False, "error": "Path required for new document"}
-            return {"success": True, "path": doc.FileName}
-        
-        elif name == "recompute":
-            if doc is None:
-                return {"success": False, "error": "No active document"}
-            doc.recompute()
-            return {"success": True}
-        
-        elif name == "compare_to_stl":
-            import Mesh
-            import os
-            
-            if doc is None:
-                return {"success": False, "error": "No active document"}
-            
-            ref_path = arguments.get("reference_path")
-            if not ref_path or not os.path.exists(ref_path):
-                return {"success": False, "error": f"Reference file not found: {ref_path}"}
-            
-            tolerance = arguments.get("tolerance", 1.0)
-            tess_accuracy = arguments.get("tessellation", 0.1)
+    A grid capture requested by the response's own dispatch wins, and is
+    honoured even when auto screenshots are off, since measurement tools
+    rely on the grid view.
+    
+    Args:
+        grid: Whether the dispatch (or batch) asked for a grid capture
+        auto: Whether to fall back to a regular auto-screenshot
+    
+    Returns:
+        Base64-encoded PNG string, or None
+    """
+    if grid:
+        try:
+            return _bridge.execute_sync(capture_with_grid_and_labels)
+        except Exception as e:
+            FreeCAD.Console.PrintWarning(f"Grid screenshot failed: {e}\n")
+            return None
+    if auto and _auto_screenshot_enabled:
+        return capture_auto_screenshot()
+    return None
+
+
+def capture_auto_screenshot() -> Optional[str]:
+    """
+    Capture the screenshot appended to tool responses (split view in dual mode).
+    
+    Only the GUI-bound rendering runs on the main thread; compositing and
+    encoding happen on the calling worker thread.
+    """
+    global _last_auto_screenshot
+    split = is_dual_mode()
+    width = _screenshot_width // 2 if split else _screenshot_width
+    height = _screenshot_height
+    
+    # Run capture on the main thread to avoid GUI thread crashes; an
+    # unchanged view reuses the previous image without rendering
+    def _capture_raw():
+        key = auto_screenshot_key(split, width, height)
+        cached = _last_auto_screenshot
+        if key is not None and cached is not None and cached[0] == key:
+            return key, cached[1]
+        if split:
+            return key, grab_split_view_pngs(width, height)
+        return key, capture_viewport_png(width, height)
+    
+    try:
+        key, raw = _bridge.execute_sync(_capture_raw)
+    except Exception as e:
+        FreeCAD.Console.PrintWarning(f"Auto screenshot failed: {e}\n")
+        return None
+    
+    if isinstance(raw, str):
+        return raw
+    
+    if not split:
+        encoded = png_to_base64(raw) if raw else None
+    else:
+        encoded = None
+        target_png, work_png = raw
+        try:
+            encoded = compose_split_view(target_png, work_png, width, height)
+        except ImportError:
+            FreeCAD.Console.PrintWarning("PIL/Pillow not available for split view. Install with: pip install Pillow\n")
+        except Exception as e:
+            FreeCAD.Console.PrintWarning(f"Split view capture failed: {e}\n")
+        if encoded is None:
+            # Fall back to a single panel
+            fallback = work_png or target_png
+            encoded = png_to_base64(fallback) if fallback else None
+    
+    if key is not None and encoded:
+        _last_auto_screenshot = (key, encoded)
+    return encoded
+
+
+def auto_screenshot_key(split: bool, width: int, height: int) -> Optional[tuple]:
+    """
+    Fingerprint the view state an auto-screenshot depends on (GUI thread only).
+    
+    Tool-driven changes are covered by the scene generation, and camera moves
+    made directly in the FreeCAD GUI by the cameras. Other hand edits in the
+    GUI (geometry, visibility, colours) are not detected until the next
+    mutating tool call.
+    
+    Args:
+        split: Whether the split dual-document view is captured
+        width: Capture width per panel
+        height: Capture height
+    
+    Returns:
+        Hashable key, or None if the view state cannot be determined
+    """
+    try:
+        if split:
+            doc_names = (_target_doc_name, _work_doc_name)
+        else:
+            doc_names = (FreeCADGui.ActiveDocument.Document.Name,)
+        cameras = tuple(FreeCADGui.getDocument(doc_name).ActiveView.getCamera()
+                        for doc_name in doc_names)
+        return (_scene_generation, split, width, height, cameras)
+    except Exception:
+        return None
+
+
+# Tool handlers: each takes the resolved document and the tool arguments
+
+def _tool_setup_dual_docs(doc, arguments: dict) -> dict:
+    """Initialize dual-document mode."""
+    global _target_doc_name, _work_doc_name, _dual_mode_enabled
+    
+    import os as os_module
+    
+    stl_path = arguments.get("target_stl_path")
+    if not stl_path:
+        return {"success": False, "error": "target_stl_path is required"}
+    
+    if not os_module.path.exists(stl_path):
+        return {"success": False, "error": f"File not found: {stl_path}"}
+    
+    target_name = arguments.get("target_doc_name", "TargetDoc")
+    work_name = arguments.get("work_doc_name", "WorkDoc")
+    
+    try:
+        # Close existing docs if they exist
+        for existing_name in [target_name, work_name]:
+            try:
+                existing = FreeCAD.getDocument(existing_name)
+                if existing:
+                    FreeCAD.closeDocument(existing_name)
+            except:
+                pass
+        
+        # Create TargetDoc and import STL
+        target_doc = FreeCAD.newDocument(target_name)
+        _target_doc_name = target_doc.Name
+        
+        # Import STL into target doc
+        Mesh.insert(stl_path, target_doc.Name)
+        
+        # Find the imported mesh object
+        mesh_objects = [o for o in target_doc.Objects if o.TypeId == "Mesh::Feature"]
+        target_mesh_name = None
+        target_mesh_info = {}
+        if mesh_objects:
+            imported = mesh_objects[-1]
+            imported.Label = "TargetMesh"
+            target_mesh_name = imported.Name
+            target_mesh_info = {
+                "name": imported.Name,
+                "label": imported.Label,
+                "points": imported.Mesh.CountPoints,
+                "facets": imported.Mesh.CountFacets
+            }
+        
+        target_doc.recompute()
+        
+        # Create WorkDoc (empty, for agent to build in)
+        work_doc = FreeCAD.newDocument(work_name)
+        _work_doc_name = work_doc.Name
+        
+        # Set work doc as active (all creation tools will use this)
+        FreeCAD.setActiveDocument(work_doc.Name)
+        
+        # Enable dual mode
+        _dual_mode_enabled = True
+        
+        # Set up views
+        try:
+            # Set isometric view for both
+            for doc_name in [_target_doc_name, _work_doc_name]:
+                activate_document(doc_name)
+                gui_doc = FreeCADGui.getDocument(doc_name)
+                if gui_doc and gui_doc.ActiveView:
+                    gui_doc.ActiveView.viewIsometric()
+                    gui_doc.ActiveView.fitAll()
             
-            # Load reference STL
+            # Re-activate work doc
+            activate_document(_work_doc_name)
+            sync_ui(arguments)
+        except Exception as e:
+            FreeCAD.Console.PrintWarning(f"View setup warning: {e}\n")
+        
+        return {
+            "success": True,
+            "target_doc": _target_doc_name,
+            "work_doc": _work_doc_name,
+            "target_mesh": target_mesh_info,
+            "dual_mode": True,
+            "message": f"Dual mode enabled. Target STL loaded into '{_target_doc_name}'. Create objects in '{_work_doc_name}'."
+        }
+        
+    except Exception as e:
+        reset_dual_mode()
+        return {"success": False, "error": f"Failed to setup dual docs: {e}"}
+
+
+def _tool_new_document(doc, arguments: dict) -> dict:
+    """Create a new FreeCAD document."""
+    doc_name = arguments.get("name", "Unnamed")
+    doc = FreeCAD.newDocument(doc_name)
+    return {"success": True, "document": doc.Name}
+
+
+def _tool_list_documents(doc, arguments: dict) -> dict:
+    """List all open FreeCAD documents."""
+    docs = [{"name": d, "objects": len(FreeCAD.getDocument(d).Objects)} 
+            for d in FreeCAD.listDocuments()]
+    return {"success": True, "documents": docs}
+
+
+def _tool_list_objects(doc, arguments: dict) -> dict:
+    """List all objects in a document."""
+    # Allow querying specific document in dual mode
+    doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
+    query_doc = doc
+    if is_dual_mode():
+        if doc_param == "target":
+            query_doc = get_target_doc()
+        elif doc_param == "work":
+            query_doc = get_work_doc()
+    
+    if query_doc is None:
+        return {"success": False, "error": "No active document"}
+    objects = []
+    for obj in query_doc.Objects:
+        info = {"name": obj.Name, "type": obj.TypeId}
+        shape = getattr(obj, "Shape", None)
+        if shape is not None and hasattr(shape, "Volume"):
+            info["volume"] = round(shape.Volume, 2)
+        # For mesh objects, include mesh info
+        if obj.TypeId == "Mesh::Feature" and hasattr(obj, "Mesh"):
+            info["points"] = obj.Mesh.CountPoints
+            info["facets"] = obj.Mesh.CountFacets
+        objects.append(info)
+    return {"success": True, "objects": objects, "document": query_doc.Name}
+
+
+def primitive_result(doc, obj, arguments: dict) -> dict:
+    """
+    Recompute after creating a primitive (unless deferred) and build the response.
+    
+    With recompute=false the shape is not built yet, so no volume is reported;
+    call the recompute tool once after a batch of creations.
+    """
+    if not arguments.get("recompute", True):
+        return {"success": True, "name": obj.Name, "recomputed": False}
+    doc.recompute()
+    return {"success": True, "name": obj.Name, "volume": round(obj.Shape.Volume, 2)}
+
+
+def _tool_create_box(doc, arguments: dict) -> dict:
+    """Create a box primitive."""
+    if doc is None:
+        doc = FreeCAD.newDocument("Unnamed")
+    obj = doc.addObject("Part::Box", arguments.get("name", "Box"))
+    obj.Length = arguments["length"]
+    obj.Width = arguments["width"]
+    obj.Height = arguments["height"]
+    return primitive_result(doc, obj, arguments)
+
+
+def _tool_create_cylinder(doc, arguments: dict) -> dict:
+    """Create a cylinder primitive."""
+    if doc is None:
+        doc = FreeCAD.newDocument("Unnamed")
+    obj = doc.addObject("Part::Cylinder", arguments.get("name", "Cylinder"))
+    obj.Radius = arguments["radius"]
+    obj.Height = arguments["height"]
+    return primitive_result(doc, obj, arguments)
+
+
+def _tool_create_sphere(doc, arguments: dict) -> dict:
+    """Create a sphere primitive."""
+    if doc is None:
+        doc = FreeCAD.newDocument("Unnamed")
+    obj = doc.addObject("Part::Sphere", arguments.get("name", "Sphere"))
+    obj.Radius = arguments["radius"]
+    return primitive_result(doc, obj, arguments)
+
+
+def _tool_create_cone(doc, arguments: dict) -> dict:
+    """Create a cone primitive."""
+    if doc is None:
+        doc = FreeCAD.newDocument("Unnamed")
+    obj = doc.addObject("Part::Cone", arguments.get("name", "Cone"))
+    obj.Radius1 = arguments["radius1"]
+    obj.Radius2 = arguments["radius2"]
+    obj.Height = arguments["height"]
+    return primitive_result(doc, obj, arguments)
+
+
+def _tool_boolean_union(doc, arguments: dict) -> dict:
+    """Create a union of two objects."""
+    if doc is None:
+        return {"success": False, "error": "No active document"}
+    obj1 = doc.getObject(arguments["object1"])
+    obj2 = doc.getObject(arguments["object2"])
+    if not obj1 or not obj2:
+        return {"success": False, "error": "Objects not found"}
+    fusion = doc.addObject("Part::MultiFuse", arguments.get("name", "Union"))
+    fusion.Shapes = [obj1, obj2]
+    doc.recompute()
+    return {"success": True, "name": fusion.Name, "volume": round(fusion.Shape.Volume, 2)}
+
+
+def _tool_boolean_cut(doc, arguments: dict) -> dict:
+    """Cut one object from another."""
+    if doc is None:
+        return {"success": False, "error": "No active document"}
+    base = doc.getObject(arguments["base"])
+    tool = doc.getObject(arguments["tool"])
+    if not base or not tool:
+        return {"success": False, "error": "Objects not found"}
+    cut = doc.addObject("Part::Cut", arguments.get("name", "Cut"))
+    cut.Base = base
+    cut.Tool = tool
+    doc.recompute()
+    return {"success": True, "name": cut.Name, "volume": round(cut.Shape.Volume, 2)}
+
+
+def _tool_move_object(doc, arguments: dict) -> dict:
+    """Move an object by offset."""
+    if doc is None:
+        return {"success": False, "error": "No active document"}
+    obj = doc.getObject(arguments["name"])
+    if not obj:
+        return {"success": False, "error": f"Object not found"}
+    pos = obj.Placement.Base
+    obj.Placement.Base = FreeCAD.Vector(
+        pos.x + arguments.get("x", 0),
+        pos.y + arguments.get("y", 0),
+        pos.z + arguments.get("z", 0)
+    )
+    # The object's own shape follows its placement; only dependents need a recompute
+    if arguments.get("recompute", True) and obj.InList:
+        doc.recompute()
+    p = obj.Placement.Base
+    return {"success": True, "position": [p.x, p.y, p.z]}
+
+
+def _tool_delete_object(doc, arguments: dict) -> dict:
+    """Delete an object."""
+    if doc is None:
+        return {"success": False, "error": "No active document"}
+    obj = doc.getObject(arguments["name"])
+    if not obj:
+        return {"success": False, "error": "Object not found"}
+    doc.removeObject(obj.Name)
+    if arguments.get("recompute", True):
+        doc.recompute()
+    return {"success": True}
+
+
+def resolve_objects(doc, names: Optional[List[str]]) -> Tuple[list, List[str]]:
+    """
+    Resolve an exporter's objects argument in one pass.
+    
+    Args:
+        doc: FreeCAD document to look the names up in
+        names: Requested object names; empty or None selects every shape object
+    
+    Returns:
+        (objects found in request order, names not found), duplicates removed
+    """
+    if not names:
+        return shape_objects(doc), []
+    
+    found = []
+    missing = []
+    for name in dict.fromkeys(names):
+        obj = doc.getObject(name)
+        if obj is None:
+            missing.append(name)
+        else:
+            found.append(obj)
+    return found, missing
+
+
+def build_export_mesh(objs, tessellation: Optional[float]):
+    """
+    Mesh shape objects into a single mesh for STL export.
+    
+    Args:
+        objs: Objects with a Shape
+        tessellation: Linear deflection in mm, or None for a size-relative one
+    
+    Returns:
+        Combined Mesh.Mesh, or None if no object could be meshed
+    """
+    # Mesh all shapes as one compound so MeshPart builds a single mesh
+    # directly, with no per-object merge copies. Meshing stays on this
+    # thread: FreeCAD's bindings hold the GIL during meshFromShape, so a
+    # thread pool would not overlap the work, and worker processes would
+    # have to import FreeCAD and round-trip every shape through BRep text
+    combined_mesh = None
+    try:
+        compound = Part.makeCompound([o.Shape for o in objs])
+        deflection = tessellation or export_deflection(compound)
+        combined_mesh = MeshPart.meshFromShape(compound, LinearDeflection=deflection)
+    except Exception as e:
+        FreeCAD.Console.PrintWarning(f"Compound meshing failed, meshing objects one by one: {e}\n")
+    
+    if combined_mesh is None:
+        # Use MeshPart to properly convert shapes to mesh, skipping failures
+        shape_meshes = []
+        for o in objs:
             try:
-                ref_mesh = Mesh.Mesh(ref_path)
+                shape = o.Shape
+                deflection = tessellation or export_deflection(shape)
+                shape_meshes.append(MeshPart.meshFromShape(shape, LinearDeflection=deflection))
             except Exception as e:
-                return {"success": False, "error": f"Failed to load reference STL: {e}"}
-            
-            ref_points = [[p.x, p.y, p.z] for p in ref_mesh.Points]
-            if not ref_points:
-                return {"success": False, "error": "Reference STL has no points"}
-            
-            # Get current shapes and tessellate
-            current_shapes = [o for o in doc.Objects if hasattr(o, "Shape") and o.Shape.Volume > 0]
-            if not current_shapes:
-                return {"success": False, "error": "No shapes in document"}
-            
-            current_points = []
-            current_volume = 0.0
-            current_area = 0.0
-            
-            for obj in current_shapes:
-                try:
-                    vertices, faces = obj.Shape.tessellate(tess_accuracy)
-                    for v in vertices:
-                        current_points.append([v.x, v.y, v.z])
-                    current_volume += obj.Shape.Volume
-                    current_area += obj.Shape.Area
-                except Exception as e:
-                    FreeCAD.Console.PrintWarning(f"Failed to tessellate {obj.Name}: {e}\n")
-            
-            if not current_points:
-                return {"success": False, "error": "Failed to tessellate current shapes"}
-            
-            # Compute Hausdorff distance (sample for speed)
-            import math
-            
-            def distance(p1, p2):
-                return math.sqrt(sum((a - b) ** 2 for a, b in zip(p1, p2)))
-            
-            def min_distance_to_set(point, point_set, sample_rate=10):
-                """Find minimum distance from point to any point in set."""
-                min_dist = float('inf')
-                for i, p in enumerate(point_set):
-                    if i % sample_rate == 0:  # Sample for speed
-                        d = distance(point, p)
-                        if d < min_dist:
-                            min_dist = d
-                return min_dist
-            
-            # Sample points for faster computation
-            sample_rate = max(1, len(ref_points) // 500)
-            sampled_ref = ref_points[::sample_rate]
-            sampled_current = current_points[::sample_rate]
-            
-            # Directed Hausdorff: ref -> current
-            max_ref_to_current = 0.0
-            for p in sampled_ref:
-                d = min_distance_to_set(p, current_points, sample_rate=1)
-                if d > max_ref_to_current:
-                    max_ref_to_current = d
-            
-            # Directed Hausdorff: current -> ref
-            max_current_to_ref = 0.0
-            for p in sampled_current:
-                d = min_distance_to_set(p, ref_points, sample_rate=1)
-                if d > max_current_to_ref:
-                    max_current_to_ref = d
-            
-            hausdorff = max(max_ref_to_current, max_current_to_ref)
-            
-            # Get reference mesh metrics
-            ref_volume = ref_mesh.Volume
-            ref_area = ref_mesh.Area
-            
-            # Compute errors
-            volume_error = abs(ref_volume - current_volume) / ref_volume if ref_volume > 0 else 0
-            area_error = abs(ref_area - current_area) / ref_area if ref_area > 0 else 0
+                FreeCAD.Console.PrintWarning(f"Failed to mesh {o.Name}: {e}\n")
+        
+        if not shape_meshes:
+            return None
+        
+        # Merge into the largest mesh so its facets are never copied; a
+        # single mesh is written as is. Rebuilding one Mesh.Mesh from the
+        # concatenated Topology lists would box every point and facet in
+        # Python, which costs more than addMesh's C++ merge
+        shape_meshes.sort(key=lambda m: m.CountFacets, reverse=True)
+        combined_mesh = shape_meshes[0]
+        for shape_mesh in shape_meshes[1:]:
+            combined_mesh.addMesh(shape_mesh)
+    
+    return combined_mesh
+
+
+def _tool_export_stl(doc, arguments: dict) -> dict:
+    """Export to STL file."""
+    if doc is None:
+        return {"success": False, "error": "No active document"}
+    objs, missing = resolve_objects(doc, arguments.get("objects"))
+    if missing:
+        return {"success": False, "error": f"Objects not found: {', '.join(missing)}"}
+    objs = [o for o in objs if hasattr(o, "Shape")]
+    if not objs:
+        return {"success": False, "error": "No objects"}
+    
+    tessellation = arguments.get("tessellation")
+    
+    # Reuse the mesh of an earlier export while every shape is the same
+    # one. The entry holds the exported shapes, which keeps their OCC data
+    # alive, so isSame() cannot be fooled by a recomputed shape that reuses
+    # a freed address (hashCode alone could be)
+    shapes = [o.Shape for o in objs]
+    cache_key = (doc.Name, tuple(o.Name for o in objs), tessellation)
+    cached = _export_mesh_cache.get(cache_key)
+    if cached is not None and all(old.isSame(new) for old, new in zip(cached[0], shapes)):
+        _export_mesh_cache.move_to_end(cache_key)
+        combined_mesh = cached[1]
+    else:
+        combined_mesh = build_export_mesh(objs, tessellation)
+        if combined_mesh is None:
+            _export_mesh_cache.pop(cache_key, None)
+            return {"success": False, "error": "Failed to create mesh from shapes"}
+        if combined_mesh.CountPoints > 0:
+            # Cached meshes are only ever written, never modified
+            _export_mesh_cache[cache_key] = (shapes, combined_mesh)
+            _export_mesh_cache.move_to_end(cache_key)
+            if len(_export_mesh_cache) > EXPORT_MESH_CACHE_SIZE:
+                _export_mesh_cache.popitem(last=False)
+        else:
+            _export_mesh_cache.pop(cache_key, None)
+    
+    if combined_mesh.CountPoints == 0:
+        return {"success": False, "error": "Failed to create mesh from shapes"}
+    
+    # The mesh is a standalone kernel object, detached from the document, so
+    # execute_tool writes it after the main-thread dispatch has returned
+    path = arguments["path"]
+    return {
+        "success": True,
+        "path": path,
+        "points": combined_mesh.CountPoints,
+        DEFERRED_IO_KEY: functools.partial(combined_mesh.write, path),
+    }
+
+
+def _tool_export_step(doc, arguments: dict) -> dict:
+    """Export to STEP file."""
+    if doc is None:
+        return {"success": False, "error": "No active document"}
+    objs, missing = resolve_objects(doc, arguments.get("objects"))
+    if missing:
+        return {"success": False, "error": f"Objects not found: {', '.join(missing)}"}
+    if not objs:
+        return {"success": False, "error": "No objects"}
+    Part.export(objs, arguments["path"])
+    return {"success": True, "path": arguments["path"]}
+
+
+def _tool_get_object_info(doc, arguments: dict) -> dict:
+    """Get object information."""
+    # Allow querying specific document in dual mode
+    doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
+    query_doc = doc
+    if is_dual_mode():
+        if doc_param == "target":
+            query_doc = get_target_doc()
+        elif doc_param == "work":
+            query_doc = get_work_doc()
+    
+    if query_doc is None:
+        return {"success": False, "error": "No active document"}
+    obj = query_doc.getObject(arguments["name"])
+    if not obj:
+        return {"success": False, "error": f"Object '{arguments['name']}' not found in {query_doc.Name}"}
+    info = {"name": obj.Name, "type": obj.TypeId, "document": query_doc.Name}
+    s = getattr(obj, "Shape", None)
+    if s is not None:
+        info["volume"] = round(s.Volume, 2)
+        info["area"] = round(s.Area, 2)
+        b = s.BoundBox
+        info["bounds"] = {"min": [b.XMin, b.YMin, b.ZMin], "max": [b.XMax, b.YMax, b.ZMax]}
+    # For mesh objects, include mesh-specific info
+    if obj.TypeId == "Mesh::Feature" and hasattr(obj, "Mesh"):
+        mesh = obj.Mesh
+        info["points"] = mesh.CountPoints
+        info["facets"] = mesh.CountFacets
+        info["volume"] = round(mesh.Volume, 2)
+        info["area"] = round(mesh.Area, 2)
+        b = mesh.BoundBox
+        info["bounds"] = {"min": [b.XMin, b.YMin, b.ZMin], "max": [b.XMax, b.YMax, b.ZMax]}
+    return {"success": True, "info": info}
+
+
+def _tool_save_document(doc, arguments: dict) -> dict:
+    """Save the document."""
+    if doc is None:
+        return {"success": False, "error": "No active document"}
+    path = arguments.get("path")
+    if path:
+        doc.saveAs(path)
+    elif doc.FileName:
+        doc.save()
+    else:
+        return {"success": False, "error": "Path required for new document"}
+    return {"success": True, "path": doc.FileName}
+
+
+def _tool_recompute(doc, arguments: dict) -> dict:
+    """Recompute the document."""
+    if doc is None:
+        return {"success": False, "error": "No active document"}
+    doc.recompute()
+    return {"success": True}
+
+
+def _tool_compare_to_stl(doc, arguments: dict) -> dict:
+    """Compare current document shapes to a reference STL file."""
+    import numpy as np
+    
+    if doc is None:
+        return {"success": False, "error": "No active document"}
+    
+    ref_path = arguments.get("reference_path")
+    if not ref_path or not os.path.isfile(ref_path):
+        return {"success": False, "error": f"Reference file not found: {ref_path}"}
+    
+    tolerance = arguments.get("tolerance", 1.0)
+    tess_accuracy = arguments.get("tessellation", 0.1)
+    
+    # Past a margin over the tolerance the shape clearly doesn't match, so the
+    # sweeps may stop early unless the caller wants the exact distance (a
+    # non-positive tolerance leaves no margin to stop at)
+    if arguments.get("exact_distance", False) or tolerance <= 0:
+        early_exit_bound = None
+    else:
+        early_exit_bound = tolerance * HAUSDORFF_EARLY_EXIT_FACTOR
+    
+    # Load reference STL, its search index and its query points (cached
+    # across calls while the file is unchanged)
+    try:
+        ref_key = reference_cache_key(ref_path)
+        ref_points, ref_volume, ref_area = _load_reference_mesh(*ref_key)
+        if len(ref_points) == 0:
+            return {"success": False, "error": "Reference STL has no points"}
+        ref_index = _load_reference_index(*ref_key)
+        ref_queries = _load_reference_queries(*ref_key)
+    except Exception as e:
+        return {"success": False, "error": f"Failed to load reference STL: {e}"}
+    
+    # Get current shapes and tessellate
+    current_shapes = [o for o in shape_objects(doc) if o.Shape.Solids]
+    if not current_shapes:
+        return {"success": False, "error": "No shapes in document"}
+    
+    # Measure the tessellation itself, like the reference STL
+    meshes, current_volume, current_area = tessellate_objects(current_shapes, tess_accuracy)
+    current_chunks = [arr.astype(np.float32) for _, arr in meshes]
+    
+    current_points = np.concatenate(current_chunks) if current_chunks else np.empty((0, 3), dtype=np.float32)
+    if len(current_points) == 0:
+        return {"success": False, "error": "Failed to tessellate current shapes"}
+    
+    # Indexed queries are cheap enough to use every point in both directions;
+    # cKDTree already spreads each query over all cores (workers=-1), and a
+    # first direction over the bound makes the second unnecessary
+    hausdorff = directed_hausdorff(ref_queries, current_points, early_exit_bound)
+    if hausdorff != float('inf'):
+        hausdorff = max(hausdorff, directed_hausdorff(current_points, ref_points, early_exit_bound, ref_index))
+    hausdorff_exact = hausdorff != float('inf')
+    
+    # Compute errors
+    volume_error = abs(ref_volume - current_volume) / ref_volume if ref_volume > 0 else 0
+    area_error = abs(ref_area - current_area) / ref_area if ref_area > 0 else 0
+    
+    is_match = hausdorff_exact and hausdorff <= tolerance and volume_error <= 0.05
+    
+    return {
+        "success": True,
+        # Past the early-exit bound the distance is unknown, only its lower limit
+        "hausdorff_distance": round(hausdorff, 4) if hausdorff_exact else None,
+        "hausdorff_lower_bound": None if hausdorff_exact else early_exit_bound,
+        "hausdorff_exact": hausdorff_exact,
+        "is_match": is_match,
+        "tolerance": tolerance,
+        "reference_volume": round(ref_volume, 2),
+        "current_volume": round(current_volume, 2),
+        "volume_error": round(volume_error, 4),
+        "reference_area": round(ref_area, 2),
+        "current_area": round(current_area, 2),
+        "area_error": round(area_error, 4),
+        "reference_points": len(ref_points),
+        "current_points": len(current_points),
+    }
+
+
+def _tool_get_mesh_points(doc, arguments: dict) -> dict:
+    """Export current shapes as point cloud for external comparison."""
+    import numpy as np
+    
+    if doc is None:
+        return {"success": False, "error": "No active document"}
+    
+    tess_accuracy = arguments.get("tessellation", 0.1)
+    sample_rate = arguments.get("sample_rate", 1)
+    encoding = arguments.get("encoding", "list")
+    if encoding not in ("list", "base64"):
+        return {"success": False, "error": f"Unknown encoding: {encoding}. Use 'list' or 'base64'"}
+    
+    current_shapes = [o for o in shape_objects(doc) if o.Shape.Solids]
+    if not current_shapes:
+        return {"success": False, "error": "No shapes in document"}
+    
+    meshes, total_volume, total_area = tessellate_objects(current_shapes, tess_accuracy)
+    point_chunks = [arr[::sample_rate].astype(np.float32) for _, arr in meshes]
+    all_points = np.concatenate(point_chunks) if point_chunks else np.empty((0, 3), dtype=np.float32)
+    
+    # One reduction over the whole cloud; no bounds (rather than +/-inf,
+    # which is not valid JSON) when nothing was tessellated
+    if len(all_points):
+        bounds_min = np.round(all_points.min(axis=0).astype(np.float64), 2).tolist()
+        bounds_max = np.round(all_points.max(axis=0).astype(np.float64), 2).tolist()
+    else:
+        bounds_min = bounds_max = None
+    
+    result = {"success": True}
+    if encoding == "base64":
+        # Raw little-endian float32 triples: 12 bytes per point instead of a JSON list
+        result["points_b64"] = _base64_impl.b64encode(all_points.astype('<f4').tobytes()).decode('ascii')
+        result["dtype"] = "float32"
+        result["shape"] = list(all_points.shape)
+    else:
+        # Round in double precision so the JSON keeps short decimal forms
+        result["points"] = np.round(all_points.astype(np.float64), 4).tolist()
+    
+    result.update({
+        "point_count": len(all_points),
+        "volume": round(total_volume, 2),
+        "area": round(total_area, 2),
+        "bounds_min": bounds_min,
+        "bounds_max": bounds_max,
+    })
+    return result
+
+
+def _tool_take_screenshot(doc, arguments: dict) -> dict:
+    """Take a screenshot."""
+    width = arguments.get("width", _screenshot_width)
+    height = arguments.get("height", _screenshot_height)
+    background = arguments.get("background", "White")
+    mode = arguments.get("mode", "split" if is_dual_mode() else "single")
+    
+    if is_dual_mode():
+        if mode == "split":
+            screenshot = capture_split_view(width // 2, height)
+        elif mode == "target":
+            screenshot = capture_document_viewport(_target_doc_name, width, height)
+        elif mode == "work":
+            screenshot = capture_document_viewport(_work_doc_name, width, height)
+        else:
+            screenshot = capture_split_view(width // 2, height)
+    else:
+        screenshot = capture_viewport_base64(width, height, background)
+    
+    if screenshot:
+        return {"success": True, "screenshot": screenshot, "width": width, "height": height, "mode": mode}
+    else:
+        return {"success": False, "error": "Failed to capture screenshot (GUI may not be available)"}
+
+
+def _tool_set_view(doc, arguments: dict) -> dict:
+    """Set camera to a preset view angle for a specific document."""
+    try:
+        preset = arguments.get("preset", "isometric").lower()
+        doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
+        
+        def apply_view_preset(view, preset_name):
+            """Apply a view preset to a view."""
+            if preset_name == "front":
+                view.viewFront()
+            elif preset_name == "back":
+                view.viewRear()
+            elif preset_name == "top":
+                view.viewTop()
+            elif preset_name == "bottom":
+                view.viewBottom()
+            elif preset_name == "left":
+                view.viewLeft()
+            elif preset_name == "right":
+                view.viewRight()
+            elif preset_name == "isometric":
+                view.viewIsometric()
+            else:
+                return False
+            view.fitAll()
+            return True
+        
+        docs_to_update = resolve_docs_to_update(doc_param)
+        if docs_to_update is None:
+            return {"success": False, "error": "No active document with view"}
+        updated_docs = for_each_active_view(docs_to_update, lambda view: apply_view_preset(view, preset))
+        
+        sync_ui(arguments)
+        
+        if not updated_docs:
+            return {"success": False, "error": f"Unknown view preset: {preset}. Use: front/back/top/bottom/left/right/isometric"}
+        
+        return {"success": True, "view": preset, "documents": updated_docs}
+    except Exception as e:
+        return {"success": False, "error": f"Failed to set view: {e}"}
+
+
+def _tool_fit_all(doc, arguments: dict) -> dict:
+    """Fit camera to show all objects in the viewport."""
+    try:
+        doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
+        
+        docs_to_update = resolve_docs_to_update(doc_param)
+        if docs_to_update is None:
+            return {"success": False, "error": "No active document with view"}
+        updated_docs = for_each_active_view(docs_to_update, lambda view: view.fitAll())
+        
+        sync_ui(arguments)
+        
+        return {"success": True, "documents": updated_docs}
+    except Exception as e:
+        return {"success": False, "error": f"Failed to fit view: {e}"}
+
+
+def _tool_import_stl(doc, arguments: dict) -> dict:
+    """Import an STL file as a visible mesh object."""
+    import os as os_module  # Local import to avoid scoping issues
+    
+    stl_path = arguments.get("path")
+    if not stl_path:
+        return {"success": False, "error": "Path is required"}
+    
+    if not os_module.path.isfile(stl_path):
+        return {"success": False, "error": f"File not found: {stl_path}"}
+    
+    if doc is None:
+        doc = FreeCAD.newDocument("Unnamed")
+    
+    try:
+        # Import the STL mesh. Mesh.insert parses with the native mesh reader
+        # (no BRep conversion), so there is no faster path via Python facet
+        # lists. Objects are appended in creation order, so only the ones past
+        # the previous count need checking
+        object_count = len(doc.Objects)
+        Mesh.insert(stl_path, doc.Name)
+        
+        # Find the imported object (it's the last mesh object added)
+        mesh_objects = [o for o in doc.Objects[object_count:] if o.TypeId == "Mesh::Feature"]
+        if mesh_objects:
+            imported = mesh_objects[-1]
+            obj_name = arguments.get("name")
+            if obj_name:
+                imported.Label = obj_name
             
-            is_match = hausdorff <= tolerance and volume_error <= 0.05
+            # Fit view to show the imported object
+            try:
+                if FreeCADGui.ActiveDocument:
+                    FreeCADGui.ActiveDocument.ActiveView.fitAll()
+            except:
+                pass
             
             return {
                 "success": True,
-                "hausdorff_distance": round(hausdorff, 4),
-                "is_match": is_match,
-                "tolerance": tolerance,
-                "reference_volume": round(ref_volume, 2),
-                "current_volume": round(current_volume, 2),
-                "volume_error": round(volume_error, 4),
-                "reference_area": round(ref_area, 2),
-                "current_area": round(current_area, 2),
-                "area_error": round(area_error, 4),
-                "reference_points": len(ref_points),
-                "current_points": len(current_points),
+                "name": imported.Name,
+                "label": imported.Label,
+                "points": imported.Mesh.CountPoints,
+                "facets": imported.Mesh.CountFacets
             }
+        else:
+            return {"success": False, "error": "Failed to import mesh"}
+    except Exception as e:
+        return {"success": False, "error": f"Failed to import STL: {e}"}
+
+
+def _tool_set_visibility(doc, arguments: dict) -> dict:
+    """Show or hide objects in the viewport."""
+    try:
+        if doc is None:
+            return {"success": False, "error": "No active document"}
         
-        elif name == "get_mesh_points":
-            if doc is None:
-                return {"success": False, "error": "No active document"}
-            
-            tess_accuracy = arguments.get("tessellation", 0.1)
-            sample_rate = arguments.get("sample_rate", 1)
-            
-            current_shapes = [o for o in doc.Objects if hasattr(o, "Shape") and o.Shape.Volume > 0]
-            if not current_shapes:
-                return {"success": False, "error": "No shapes in document"}
-            
-            points = []
-            total_volume = 0.0
-            total_area = 0.0
-            bounds_min = [float('inf')] * 3
-            bounds_max = [float('-inf')] * 3
-            
-            for obj in current_shapes:
-                try:
-                    vertices, faces = obj.Shape.tessellate(tess_accuracy)
-                    for i, v in enumerate(vertices):
-                        if i % sample_rate == 0:
-                            points.append([round(v.x, 4), round(v.y, 4), round(v.z, 4)])
-                            for j in range(3):
-                                coord = [v.x, v.y, v.z][j]
-                                bounds_min[j] = min(bounds_min[j], coord)
-                                bounds_max[j] = max(bounds_max[j], coord)
-                    total_volume += obj.Shape.Volume
-                    total_area += obj.Shape.Area
-                except Exception as e:
-                    FreeCAD.Console.PrintWarning(f"Failed to tessellate {obj.Name}: {e}\n")
+        obj_name = arguments.get("name")
+        visible = arguments.get("visible", True)
+        
+        if obj_name == "*":
+            # Set visibility for all objects
+            # Only write objects whose state differs; every write triggers a
+            # scene graph notification even when the value is unchanged
+            view_objects = [vo for vo in (getattr(o, "ViewObject", None) for o in doc.Objects) if vo]
+            changed = 0
+            for vo in view_objects:
+                if vo.Visibility != visible:
+                    vo.Visibility = visible
+                    changed += 1
+            return {"success": True, "objects_affected": len(view_objects), "objects_changed": changed, "visible": visible}
+        else:
+            obj = doc.getObject(obj_name)
+            if not obj:
+                return {"success": False, "error": f"Object not found: {obj_name}"}
             
-            return {
-                "success": True,
-                "points": points,
-                "point_count": len(points),
-                "volume": round(total_volume, 2),
-                "area": round(total_area, 2),
-                "bounds_min": [round(b, 2) for b in bounds_min],
-                "bounds_max": [round(b, 2) for b in bounds_max],
-            }
+            view_object = getattr(obj, "ViewObject", None)
+            if view_object:
+                if view_object.Visibility != visible:
+                    view_object.Visibility = visible
+                return {"success": True, "name": obj_name, "visible": visible}
+            else:
+                return {"success": False, "error": f"Object has no ViewObject: {obj_name}"}
+    except Exception as e:
+        return {"success": False, "error": f"Failed to set visibility: {e}"}
+
+
+# Axis index (x=0, y=1, z=2) for each rotate_view angle, in application order
+_VIEW_ROTATION_AXES = (("yaw", 2), ("pitch", 0), ("roll", 1))
+
+
+def view_rotation_quaternion(yaw: float, pitch: float, roll: float):
+    """
+    Compose yaw (about Z), then pitch (about X), then roll (about Y) into one quaternion.
+    
+    Zero angles are skipped, so the common single-axis call costs one sin/cos pair.
+    
+    Args:
+        yaw, pitch, roll: Angles in degrees
+    
+    Returns:
+        (x, y, z, w) quaternion, or None if all angles are zero
+    """
+    angles = {"yaw": yaw, "pitch": pitch, "roll": roll}
+    q = None
+    for key, axis in _VIEW_ROTATION_AXES:
+        degrees = angles[key]
+        if degrees == 0:
+            continue
+        half = math.radians(degrees) / 2.0
+        v = [0.0, 0.0, 0.0]
+        v[axis] = math.sin(half)
+        step = (v[0], v[1], v[2], math.cos(half))
+        if q is None:
+            q = step
+            continue
+        # Hamilton product step * q (applies q first)
+        x1, y1, z1, w1 = step
+        x2, y2, z2, w2 = q
+        q = (w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+             w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+             w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+             w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2)
+    return q
+
+
+def _tool_rotate_view(doc, arguments: dict) -> dict:
+    """Rotate the camera view by specified angles for a specific document."""
+    try:
+        yaw = arguments.get("yaw", 0)
+        pitch = arguments.get("pitch", 0)
+        roll = arguments.get("roll", 0)
+        doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
+        
+        q = view_rotation_quaternion(yaw, pitch, roll)
+        if q is None:
+            # Nothing to rotate; skip document activation entirely
+            return {"success": True, "yaw": yaw, "pitch": pitch, "roll": roll, "documents": []}
+        delta = FreeCAD.Rotation(*q)
+        
+        def apply_rotation(view):
+            """Apply rotation to a view."""
+            view.setCameraOrientation(delta.multiply(view.getCameraOrientation()))
+        
+        docs_to_update = resolve_docs_to_update(doc_param)
+        if docs_to_update is None:
+            return {"success": False, "error": "No active document with view"}
+        updated_docs = for_each_active_view(docs_to_update, apply_rotation)
+        
+        sync_ui(arguments)
+        
+        return {"success": True, "yaw": yaw, "pitch": pitch, "roll": roll, "documents": updated_docs}
+    except Exception as e:
+        return {"success": False, "error": f"Failed to rotate view: {e}"}
+
+# === Display Mode Tools ===
+
+
+def _tool_set_display_mode(doc, arguments: dict) -> dict:
+    """Change how an object renders."""
+    try:
+        if doc is None:
+            return {"success": False, "error": "No active document"}
+        
+        obj_name = arguments.get("object")
+        mode = arguments.get("mode", "solid").lower()
+        try:
+            transparency = max(0, min(100, int(arguments.get("transparency", 70))))
+        except (TypeError, ValueError):
+            return {"success": False, "error": "transparency must be a number between 0 and 100"}
+        
+        obj = doc.getObject(obj_name)
+        if not obj:
+            return {"success": False, "error": f"Object not found: {obj_name}"}
+        
+        vo = getattr(obj, "ViewObject", None)
+        if vo is None:
+            return {"success": False, "error": f"Object has no ViewObject: {obj_name}"}
+        
+        if mode == "transparent":
+            vo.Transparency = transparency
+            vo.DisplayMode = "Shaded"
+        elif mode == "wireframe":
+            vo.Transparency = 0
+            vo.DisplayMode = "Wireframe"
+        elif mode == "solid":
+            vo.Transparency = 0
+            vo.DisplayMode = "Shaded"
+        else:
+            return {"success": False, "error": f"Unknown mode: {mode}. Use: solid, transparent, wireframe"}
+        
+        return {"success": True, "object": obj_name, "mode": mode, "transparency": vo.Transparency}
+    except Exception as e:
+        return {"success": False, "error": f"Failed to set display mode: {e}"}
+
+
+# Clipping axis -> (bbox index, unit normal components)
+_CLIP_AXES = {"X": (0, (1, 0, 0)), "Y": (1, (0, 1, 0)), "Z": (2, (0, 0, 1))}
+
+
+def toggle_clipping_plane(target, toggle_val: int, placement: FreeCAD.Placement):
+    """Toggle a view or viewer clipping plane, falling back to the one-argument API on older FreeCAD."""
+    try:
+        target.toggleClippingPlane(toggle_val, False, True, placement)
+    except TypeError:
+        target.toggleClippingPlane(toggle_val)
+
+
+def remove_fallback_clip_plane(doc_name: str, viewer):
+    """
+    Remove the Coin clip plane node set_clipping_plane inserted for a document, if any.
+    
+    The node is remembered at insertion, so removal is a single findChild
+    call instead of a Python scan over the scene graph's children.
+    """
+    clip = _fallback_clip_planes.pop(doc_name, None)
+    if clip is None or viewer is None or not hasattr(viewer, "getSoRenderManager"):
+        return
+    sg = viewer.getSoRenderManager().getSceneGraph()
+    index = sg.findChild(clip)
+    if index >= 0:
+        sg.removeChild(index)
+
+
+def _tool_set_clipping_plane(doc, arguments: dict) -> dict:
+    """Enable a cross-section clipping plane to reveal internal surfaces."""
+    if FreeCADGui is None:
+        return {"success": False, "error": "Clipping planes require FreeCAD GUI. Start FreeCAD (not FreeCADCmd/headless) and try again."}
+    
+    try:
+        axis = arguments.get("axis", "X").upper()
+        try:
+            percent = float(arguments.get("percent", 50.0))
+        except (TypeError, ValueError):
+            return {"success": False, "error": "percent must be a number between 0 and 100"}
+        enabled = arguments.get("enabled", True)
+        
+        if axis not in _CLIP_AXES:
+            return {"success": False, "error": f"Invalid axis: {axis}. Use X, Y, or Z"}
+        if percent < 0 or percent > 100:
+            return {"success": False, "error": "Percent must be between 0 and 100"}
+        
+        gui_doc = FreeCADGui.ActiveDocument
+        if gui_doc is None:
+            return {"success": False, "error": "No active document with view"}
+        
+        view = gui_doc.ActiveView
+        if view is None:
+            return {"success": False, "error": "No active view"}
+        
+        # Prefer the ActiveView API; fall back to underlying viewer
+        viewer = None
+        try:
+            viewer = view.getViewer()
+        except Exception:
+            viewer = None
+        
+        if hasattr(view, "toggleClippingPlane"):
+            clip_target = view
+        elif viewer is not None and hasattr(viewer, "toggleClippingPlane"):
+            clip_target = viewer
+        else:
+            return {"success": False, "error": "Viewer does not support clipping planes"}
+        toggle_handler = functools.partial(toggle_clipping_plane, clip_target)
+        
+        # Always remove any existing clip plane so we can reapply with new settings
+        try:
+            toggle_handler(0, FreeCAD.Placement())
+        except Exception as e:
+            return {"success": False, "error": f"Failed to reset clipping plane: {e}"}
+        # Also remove any fallback Coin3D clip plane we may have added
+        doc_name = FreeCADGui.ActiveDocument.Document.Name
+        try:
+            remove_fallback_clip_plane(doc_name, viewer)
+        except Exception:
+            pass
+        
+        if not enabled:
+            sync_ui(arguments)
+            return {"success": True, "clipping": False}
+        
+        # Get bounding box to calculate position
+        bbox = get_scene_bounding_box()
+        if not bbox:
+            return {"success": False, "error": "No objects in scene to clip"}
+        
+        axis_idx, mask = _CLIP_AXES[axis]
+        min_val = bbox["min"][axis_idx]
+        max_val = bbox["max"][axis_idx]
+        position = min_val + (max_val - min_val) * (percent / 100.0)
+        
+        normal = FreeCAD.Vector(*mask)
+        point = normal * position
+        
+        # Align FreeCAD's clip plane with the requested axis and location
+        rotation = FreeCAD.Rotation(FreeCAD.Vector(0, 0, -1), normal)
+        placement = FreeCAD.Placement(point, rotation)
+        
+        # Apply via viewer API, then fall back to Coin3D insertion if needed
+        clip_applied = False
+        try:
+            toggle_handler(1, placement)
+            # Verify if the viewer reports a clipping plane
+            for candidate in (view, viewer):
+                if candidate and hasattr(candidate, "hasClippingPlane"):
+                    try:
+                        if candidate.hasClippingPlane():
+                            clip_applied = True
+                            break
+                    except Exception:
+                        pass
+        except Exception as e:
+            return {"success": False, "error": f"Failed to apply clipping plane: {e}"}
+        
+        if not clip_applied:
+            try:
+                from pivy import coin
+                if viewer is not None and hasattr(viewer, "getSoRenderManager"):
+                    sg = viewer.getSoRenderManager().getSceneGraph()
+                    clip = coin.SoClipPlane()
+                    clip.setName("MCP_ClipPlane")
+                    plane = coin.SbPlane(
+                        coin.SbVec3f(normal.x, normal.y, normal.z),
+                        coin.SbVec3f(point.x, point.y, point.z)
+                    )
+                    clip.plane.setValue(plane)
+                    clip.on.setValue(True)
+                    sg.insertChild(clip, 0)
+                    _fallback_clip_planes[doc_name] = clip
+                    clip_applied = True
+            except ImportError:
+                pass
+            except Exception as e:
+                FreeCAD.Console.PrintWarning(f"Fallback clip plane failed: {e}\n")
+        
+        sync_ui(arguments)
+        
+        return {
+            "success": True,
+            "clipping": True,
+            "axis": axis,
+            "percent": percent,
+            "position_mm": round(position, 2)
+        }
+    except Exception as e:
+        return {"success": False, "error": f"Failed to set clipping plane: {e}"}
+
+# === Camera Navigation Tools ===
+
+
+def zoom_camera(view, factor: float) -> bool:
+    """
+    Zoom a view's camera by an exact factor in one step.
+    
+    Orthographic cameras shrink their view height; perspective cameras dolly
+    toward the focal point, as the navigation styles do for wheel zoom.
+    
+    Args:
+        view: FreeCAD 3D view
+        factor: Magnification (>1 zooms in, <1 zooms out)
+    
+    Returns:
+        True if the camera was updated, False if the view has no camera node
+    """
+    cam = view.getCameraNode()
+    if cam is None:
+        return False
+    
+    if hasattr(cam, "height"):
+        cam.height.setValue(cam.height.getValue() / factor)
+        return True
+    
+    focal = cam.focalDistance.getValue()
+    new_focal = focal / factor
+    direction = view.getViewDirection()
+    step = focal - new_focal
+    x, y, z = cam.position.getValue().getValue()
+    cam.position.setValue(x + direction.x * step, y + direction.y * step, z + direction.z * step)
+    cam.focalDistance.setValue(new_focal)
+    return True
+
+
+def _tool_zoom(doc, arguments: dict) -> dict:
+    """Zoom camera in or out by a percentage."""
+    try:
+        if not getattr(FreeCAD, "GuiUp", False):
+            return {"success": False, "error": "Zoom requires FreeCAD GUI. Start FreeCAD (not FreeCADCmd/headless) and try again."}
         
-        elif name == "take_screenshot":
-            width = arguments.get("width", _screenshot_width)
-            height = arguments.get("height", _screenshot_height)
-            background = arguments.get("background", "White")
-            mode = arguments.get("mode", "split" if is_dual_mode() else "single")
-            
-            if is_dual_mode():
-                if mode == "split":
-                    screenshot = capture_split_view(width // 2, height)
-                elif mode == "target":
-                    screenshot = capture_document_viewport(_target_doc_name, width, height)
-                elif mode == "work":
-                    screenshot = capture_document_viewport(_work_doc_name, width, height)
-                else:
-                    screenshot = capture_split_view(width // 2, height)
-            else:
-                screenshot = capture_viewport_base64(width, height, background)
-            
-            if screenshot:
-                return {"success": True, "screenshot": screenshot, "width": width, "height": height, "mode": mode}
-            else:
-                return {"success": False, "error": "Failed to capture screenshot (GUI may not be available)"}
+        percent = arguments.get("percent", 100)
+        doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
         
-        elif name == "set_view":
-            try:
-                import FreeCADGui
-                from PySide2 import QtWidgets
-                
-                preset = arguments.get("preset", "isometric").lower()
-                doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
-                
-                def apply_view_preset(view, preset_name):
-                    """Apply a view preset to a view."""
-                    if preset_name == "front":
-                        view.viewFront()
-                    elif preset_name == "back":
-                        view.viewRear()
-                    elif preset_name == "top":
-                        view.viewTop()
-                    elif preset_name == "bottom":
-                        view.viewBottom()
-                    elif preset_name == "left":
-                        view.viewLeft()
-                    elif preset_name == "right":
-                        view.viewRight()
-                    elif preset_name == "isometric":
-                        view.viewIsometric()
-                    else:
-                        return False
-                    view.fitAll()
-                    return True
-                
-                # Determine which documents to apply the view to
-                docs_to_update = []
-                if is_dual_mode():
-                    if doc_param == "target":
-                        docs_to_update = [_target_doc_name]
-                    elif doc_param == "work":
-                        docs_to_update = [_work_doc_name]
-                    elif doc_param == "both":
-                        docs_to_update = [_target_doc_name, _work_doc_name]
-                    else:
-                        docs_to_update = [_work_doc_name]
-                else:
-                    if FreeCADGui.ActiveDocument is None:
-                        return {"success": False, "error": "No active document with view"}
-                    docs_to_update = [FreeCAD.ActiveDocument.Name]
-                
-                updated_docs = []
-                for doc_name in docs_to_update:
-                    if activate_document(doc_name):
-                        gui_doc = FreeCADGui.getDocument(doc_name)
-                        if gui_doc and gui_doc.ActiveView:
-                            if apply_view_preset(gui_doc.ActiveView, preset):
-                                updated_docs.append(doc_name)
-                
-                QtWidgets.QApplication.processEvents()
-                
-                if not updated_docs:
-                    return {"success": False, "error": f"Unknown view preset: {preset}. Use: front/back/top/bottom/left/right/isometric"}
-                
-                return {"success": True, "view": preset, "documents": updated_docs}
-            except Exception as e:
-                return {"success": False, "error": f"Failed to set view: {e}"}
+        if percent <= 0:
+            return {"success": False, "error": "Zoom percent must be positive"}
+        if percent == 100:
+            # No-op zoom; skip document activation entirely
+            return {"success": True, "zoom_percent": percent, "documents": []}
         
-        elif name == "fit_all":
+        factor = percent / 100.0
+        
+        def apply_zoom(view):
+            """Scale the camera once; fall back to navigation-style zoom steps."""
             try:
-                import FreeCADGui
-                from PySide2 import QtWidgets
-                
-                doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
-                
-                # Determine which documents to apply fit_all to
-                docs_to_update = []
-                if is_dual_mode():
-                    if doc_param == "target":
-                        docs_to_update = [_target_doc_name]
-                    elif doc_param == "work":
-                        docs_to_update = [_work_doc_name]
-                    elif doc_param == "both":
-                        docs_to_update = [_target_doc_name, _work_doc_name]
-                    else:
-                        docs_to_update = [_work_doc_name]
-                else:
-                    if FreeCADGui.ActiveDocument is None:
-                        return {"success": False, "error": "No active document with view"}
-                    docs_to_update = [FreeCAD.ActiveDocument.Name]
-                
-                updated_docs = []
-                for doc_name in docs_to_update:
-                    if activate_document(doc_name):
-                        gui_doc = FreeCADGui.getDocument(doc_name)
-                        if gui_doc and gui_doc.ActiveView:
-                            gui_doc.ActiveView.fitAll()
-                            updated_docs.append(doc_name)
-                
-                QtWidgets.QApplication.processEvents()
-                
-                return {"success": True, "documents": updated_docs}
+                if zoom_camera(view, factor):
+                    return True
             except Exception as e:
-                return {"success": False, "error": f"Failed to fit view: {e}"}
-        
-        elif name == "import_stl":
-            import Mesh
-            import os as os_module  # Local import to avoid scoping issues
-            
-            stl_path = arguments.get("path")
-            if not stl_path:
-                return {"success": False, "error": "Path is required"}
-            
-            if not os_module.path.exists(stl_path):
-                return {"success": False, "error": f"File not found: {stl_path}"}
+                FreeCAD.Console.PrintWarning(f"Direct camera zoom failed, stepping instead: {e}\n")
             
-            if doc is None:
-                doc = FreeCAD.newDocument("Unnamed")
+            # Empirical step factor similar to mouse wheel zoom
+            step_factor = 1.1
+            steps = max(1, int(abs(math.log(factor) / math.log(step_factor)) + 0.5))
             
             try:
-                # Import the STL mesh
-                mesh_obj = Mesh.insert(stl_path, doc.Name)
-                
-                # Find the imported object (it's the last mesh object added)
-                mesh_objects = [o for o in doc.Objects if o.TypeId == "Mesh::Feature"]
-                if mesh_objects:
-                    imported = mesh_objects[-1]
-                    obj_name = arguments.get("name")
-                    if obj_name:
-                        imported.Label = obj_name
-                    
-                    # Fit view to show the imported object
-                    try:
-                        import FreeCADGui
-                        if FreeCADGui.ActiveDocument:
-                            FreeCADGui.ActiveDocument.ActiveView.fitAll()
-                    except:
-                        pass
-                    
-                    return {
-                        "success": True,
-                        "name": imported.Name,
-                        "label": imported.Label,
-                        "points": imported.Mesh.CountPoints,
-                        "facets": imported.Mesh.CountFacets
-                    }
-                else:
-                    return {"success": False, "error": "Failed to import mesh"}
-            except Exception as e:
-                return {"success": False, "error": f"Failed to import STL: {e}"}
-        
-        elif name == "set_visibility":
-            try:
-                import FreeCADGui
-                
-                if doc is None:
-                    return {"success": False, "error": "No active document"}
-                
-                obj_name = arguments.get("name")
-                visible = arguments.get("visible", True)
-                
-                if obj_name == "*":
-                    # Set visibility for all objects
-                    count = 0
-                    for obj in doc.Objects:
-                        if hasattr(obj, "ViewObject") and obj.ViewObject:
-                            obj.ViewObject.Visibility = visible
-                            count += 1
-                    return {"success": True, "objects_affected": count, "visible": visible}
-                else:
-                    obj = doc.getObject(obj_name)
-                    if not obj:
-                        return {"success": False, "error": f"Object not found: {obj_name}"}
-                    
-                    if hasattr(obj, "ViewObject") and obj.ViewObject:
-                        obj.ViewObject.Visibility = visible
-                        return {"success": True, "name": obj_name, "visible": visible}
+                for _ in range(steps):
+                    if factor > 1.0:
+                        view.zoomIn()
                     else:
-                        return {"success": False, "error": f"Object has no ViewObject: {obj_name}"}
+                        view.zoomOut()
+                return True
             except Exception as e:
-                return {"success": False, "error": f"Failed to set visibility: {e}"}
+                FreeCAD.Console.PrintWarning(f"Zoom failed: {e}\n")
+                return False
         
-        elif name == "rotate_view":
-            try:
-                import FreeCADGui
-                from PySide2 import QtWidgets
-                
-                yaw = arguments.get("yaw", 0)
-                pitch = arguments.get("pitch", 0)
-                roll = arguments.get("roll", 0)
-                doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
-                
-                def apply_rotation(view, yaw_val, pitch_val, roll_val):
-                    """Apply rotation to a view."""
-                    current_rot = view.getCameraOrientation()
-                    
-                    if yaw_val != 0:
-                        rot_z = FreeCAD.Rotation(FreeCAD.Vector(0, 0, 1), yaw_val)
-                        current_rot = rot_z.multiply(current_rot)
-                    if pitch_val != 0:
-                        rot_x = FreeCAD.Rotation(FreeCAD.Vector(1, 0, 0), pitch_val)
-                        current_rot = rot_x.multiply(current_rot)
-                    if roll_val != 0:
-                        rot_y = FreeCAD.Rotation(FreeCAD.Vector(0, 1, 0), roll_val)
-                        current_rot = rot_y.multiply(current_rot)
-                    
-                    view.setCameraOrientation(current_rot)
-                
-                # Determine which documents to apply rotation to
-                docs_to_update = []
-                if is_dual_mode():
-                    if doc_param == "target":
-                        docs_to_update = [_target_doc_name]
-                    elif doc_param == "work":
-                        docs_to_update = [_work_doc_name]
-                    elif doc_param == "both":
-                        docs_to_update = [_target_doc_name, _work_doc_name]
-                    else:
-                        docs_to_update = [_work_doc_name]
-                else:
-                    if FreeCADGui.ActiveDocument is None:
-                        return {"success": False, "error": "No active document with view"}
-                    docs_to_update = [FreeCAD.ActiveDocument.Name]
-                
-                updated_docs = []
-                for doc_name in docs_to_update:
-                    if activate_document(doc_name):
-                        gui_doc = FreeCADGui.getDocument(doc_name)
-                        if gui_doc and gui_doc.ActiveView:
-                            apply_rotation(gui_doc.ActiveView, yaw, pitch, roll)
-                            updated_docs.append(doc_name)
-                
-                QtWidgets.QApplication.processEvents()
-                
-                return {"success": True, "yaw": yaw, "pitch": pitch, "roll": roll, "documents": updated_docs}
-            except Exception as e:
-                return {"success": False, "error": f"Failed to rotate view: {e}"}
+        docs_to_update = resolve_docs_to_update(doc_param)
+        if docs_to_update is None:
+            return {"success": False, "error": "No active document with view"}
+        updated_docs = for_each_active_view(docs_to_update, apply_zoom)
         
-        # === Display Mode Tools ===
-        elif name == "set_display_mode":
-            try:
-                import FreeCADGui
-                
-                if doc is None:
-                    return {"success": False, "error": "No active document"}
-                
-                obj_name = arguments.get("object")
-                mode = arguments.get("mode", "solid").lower()
-                transparency = arguments.get("transparency", 70)
-                
-                obj = doc.getObject(obj_name)
-                if not obj:
-                    return {"success": False, "error": f"Object not found: {obj_name}"}
-                
-                if not hasattr(obj, "ViewObject") or obj.ViewObject is None:
-                    return {"success": False, "error": f"Object has no ViewObject: {obj_name}"}
-                
-                vo = obj.ViewObject
-                
-                if mode == "transparent":
-                    vo.Transparency = int(transparency)
-                    vo.DisplayMode = "Shaded"
-                elif mode == "wireframe":
-                    vo.Transparency = 0
-                    vo.DisplayMode = "Wireframe"
-                elif mode == "solid":
-                    vo.Transparency = 0
-                    vo.DisplayMode = "Shaded"
-                else:
-                    return {"success": False, "error": f"Unknown mode: {mode}. Use: solid, transparent, wireframe"}
-                
-                return {"success": True, "object": obj_name, "mode": mode, "transparency": vo.Transparency}
-            except Exception as e:
-                return {"success": False, "error": f"Failed to set display mode: {e}"}
+        sync_ui(arguments)
+        
+        return {"success": True, "zoom_percent": percent, "documents": updated_docs}
+    except Exception as e:
+        return {"success": False, "error": f"Failed to zoom: {e}"}
+
+
+def _tool_pan(doc, arguments: dict) -> dict:
+    """Pan camera by percentage of viewport."""
+    try:
+        if not getattr(FreeCAD, "GuiUp", False):
+            return {"success": False, "error": "Pan requires FreeCAD GUI. Start FreeCAD (not FreeCADCmd/headless) and try again."}
+        
+        x_percent = arguments.get("x", 0)
+        y_percent = arguments.get("y", 0)
+        doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
         
-        elif name == "set_clipping_plane":
+        if x_percent == 0 and y_percent == 0:
+            # No-op pan; skip document activation entirely
+            return {"success": True, "pan_x": x_percent, "pan_y": y_percent, "documents": []}
+        
+        def apply_pan(view, pan_x, pan_y):
+            """Apply pan using camera placement (avoids direct Coin camera access)."""
             try:
-                import FreeCADGui
-                from PySide2 import QtWidgets
-                
-                axis = arguments.get("axis", "X").upper()
-                try:
-                    percent = float(arguments.get("percent", 50.0))
-                except (TypeError, ValueError):
-                    return {"success": False, "error": "percent must be a number between 0 and 100"}
-                enabled = arguments.get("enabled", True)
-                
-                if axis not in ["X", "Y", "Z"]:
-                    return {"success": False, "error": f"Invalid axis: {axis}. Use X, Y, or Z"}
-                if percent < 0 or percent > 100:
-                    return {"success": False, "error": "Percent must be between 0 and 100"}
-                
-                if FreeCADGui.ActiveDocument is None:
-                    return {"success": False, "error": "No active document with view"}
-                
-                view = FreeCADGui.ActiveDocument.ActiveView
-                if view is None:
-                    return {"success": False, "error": "No active view"}
+                current_pl = view.viewPosition()  # returns FreeCAD.Placement
+                if not current_pl:
+                    return False
                 
-                # Prefer the ActiveView API; fall back to underlying viewer
-                viewer = None
-                try:
-                    viewer = view.getViewer()
-                except Exception:
-                    viewer = None
-                
-                toggle_handler = None
-                if hasattr(view, "toggleClippingPlane"):
-                    def _toggle_clip(toggle_val: int, placement: FreeCAD.Placement):
-                        try:
-                            view.toggleClippingPlane(toggle_val, False, True, placement)
-                        except TypeError:
-                            view.toggleClippingPlane(toggle_val)
-                    toggle_handler = _toggle_clip
-                elif viewer is not None and hasattr(viewer, "toggleClippingPlane"):
-                    def _toggle_clip(toggle_val: int, placement: FreeCAD.Placement):
-                        try:
-                            viewer.toggleClippingPlane(toggle_val, False, True, placement)
-                        except TypeError:
-                            viewer.toggleClippingPlane(toggle_val)
-                    toggle_handler = _toggle_clip
-                
-                if toggle_handler is None:
-                    return {"success": False, "error": "Viewer does not support clipping planes"}
-                
-                # Always remove any existing clip plane so we can reapply with new settings
-                try:
-                    toggle_handler(0, FreeCAD.Placement())
-                except Exception as e:
-                    return {"success": False, "error": f"Failed to reset clipping plane: {e}"}
-                # Also remove any fallback Coin3D clip plane we may have added
-                try:
-                    from pivy import coin
-                    if viewer is not None and hasattr(viewer, "getSoRenderManager"):
-                        sg = viewer.getSoRenderManager().getSceneGraph()
-                        clip_name = "MCP_ClipPlane"
-                        for i in range(sg.getNumChildren()):
-                            child = sg.getChild(i)
-                            if hasattr(child, "getName") and child.getName() == clip_name:
-                                sg.removeChild(i)
-                                break
-                except ImportError:
-                    pass
-                except Exception:
-                    pass
-                
-                if not enabled:
-                    QtWidgets.QApplication.processEvents()
-                    return {"success": True, "clipping": False}
-                
-                # Get bounding box to calculate position
+                # Scene scale to keep pan movement reasonable
                 bbox = get_scene_bounding_box()
-                if not bbox:
-                    return {"success": False, "error": "No objects in scene to clip"}
-                
-                axis_idx = {"X": 0, "Y": 1, "Z": 2}[axis]
-                min_val = bbox["min"][axis_idx]
-                max_val = bbox["max"][axis_idx]
-                position = min_val + (max_val - min_val) * (percent / 100.0)
-                
-                normal = FreeCAD.Vector(0, 0, 0)
-                point = FreeCAD.Vector(0, 0, 0)
-                if axis == "X":
-                    normal = FreeCAD.Vector(1, 0, 0)
-                    point = FreeCAD.Vector(position, 0, 0)
-                elif axis == "Y":
-                    normal = FreeCAD.Vector(0, 1, 0)
-                    point = FreeCAD.Vector(0, position, 0)
-                else:  # Z
-                    normal = FreeCAD.Vector(0, 0, 1)
-                    point = FreeCAD.Vector(0, 0, position)
-                
-                # Align FreeCAD's clip plane with the requested axis and location
-                rotation = FreeCAD.Rotation(FreeCAD.Vector(0, 0, -1), normal)
-                placement = FreeCAD.Placement(point, rotation)
+                scene_span = bbox["max_dim"] if bbox else 100.0
+                scale = scene_span * 0.01  # 1% of span per 1% pan input
                 
-                # Apply via viewer API, then fall back to Coin3D insertion if needed
-                clip_applied = False
-                try:
-                    toggle_handler(1, placement)
-                    # Verify if the viewer reports a clipping plane
-                    for candidate in (view, viewer):
-                        if candidate and hasattr(candidate, "hasClippingPlane"):
-                            try:
-                                if candidate.hasClippingPlane():
-                                    clip_applied = True
-                                    break
-                            except Exception:
-                                pass
-                except Exception as e:
-                    return {"success": False, "error": f"Failed to apply clipping plane: {e}"}
+                right = current_pl.Rotation.multVec(FreeCAD.Vector(1, 0, 0))
+                up = current_pl.Rotation.multVec(FreeCAD.Vector(0, 1, 0))
                 
-                if not clip_applied:
-                    try:
-                        from pivy import coin
-                        # Remove any existing fallback clip
-                        if viewer is not None and hasattr(viewer, "getSoRenderManager"):
-                            sg = viewer.getSoRenderManager().getSceneGraph()
-                            clip_name = "MCP_ClipPlane"
-                            for i in range(sg.getNumChildren()):
-                                child = sg.getChild(i)
-                                if hasattr(child, "getName") and child.getName() == clip_name:
-                                    sg.removeChild(i)
-                                    break
-                            
-                            clip = coin.SoClipPlane()
-                            clip.setName(clip_name)
-                            plane = coin.SbPlane(
-                                coin.SbVec3f(normal.x, normal.y, normal.z),
-                                coin.SbVec3f(point.x, point.y, point.z)
-                            )
-                            clip.plane.setValue(plane)
-                            clip.on.setValue(True)
-                            sg.insertChild(clip, 0)
-                            clip_applied = True
-                    except ImportError:
-                        pass
-                    except Exception as e:
-                        FreeCAD.Console.PrintWarning(f"Fallback clip plane failed: {e}\n")
-                
-                QtWidgets.QApplication.processEvents()
+                offset = right * (pan_x * scale) + up * (pan_y * scale)
+                new_pos = current_pl.Base + offset
                 
-                return {
-                    "success": True,
-                    "clipping": True,
-                    "axis": axis,
-                    "percent": percent,
-                    "position_mm": round(position, 2)
-                }
+                new_pl = FreeCAD.Placement(new_pos, current_pl.Rotation)
+                view.viewPosition(new_pl)
+                return True
             except Exception as e:
-                return {"success": False, "error": f"Failed to set clipping plane: {e}"}
+                FreeCAD.Console.PrintWarning(f"Pan failed: {e}\n")
+                return False
         
-        # === Camera Navigation Tools ===
-        elif name == "zoom":
-            try:
-                import FreeCADGui
-                from PySide2 import QtWidgets
-                import math
-
-                if not getattr(FreeCAD, "GuiUp", False):
-                    return {"success": False, "error": "Zoom requires FreeCAD GUI. Start FreeCAD (not FreeCADCmd/headless) and try again."}
-                
-                percent = arguments.get("percent", 100)
-                doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
-                
-                if percent <= 0:
-                    return {"success": False, "error": "Zoom percent must be positive"}
-                
-                def apply_zoom(view, zoom_percent):
-                    """Apply zoom using the navigation style (avoids direct Coin camera access)."""
-                    if zoom_percent == 100:
-                        return True
-                    
-                    factor = zoom_percent / 100.0
-                    # Empirical step factor similar to mouse wheel zoom
-                    step_factor = 1.1
-                    steps = max(1, int(abs(math.log(factor) / math.log(step_factor)) + 0.5))
-                    
-                    try:
-                        for _ in range(steps):
-                            if factor > 1.0:
-                                view.zoomIn()
-                            else:
-                                view.zoomOut()
-                        return True
-                    except Exception as e:
-                        FreeCAD.Console.PrintWarning(f"Zoom failed: {e}\n")
-                        return False
-                
-                # Determine which documents to apply zoom to
-                docs_to_update = []
-                if is_dual_mode():
-                    if doc_param == "target":
-                        docs_to_update = [_target_doc_name]
-                    elif doc_param == "work":
-                        docs_to_update = [_work_doc_name]
-                    elif doc_param == "both":
-                        docs_to_update = [_target_doc_name, _work_doc_name]
-                    else:
-                        docs_to_update = [_work_doc_name]
-                else:
-                    if FreeCADGui.ActiveDocument is None:
-                        return {"success": False, "error": "No active document with view"}
-                    docs_to_update = [FreeCAD.ActiveDocument.Name]
-                
-                updated_docs = []
-                for doc_name in docs_to_update:
-                    if activate_document(doc_name):
-                        gui_doc = FreeCADGui.getDocument(doc_name)
-                        if gui_doc and gui_doc.ActiveView:
-                            if apply_zoom(gui_doc.ActiveView, percent):
-                                updated_docs.append(doc_name)
-                
-                QtWidgets.QApplication.processEvents()
-                
-                return {"success": True, "zoom_percent": percent, "documents": updated_docs}
-            except Exception as e:
-                return {"success": False, "error": f"Failed to zoom: {e}"}
+        docs_to_update = resolve_docs_to_update(doc_param)
+        if docs_to_update is None:
+            return {"success": False, "error": "No active document with view"}
+        updated_docs = for_each_active_view(docs_to_update, lambda view: apply_pan(view, x_percent, y_percent))
         
-        elif name == "pan":
-            try:
-                import FreeCADGui
-                from PySide2 import QtWidgets
+        sync_ui(arguments)
+        
+        return {"success": True, "pan_x": x_percent, "pan_y": y_percent, "documents": updated_docs}
+    except Exception as e:
+        return {"success": False, "error": f"Failed to pan: {e}"}
 
-                if not getattr(FreeCAD, "GuiUp", False):
-                    return {"success": False, "error": "Pan requires FreeCAD GUI. Start FreeCAD (not FreeCADCmd/headless) and try again."}
-                
-                x_percent = arguments.get("x", 0)
-                y_percent = arguments.get("y", 0)
-                doc_param = arguments.get("doc", "work" if is_dual_mode() else None)
-                
-                def apply_pan(view, pan_x, pan_y):
-                    """Apply pan using camera placement (avoids direct Coin camera access)."""
-                    try:
-                        current_pl = view.viewPosition()  # returns FreeCAD.Placement
-                        if not current_pl:
-                            return False
-                        
-                        # Scene scale to keep pan movement reasonable
-                        bbox = get_scene_bounding_box()
-                        scene_span = max(bbox["size"]) if bbox else 100.0
-                        scale = scene_span * 0.01  # 1% of span per 1% pan input
-                        
-                        right = current_pl.Rotation.multVec(FreeCAD.Vector(1, 0, 0))
-                        up = current_pl.Rotation.multVec(FreeCAD.Vector(0, 1, 0))
-                        
-                        offset = right * (pan_x * scale) + up * (pan_y * scale)
-                        new_pos = current_pl.Base + offset
-                        
-                        new_pl = FreeCAD.Placement(new_pos, current_pl.Rotation)
-                        view.viewPosition(new_pl)
-                        return True
-                    except Exception as e:
-                        FreeCAD.Console.PrintWarning(f"Pan failed: {e}\n")
-                        return False
-                
-                # Determine which documents to apply pan to
-                docs_to_update = []
-                if is_dual_mode():
-                    if doc_param == "target":
-                        docs_to_update = [_target_doc_name]
-                    elif doc_param == "work":
-                        docs_to_update = [_work_doc_name]
-                    elif doc_param == "both":
-                        docs_to_update = [_target_doc_name, _work_doc_name]
-                    else:
-                        docs_to_update = [_work_doc_name]
-                else:
-                    if FreeCADGui.ActiveDocument is None:
-                        return {"success": False, "error": "No active document with view"}
-                    docs_to_update = [FreeCAD.ActiveDocument.Name]
-                
-                updated_docs = []
-                for doc_name in docs_to_update:
-                    if activate_document(doc_name):
-                        gui_doc = FreeCADGui.getDocument(doc_name)
-                        if gui_doc and gui_doc.ActiveView:
-                            if apply_pan(gui_doc.ActiveView, x_percent, y_percent):
-                                updated_docs.append(doc_name)
-                
-                QtWidgets.QApplication.processEvents()
-                
-                return {"success": True, "pan_x": x_percent, "pan_y": y_percent, "documents": updated_docs}
-            except Exception as e:
-                return {"success": False, "error": f"Failed to pan: {e}"}
+# === Measurement Mode Tools ===
+
+
+def marker_names(points: dict) -> List[str]:
+    """Collect the marker object names of a point dict, skipping markers deleted outside the tools."""
+    names = []
+    for info in points.values():
+        try:
+            if info.marker:
+                names.append(info.marker.Name)
+        except Exception:
+            pass
+    return names
+
+
+def remove_objects(doc, names: List[str], transaction: str) -> List[str]:
+    """
+    Remove objects by name as a single undo transaction.
+    
+    Args:
+        doc: FreeCAD document holding the objects
+        names: Object names; ones that no longer exist are skipped
+        transaction: Undo transaction label
+    
+    Returns:
+        Names of the objects that were removed
+    """
+    if doc is None or not names:
+        return []
+    
+    removed = []
+    doc.openTransaction(transaction)
+    try:
+        for name in names:
+            if doc.getObject(name) is not None:
+                doc.removeObject(name)
+                removed.append(name)
+    finally:
+        doc.commitTransaction()
+    return removed
+
+
+def has_dependents(doc, names: List[str]) -> bool:
+    """
+    Check whether any of the named objects is used by another object.
+    
+    Args:
+        doc: FreeCAD document holding the objects
+        names: Object names; ones that no longer exist are skipped
+    
+    Returns:
+        True if removing the objects leaves features to recompute
+    """
+    if doc is None:
+        return False
+    for name in names:
+        obj = doc.getObject(name)
+        if obj is not None and obj.InList:
+            return True
+    return False
+
+
+def _tool_start_measurement(doc, arguments: dict) -> dict:
+    """Begin measurement mode."""
+    global _measurement_mode
+    
+    _measurement_mode = True
+    _grid_config["enabled"] = True
+    _grid_region[:] = _FULL_GRID_REGION
+    
+    result = {
+        "success": True,
+        GRID_CAPTURE_KEY: True,
+        "measurement_mode": True,
+        "grid": {
+            "columns": _grid_config["columns"],
+            "rows": _grid_config["rows"]
+        },
+        "message": "Measurement mode active. Use grid coordinates (A1-H6) to select points."
+    }
+    
+    return result
+
+
+def _tool_end_measurement(doc, arguments: dict) -> dict:
+    """End measurement mode."""
+    global _measurement_mode
+    
+    _measurement_mode = False
+    _grid_config["enabled"] = False
+    
+    # Clear pending points (keep confirmed ones)
+    cleared_pending = list(_pending_points.keys())
+    names = marker_names(_pending_points)
+    _pending_points.clear()
+    try:
+        remove_objects(doc, names, "End measurement")
+    except Exception as e:
+        FreeCAD.Console.PrintWarning(f"Failed to remove pending markers: {e}\n")
+    
+    return {
+        "success": True,
+        "measurement_mode": False,
+        "cleared_pending": cleared_pending,
+        "confirmed_points": list(_confirmed_points.keys())
+    }
+
+
+def _tool_zoom_grid_region(doc, arguments: dict) -> dict:
+    """Zoom into a grid region for precise point selection."""
+    if not _measurement_mode:
+        return {"success": False, "error": "Not in measurement mode. Call start_measurement first."}
+    
+    try:
+        start_cell = arguments.get("start_cell", "A1")
+        size = arguments.get("size", 2)
         
-        # === Measurement Mode Tools ===
-        elif name == "start_measurement":
-            _measurement_mode = True
-            _grid_config["enabled"] = True
-            _grid_config["region"] = {"x_min": 0.0, "x_max": 1.0, "y_min": 0.0, "y_max": 1.0}
-            
-            # Capture screenshot with grid
-            screenshot = capture_with_grid_and_labels()
-            
-            result = {
-                "success": True,
-                "measurement_mode": True,
-                "grid": {
-                    "columns": _grid_config["columns"],
-                    "rows": _grid_config["rows"]
-                },
-                "message": "Measurement mode active. Use grid coordinates (A1-H6) to select points."
-            }
-            if screenshot:
-                result["screenshot"] = screenshot
-            
-            return result
+        col, row = parse_grid_cell(start_cell)
         
-        elif name == "end_measurement":
-            _measurement_mode = False
-            _grid_config["enabled"] = False
-            
-            # Clear pending points (keep confirmed ones)
-            cleared_pending = list(_pending_points.keys())
-            for point_id in cleared_pending:
-                info = _pending_points.pop(point_id, None)
-                if info and info.get("marker"):
-                    try:
-                        doc.removeObject(info["marker"].Name)
-                    except:
-                        pass
-            
+        # Validate
+        cols = _grid_config["columns"]
+        rows = _grid_config["rows"]
+        
+        if col < 0 or col >= cols or row < 0 or row >= rows:
+            return {"success": False, "error": f"Invalid cell: {start_cell}"}
+        
+        if size < 1 or size > min(cols, rows):
+            return {"success": False, "error": f"Invalid size: {size}. Must be 1-{min(cols, rows)}"}
+        
+        # Map the precomputed fractions onto the current region
+        fractions = _GRID_ZOOM_LUT.get((col, row, size))
+        if fractions is None:
+            return {"success": False, "error": f"Invalid size: {size}. Must be a whole number of cells"}
+        fx_min, fx_max, fy_min, fy_max = fractions
+        x_min, x_max, y_min, y_max = _grid_region
+        width = x_max - x_min
+        height = y_max - y_min
+        
+        _grid_region[REGION_X_MIN] = x_min + fx_min * width
+        _grid_region[REGION_X_MAX] = x_min + fx_max * width
+        _grid_region[REGION_Y_MIN] = y_min + fy_min * height
+        _grid_region[REGION_Y_MAX] = y_min + fy_max * height
+        
+        # Also zoom the camera to this region
+        # This is approximate - zoom in by the inverse of the region size
+        zoom_factor = 1.0 / (size / cols)
+        
+        try:
+            if FreeCADGui.ActiveDocument and FreeCADGui.ActiveDocument.ActiveView:
+                view = FreeCADGui.ActiveDocument.ActiveView
+                cam = view.getCameraNode()
+                if cam:
+                    current_height = cam.height.getValue()
+                    cam.height.setValue(current_height / zoom_factor)
+        except:
+            pass
+        
+        result = {
+            "success": True,
+            GRID_CAPTURE_KEY: True,
+            "zoomed_to": f"{start_cell} (size {size})",
+            "region": grid_region_dict(),
+            "message": f"Zoomed to region starting at {start_cell}. Grid now covers this zoomed area."
+        }
+        
+        return result
+        
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    except Exception as e:
+        return {"success": False, "error": f"Failed to zoom grid region: {e}"}
+
+
+def _tool_reset_grid_zoom(doc, arguments: dict) -> dict:
+    """Reset grid zoom to show the full view."""
+    _grid_region[:] = _FULL_GRID_REGION
+    
+    # Fit camera to show all
+    try:
+        if FreeCADGui.ActiveDocument and FreeCADGui.ActiveDocument.ActiveView:
+            FreeCADGui.ActiveDocument.ActiveView.fitAll()
+    except:
+        pass
+    
+    result = {
+        "success": True,
+        GRID_CAPTURE_KEY: True,
+        "message": "Grid zoom reset to full view."
+    }
+    
+    return result
+
+
+@functools.lru_cache(maxsize=256)
+def grid_cell_pixel(col: int, row: int, offset_x: float, offset_y: float, region: Tuple[float, float, float, float],
+                    view_width: int, view_height: int) -> Tuple[int, int]:
+    """
+    Map a position inside a grid cell to viewport pixel coordinates.
+    
+    Args:
+        col, row: 0-based grid cell indices
+        offset_x, offset_y: Position within the cell (0-1)
+        region: Current grid region as (x_min, x_max, y_min, y_max)
+        view_width, view_height: Viewport size in pixels
+    
+    Returns:
+        (pixel_x, pixel_y)
+    """
+    x_min, x_max, y_min, y_max = region
+    
+    # Normalized position within current grid region
+    norm_x = x_min + (col + offset_x) / _grid_config["columns"] * (x_max - x_min)
+    norm_y = y_min + (row + offset_y) / _grid_config["rows"] * (y_max - y_min)
+    
+    return int(norm_x * view_width), int(norm_y * view_height)
+
+
+def _check_select_point(arguments: dict) -> Optional[str]:
+    """
+    Validate select_point arguments without touching FreeCAD state.
+    
+    Runs on the server thread before dispatch, so invalid cells are rejected
+    without a main-thread round-trip.
+    
+    Args:
+        arguments: Tool arguments
+    
+    Returns:
+        Error message, or None if the call may proceed
+    """
+    if FreeCADGui is None:
+        return "Point selection requires FreeCAD GUI. Start FreeCAD (not FreeCADCmd/headless) and try again."
+    
+    grid_cell = arguments.get("grid_cell", "A1")
+    try:
+        col, row = parse_grid_cell(grid_cell)
+    except (ValueError, AttributeError) as e:
+        return str(e)
+    
+    cols = _grid_config["columns"]
+    rows = _grid_config["rows"]
+    
+    if col < 0 or col >= cols or row < 0 or row >= rows:
+        return f"Invalid grid cell: {grid_cell}. Use A1-{_GRID_LAST_CELL}"
+    
+    return None
+
+
+def grid_ray_view():
+    """
+    Get the active view and its size for grid ray casts.
+    
+    Returns:
+        (view, width, height), or an error message string
+    """
+    gui_doc = FreeCADGui.ActiveDocument
+    if gui_doc is None:
+        return "No active document with view"
+    
+    view = gui_doc.ActiveView
+    if view is None:
+        return "No active view"
+    
+    # Get viewport size
+    try:
+        view_size = view.getSize()
+        view_width, view_height = view_size[0], view_size[1]
+    except:
+        view_width, view_height = 800, 600
+    
+    return view, view_width, view_height
+
+
+def cast_grid_ray(view, view_width: int, view_height: int, grid_cell: str,
+                  offset_x: float, offset_y: float):
+    """
+    Ray cast from the camera through a point in a grid cell.
+    
+    Args:
+        view: Active 3D view
+        view_width: Viewport width in pixels
+        view_height: Viewport height in pixels
+        grid_cell: Bounds-checked grid cell string (e.g. 'C2')
+        offset_x: Position within the cell horizontally (0-1)
+        offset_y: Position within the cell vertically (0-1)
+    
+    Returns:
+        FreeCAD.Vector of the surface hit, or None
+    """
+    col, row = parse_grid_cell(grid_cell)
+    
+    # Calculate pixel position (respecting grid region/zoom)
+    pixel_x, pixel_y = grid_cell_pixel(col, row, offset_x, offset_y, tuple(_grid_region),
+                                       view_width, view_height)
+    
+    # Try different methods depending on FreeCAD version
+    point_3d = None
+    
+    try:
+        # Method 1: getPointOnScreen (older versions)
+        point_3d = view.getPointOnScreen(pixel_x, pixel_y)
+    except:
+        pass
+    
+    if point_3d is None:
+        try:
+            # Method 2: getObjectInfo
+            info = view.getObjectInfo((pixel_x, pixel_y))
+            if info and "x" in info:
+                point_3d = FreeCAD.Vector(info["x"], info["y"], info["z"])
+        except:
+            pass
+    
+    return point_3d
+
+
+def add_point_marker(doc, point_3d, grid_cell: str, marker_radius: float) -> Tuple[str, PointInfo]:
+    """
+    Create a pending point and its marker sphere (the caller recomputes).
+    
+    Args:
+        doc: Document to add the marker to
+        point_3d: FreeCAD.Vector of the selected point
+        grid_cell: Grid cell the point was selected from
+        marker_radius: Marker sphere radius in mm
+    
+    Returns:
+        (point_id, PointInfo) of the new pending point
+    """
+    global _point_counter
+    
+    _point_counter += 1
+    point_id = f"point_{_point_counter}"
+    
+    marker = doc.addObject("Part::Sphere", f"Marker_{point_id}")
+    marker.Radius = marker_radius
+    marker.Placement.Base = point_3d
+    
+    # Set marker appearance
+    vo = getattr(marker, "ViewObject", None)
+    if vo is not None:
+        vo.ShapeColor = marker_color(_point_counter)
+        vo.Transparency = 0
+    
+    # Store in pending points
+    point_info = PointInfo(point_3d, marker, grid_cell)
+    _pending_points[point_id] = point_info
+    return point_id, point_info
+
+
+def _tool_select_point(doc, arguments: dict) -> dict:
+    """Select a point on a mesh surface using grid coordinates."""
+    try:
+        grid_cell = arguments.get("grid_cell", "A1")
+        offset_x = arguments.get("offset_x", 0.5)
+        offset_y = arguments.get("offset_y", 0.5)
+        
+        # The cell was already bounds-checked by _check_select_point
+        view_info = grid_ray_view()
+        if isinstance(view_info, str):
+            return {"success": False, "error": view_info}
+        
+        point_3d = cast_grid_ray(*view_info, grid_cell, offset_x, offset_y)
+        if point_3d is None:
             return {
-                "success": True,
-                "measurement_mode": False,
-                "cleared_pending": cleared_pending,
-                "confirmed_points": list(_confirmed_points.keys())
+                "success": False,
+                "error": f"No surface at grid cell {grid_cell}. Try a different cell or adjust view."
             }
         
-        elif name == "zoom_grid_region":
-            if not _measurement_mode:
-                return {"success": False, "error": "Not in measurement mode. Call start_measurement first."}
-            
-            try:
-                start_cell = arguments.get("start_cell", "A1")
-                size = arguments.get("size", 2)
-                
-                col, row = parse_grid_cell(start_cell)
-                
-                # Validate
-                cols = _grid_config["columns"]
-                rows = _grid_config["rows"]
-                
-                if col < 0 or col >= cols or row < 0 or row >= rows:
-                    return {"success": False, "error": f"Invalid cell: {start_cell}"}
-                
-                if size < 1 or size > min(cols, rows):
-                    return {"success": False, "error": f"Invalid size: {size}. Must be 1-{min(cols, rows)}"}
-                
-                # Calculate new region bounds (as fraction of current region)
-                current = _grid_config["region"]
-                cell_width = (current["x_max"] - current["x_min"]) / cols
-                cell_height = (current["y_max"] - current["y_min"]) / rows
-                
-                new_x_min = current["x_min"] + col * cell_width
-                new_x_max = min(current["x_max"], new_x_min + size * cell_width)
-                new_y_min = current["y_min"] + row * cell_height
-                new_y_max = min(current["y_max"], new_y_min + size * cell_height)
-                
-                _grid_config["region"] = {
-                    "x_min": new_x_min,
-                    "x_max": new_x_max,
-                    "y_min": new_y_min,
-                    "y_max": new_y_max
-                }
-                
-                # Also zoom the camera to this region
-                # This is approximate - zoom in by the inverse of the region size
-                zoom_factor = 1.0 / (size / cols)
-                
-                try:
-                    import FreeCADGui
-                    from PySide2 import QtWidgets
-                    
-                    if FreeCADGui.ActiveDocument and FreeCADGui.ActiveDocument.ActiveView:
-                        view = FreeCADGui.ActiveDocument.ActiveView
-                        cam = view.getCameraNode()
-                        if cam:
-                            current_height = cam.height.getValue()
-                            cam.height.setValue(current_height / zoom_factor)
-                        QtWidgets.QApplication.processEvents()
-                except:
-                    pass
-                
-                # Capture with new grid
-                screenshot = capture_with_grid_and_labels()
-                
-                result = {
-                    "success": True,
-                    "zoomed_to": f"{start_cell} (size {size})",
-                    "region": _grid_config["region"],
-                    "message": f"Zoomed to region starting at {start_cell}. Grid now covers this zoomed area."
-                }
-                if screenshot:
-                    result["screenshot"] = screenshot
-                
-                return result
-                
-            except ValueError as e:
-                return {"success": False, "error": str(e)}
-            except Exception as e:
-                return {"success": False, "error": f"Failed to zoom grid region: {e}"}
+        if doc is None:
+            doc = FreeCAD.ActiveDocument
         
-        elif name == "reset_grid_zoom":
-            _grid_config["region"] = {"x_min": 0.0, "x_max": 1.0, "y_min": 0.0, "y_max": 1.0}
-            
-            # Fit camera to show all
-            try:
-                import FreeCADGui
-                from PySide2 import QtWidgets
-                
-                if FreeCADGui.ActiveDocument and FreeCADGui.ActiveDocument.ActiveView:
-                    FreeCADGui.ActiveDocument.ActiveView.fitAll()
-                    QtWidgets.QApplication.processEvents()
-            except:
-                pass
-            
-            # Capture with reset grid
-            screenshot = capture_with_grid_and_labels()
-            
-            result = {
-                "success": True,
-                "message": "Grid zoom reset to full view."
-            }
-            if screenshot:
-                result["screenshot"] = screenshot
-            
-            return result
+        point_id, point_info = add_point_marker(doc, point_3d, grid_cell, estimate_marker_size())
+        doc.recompute()
         
-        elif name == "select_point":
-            try:
-                import FreeCADGui
-                import Part
-                from PySide2 import QtWidgets
-                
-                grid_cell = arguments.get("grid_cell", "A1")
-                offset_x = arguments.get("offset_x", 0.5)
-                offset_y = arguments.get("offset_y", 0.5)
-                
-                # Parse grid cell
-                col, row = parse_grid_cell(grid_cell)
-                
-                cols = _grid_config["columns"]
-                rows = _grid_config["rows"]
-                
-                if col < 0 or col >= cols or row < 0 or row >= rows:
-                    return {"success": False, "error": f"Invalid grid cell: {grid_cell}. Use A1-{chr(ord('A')+cols-1)}{rows}"}
-                
-                if FreeCADGui.ActiveDocument is None:
-                    return {"success": False, "error": "No active document with view"}
-                
-                view = FreeCADGui.ActiveDocument.ActiveView
-                if view is None:
-                    return {"success": False, "error": "No active view"}
-                
-                # Get viewport size
-                try:
-                    view_size = view.getSize()
-                    view_width, view_height = view_size[0], view_size[1]
-                except:
-                    view_width, view_height = 800, 600
-                
-                # Calculate pixel position (respecting grid region/zoom)
-                region = _grid_config["region"]
-                
-                # Normalized position within current grid region
-                norm_x = region["x_min"] + (col + offset_x) / cols * (region["x_max"] - region["x_min"])
-                norm_y = region["y_min"] + (row + offset_y) / rows * (region["y_max"] - region["y_min"])
-                
-                # Convert to pixel coordinates
-                pixel_x = int(norm_x * view_width)
-                pixel_y = int(norm_y * view_height)
-                
-                # Ray cast from camera through this pixel
-                # Try different methods depending on FreeCAD version
-                point_3d = None
-                
-                try:
-                    # Method 1: getPointOnScreen (older versions)
-                    point_3d = view.getPointOnScreen(pixel_x, pixel_y)
-                except:
-                    pass
-                
-                if point_3d is None:
-                    try:
-                        # Method 2: getObjectInfo
-                        info = view.getObjectInfo((pixel_x, pixel_y))
-                        if info and "x" in info:
-                            point_3d = FreeCAD.Vector(info["x"], info["y"], info["z"])
-                    except:
-                        pass
-                
-                if point_3d is None:
-                    return {
-                        "success": False,
-                        "error": f"No surface at grid cell {grid_cell}. Try a different cell or adjust view."
-                    }
-                
-                # Create marker sphere
-                _point_counter += 1
-                point_id = f"point_{_point_counter}"
-                
-                marker_radius = estimate_marker_size()
-                color_idx = (_point_counter - 1) % len(_marker_colors)
-                color = _marker_colors[color_idx]
-                
-                if doc is None:
-                    doc = FreeCAD.ActiveDocument
-                
-                marker = doc.addObject("Part::Sphere", f"Marker_{point_id}")
-                marker.Radius = marker_radius
-                marker.Placement.Base = point_3d
-                doc.recompute()
-                
-                # Set marker appearance
-                if hasattr(marker, "ViewObject") and marker.ViewObject:
-                    marker.ViewObject.ShapeColor = color
-                    marker.ViewObject.Transparency = 0
-                
-                QtWidgets.QApplication.processEvents()
-                
-                # Store in pending points
-                _pending_points[point_id] = {
-                    "coords": point_3d,
-                    "marker": marker,
-                    "grid_cell": grid_cell
-                }
-                
-                # Capture screenshot with grid and labels
-                screenshot = capture_with_grid_and_labels()
-                
-                result = {
-                    "success": True,
-                    "point_id": point_id,
-                    "grid_cell": grid_cell,
-                    "coordinates": {
-                        "x": round(point_3d.x, 3),
-                        "y": round(point_3d.y, 3),
-                        "z": round(point_3d.z, 3)
-                    },
-                    "status": "pending_confirmation",
-                    "message": f"Point placed at {point_id}. Call confirm_point('{point_id}') to lock it in, or clear_point('{point_id}') to remove."
-                }
-                if screenshot:
-                    result["screenshot"] = screenshot
-                
-                return result
-                
-            except ValueError as e:
-                return {"success": False, "error": str(e)}
-            except Exception as e:
-                return {"success": False, "error": f"Failed to select point: {e}"}
+        # No Qt event pump is needed for the new marker: execute_tool leaves
+        # the view marked dirty and the grid capture flushes it first
+        result = {
+            "success": True,
+            GRID_CAPTURE_KEY: True,
+            "point_id": point_id,
+            "grid_cell": grid_cell,
+            "coordinates": dict(zip("xyz", point_info.xyz.round(3).tolist())),
+            "status": "pending_confirmation",
+            "message": f"Point placed at {point_id}. Call confirm_point('{point_id}') to lock it in, or clear_point('{point_id}') to remove."
+        }
         
-        elif name == "confirm_point":
-            point_id = arguments.get("point_id")
-            if not point_id:
-                return {"success": False, "error": "point_id is required"}
-            
-            if point_id not in _pending_points:
-                if point_id in _confirmed_points:
-                    return {"success": False, "error": f"Point {point_id} is already confirmed"}
-                return {"success": False, "error": f"Point {point_id} not found in pending points"}
-            
-            # Move from pending to confirmed
-            point_info = _pending_points.pop(point_id)
-            _confirmed_points[point_id] = point_info
-            
-            coords = point_info["coords"]
-            
-            return {
-                "success": True,
+        return result
+        
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    except Exception as e:
+        return {"success": False, "error": f"Failed to select point: {e}"}
+
+
+def _check_select_points_batch(arguments: dict) -> Optional[str]:
+    """Validate every cell of a select_points_batch call before dispatch."""
+    cells = arguments.get("grid_cells")
+    if not cells or not isinstance(cells, list):
+        return "grid_cells must be a non-empty list of grid cells"
+    for cell in cells:
+        if not isinstance(cell, str):
+            return f"Invalid grid cell: {cell}"
+        error = _check_select_point({"grid_cell": cell})
+        if error is not None:
+            return error
+    return None
+
+
+def _tool_select_points_batch(doc, arguments: dict) -> dict:
+    """Select several points in one pass, with a single recompute."""
+    try:
+        cells = arguments["grid_cells"]
+        offset_x = arguments.get("offset_x", 0.5)
+        offset_y = arguments.get("offset_y", 0.5)
+        
+        view_info = grid_ray_view()
+        if isinstance(view_info, str):
+            return {"success": False, "error": view_info}
+        
+        # Cast every ray before adding any marker, so no ray hits a new sphere
+        hits = [(cell, cast_grid_ray(*view_info, cell, offset_x, offset_y)) for cell in cells]
+        missed = [cell for cell, point_3d in hits if point_3d is None]
+        if len(missed) == len(hits):
+            return {"success": False, "error": "No surface at any of the grid cells. Try different cells or adjust view."}
+        
+        if doc is None:
+            doc = FreeCAD.ActiveDocument
+        
+        marker_radius = estimate_marker_size()
+        points = []
+        for cell, point_3d in hits:
+            if point_3d is None:
+                continue
+            point_id, point_info = add_point_marker(doc, point_3d, cell, marker_radius)
+            points.append({
                 "point_id": point_id,
-                "status": "confirmed",
-                "coordinates": {
-                    "x": round(coords.x, 3),
-                    "y": round(coords.y, 3),
-                    "z": round(coords.z, 3)
-                },
-                "message": f"Point {point_id} confirmed. You can now use it in measure_distance."
-            }
+                "grid_cell": cell,
+                "coordinates": dict(zip("xyz", point_info.xyz.round(3).tolist()))
+            })
+        doc.recompute()
         
-        elif name == "clear_point":
-            point_id = arguments.get("point_id")
-            if not point_id:
-                return {"success": False, "error": "point_id is required"}
-            
-            cleared = []
-            
-            if point_id == "all":
-                # Clear all points
-                for pid in list(_pending_points.keys()):
-                    info = _pending_points.pop(pid)
-                    if info.get("marker"):
-                        try:
-                            doc.removeObject(info["marker"].Name)
-                        except:
-                            pass
-                    cleared.append(pid)
-                
-                for pid in list(_confirmed_points.keys()):
-                    info = _confirmed_points.pop(pid)
-                    if info.get("marker"):
-                        try:
-                            doc.removeObject(info["marker"].Name)
-                        except:
-                            pass
-                    cleared.append(pid)
-            else:
-                # Clear specific point
-                if point_id in _pending_points:
-                    info = _pending_points.pop(point_id)
-                    if info.get("marker"):
-                        try:
-                            doc.removeObject(info["marker"].Name)
-                        except:
-                            pass
-                    cleared.append(point_id)
-                elif point_id in _confirmed_points:
-                    info = _confirmed_points.pop(point_id)
-                    if info.get("marker"):
-                        try:
-                            doc.removeObject(info["marker"].Name)
-                        except:
-                            pass
-                    cleared.append(point_id)
-                else:
-                    return {"success": False, "error": f"Point {point_id} not found"}
-            
-            if doc:
-                doc.recompute()
-            
-            return {"success": True, "cleared": cleared}
+        return {
+            "success": True,
+            GRID_CAPTURE_KEY: True,
+            "points": points,
+            "missed_cells": missed,
+            "status": "pending_confirmation",
+            "message": f"Placed {len(points)} point(s). Confirm each with confirm_point, or remove with clear_point."
+        }
         
-        elif name == "list_points":
-            points = []
-            
-            for pid, info in _pending_points.items():
-                coords = info.get("coords")
-                points.append({
-                    "point_id": pid,
-                    "status": "pending",
-                    "grid_cell": info.get("grid_cell"),
-                    "coordinates": {
-                        "x": round(coords.x, 3),
-                        "y": round(coords.y, 3),
-                        "z": round(coords.z, 3)
-                    } if coords else None
-                })
-            
-            for pid, info in _confirmed_points.items():
-                coords = info.get("coords")
-                points.append({
-                    "point_id": pid,
-                    "status": "confirmed",
-                    "grid_cell": info.get("grid_cell"),
-                    "coordinates": {
-                        "x": round(coords.x, 3),
-                        "y": round(coords.y, 3),
-                        "z": round(coords.z, 3)
-                    } if coords else None
-                })
-            
-            return {
-                "success": True,
-                "points": points,
-                "pending_count": len(_pending_points),
-                "confirmed_count": len(_confirmed_points)
-            }
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    except Exception as e:
+        return {"success": False, "error": f"Failed to select points: {e}"}
+
+
+def _tool_confirm_point(doc, arguments: dict) -> dict:
+    """Confirm a pending point selection, locking it in for measurement."""
+    point_id = arguments.get("point_id")
+    if not point_id:
+        return {"success": False, "error": "point_id is required"}
+    
+    if point_id not in _pending_points:
+        if point_id in _confirmed_points:
+            return {"success": False, "error": f"Point {point_id} is already confirmed"}
+        return {"success": False, "error": f"Point {point_id} not found in pending points"}
+    
+    # Move from pending to confirmed
+    point_info = _pending_points.pop(point_id)
+    _confirmed_points[point_id] = point_info
+    
+    x, y, z = point_info.xyz.round(3).tolist()
+    
+    return {
+        "success": True,
+        "point_id": point_id,
+        "status": "confirmed",
+        "coordinates": {"x": x, "y": y, "z": z},
+        "message": f"Point {point_id} confirmed. You can now use it in measure_distance."
+    }
+
+
+def _tool_clear_point(doc, arguments: dict) -> dict:
+    """Remove a point marker."""
+    point_id = arguments.get("point_id")
+    if not point_id:
+        return {"success": False, "error": "point_id is required"}
+    
+    if point_id == "all":
+        # Clear all points
+        cleared = list(_pending_points) + list(_confirmed_points)
+        names = marker_names(_pending_points) + marker_names(_confirmed_points)
+        _pending_points.clear()
+        _confirmed_points.clear()
+    else:
+        # Clear specific point
+        points = _pending_points if point_id in _pending_points else _confirmed_points
+        if point_id not in points:
+            return {"success": False, "error": f"Point {point_id} not found"}
+        cleared = [point_id]
+        names = marker_names({point_id: points.pop(point_id)})
+    
+    # Markers are standalone spheres; only recompute if something uses one
+    needs_recompute = has_dependents(doc, names)
+    try:
+        remove_objects(doc, names, "Clear points")
+    except Exception as e:
+        FreeCAD.Console.PrintWarning(f"Failed to remove point markers: {e}\n")
+    
+    if needs_recompute:
+        doc.recompute()
+    
+    return {"success": True, "cleared": cleared}
+
+
+def _tool_list_points(doc, arguments: dict) -> dict:
+    """List all current point markers with their coordinates and status."""
+    import numpy as np
+    
+    # Runs off the main thread (see _THREADSAFE_TOOLS): list() copies each
+    # dict in one step under the GIL, so concurrent edits cannot break iteration
+    pending = list(_pending_points.items())
+    confirmed = list(_confirmed_points.items())
+    entries = [(pid, "pending", info) for pid, info in pending]
+    entries += [(pid, "confirmed", info) for pid, info in confirmed]
+    
+    # Round every coordinate in one pass, then convert back to Python floats
+    with_coords = [info.xyz for _, _, info in entries if info.xyz is not None]
+    rounded = np.round(np.vstack(with_coords), 3).tolist() if with_coords else []
+    
+    points = []
+    rounded_iter = iter(rounded)
+    for pid, status, info in entries:
+        coordinates = None
+        if info.xyz is not None:
+            x, y, z = next(rounded_iter)
+            coordinates = {"x": x, "y": y, "z": z}
+        points.append({
+            "point_id": pid,
+            "status": status,
+            "grid_cell": info.grid_cell,
+            "coordinates": coordinates
+        })
+    
+    return {
+        "success": True,
+        "points": points,
+        "pending_count": len(pending),
+        "confirmed_count": len(confirmed)
+    }
+
+
+def confirmed_points_index():
+    """
+    Nearest-neighbour index over the confirmed points, rebuilt only when they change.
+    
+    Confirmed points keep their coordinates and ids are never reused, so the
+    id tuple alone identifies the point set.
+    
+    Returns:
+        (ids, (N, 3) coordinate array, cKDTree or None without SciPy)
+    """
+    global _confirmed_index
+    import numpy as np
+    
+    key = tuple(_confirmed_points)
+    if _confirmed_index is not None and _confirmed_index[0] == key:
+        return _confirmed_index[1]
+    
+    ids = [pid for pid, info in _confirmed_points.items() if info.xyz is not None]
+    coords = np.array([_confirmed_points[pid].xyz for pid in ids], dtype=np.float64).reshape(-1, 3)
+    kdtree = get_kdtree_class()
+    tree = kdtree(coords) if kdtree is not None and ids else None
+    _confirmed_index = (key, (ids, coords, tree))
+    return _confirmed_index[1]
+
+
+def _tool_nearest_point(doc, arguments: dict) -> dict:
+    """Find the confirmed point closest to a 3D location."""
+    import numpy as np
+    
+    try:
+        query = np.array([float(arguments.get(axis, 0.0)) for axis in ("x", "y", "z")])
+    except (TypeError, ValueError):
+        return {"success": False, "error": "x, y and z must be numbers"}
+    
+    ids, coords, tree = confirmed_points_index()
+    if not ids:
+        return {"success": False, "error": "No confirmed points"}
+    
+    if tree is not None:
+        distance, index = tree.query(query, k=1)
+    else:
+        # Measurement sessions hold few points; a vector scan is plenty
+        d2 = np.einsum('ij,ij->i', coords - query, coords - query)
+        index = int(d2.argmin())
+        distance = float(np.sqrt(d2[index]))
+    
+    x, y, z = coords[index]
+    return {
+        "success": True,
+        "point_id": ids[int(index)],
+        "coordinates": {"x": round(float(x), 3), "y": round(float(y), 3), "z": round(float(z), 3)},
+        "distance_mm": round(float(distance), 4)
+    }
+
+
+def _tool_measure_distance(doc, arguments: dict) -> dict:
+    """Measure distance between two confirmed points."""
+    point_a_id = arguments.get("point_a")
+    point_b_id = arguments.get("point_b")
+    
+    if not point_a_id or not point_b_id:
+        return {"success": False, "error": "Both point_a and point_b are required"}
+    
+    if point_a_id not in _confirmed_points:
+        return {"success": False, "error": f"Point {point_a_id} not found or not confirmed"}
+    if point_b_id not in _confirmed_points:
+        return {"success": False, "error": f"Point {point_b_id} not found or not confirmed"}
+    
+    try:
+        import numpy as np
         
-        elif name == "measure_distance":
-            point_a_id = arguments.get("point_a")
-            point_b_id = arguments.get("point_b")
-            
-            if not point_a_id or not point_b_id:
-                return {"success": False, "error": "Both point_a and point_b are required"}
-            
-            if point_a_id not in _confirmed_points:
-                return {"success": False, "error": f"Point {point_a_id} not found or not confirmed"}
-            if point_b_id not in _confirmed_points:
-                return {"success": False, "error": f"Point {point_b_id} not found or not confirmed"}
-            
-            try:
-                import Part
-                
-                p1 = _confirmed_points[point_a_id]["coords"]
-                p2 = _confirmed_points[point_b_id]["coords"]
-                
-                # Calculate distance
-                distance = p1.distanceToPoint(p2)
-                
-                # Create visual line between points
-                if doc is None:
-                    doc = FreeCAD.ActiveDocument
-                
-                line_name = f"Measurement_{point_a_id}_{point_b_id}"
-                line_shape = Part.makeLine(p1, p2)
-                line_obj = doc.addObject("Part::Feature", line_name)
-                line_obj.Shape = line_shape
-                doc.recompute()
-                
-                # Style the line
-                if hasattr(line_obj, "ViewObject") and line_obj.ViewObject:
-                    line_obj.ViewObject.LineColor = (1.0, 0.0, 0.0)  # Red
-                    line_obj.ViewObject.LineWidth = 3.0
-                
-                _measurement_objects.append(line_obj)
-                
-                # Capture screenshot
-                screenshot = capture_with_grid_and_labels()
-                
-                result = {
-                    "success": True,
-                    "distance_mm": round(distance, 4),
-                    "point_a": {
-                        "id": point_a_id,
-                        "coordinates": {"x": round(p1.x, 3), "y": round(p1.y, 3), "z": round(p1.z, 3)}
-                    },
-                    "point_b": {
-                        "id": point_b_id,
-                        "coordinates": {"x": round(p2.x, 3), "y": round(p2.y, 3), "z": round(p2.z, 3)}
-                    },
-                    "measurement_line": line_name
-                }
-                if screenshot:
-                    result["screenshot"] = screenshot
-                
-                return result
-                
-            except Exception as e:
-                return {"success": False, "error": f"Failed to measure distance: {e}"}
+        info_a = _confirmed_points[point_a_id]
+        info_b = _confirmed_points[point_b_id]
+        p1, p2 = info_a.coords, info_b.coords
         
-        elif name == "clear_measurements":
-            cleared = []
-            
-            # Clear measurement lines
-            for obj in _measurement_objects:
-                try:
-                    if doc and doc.getObject(obj.Name):
-                        doc.removeObject(obj.Name)
-                        cleared.append(obj.Name)
-                except:
-                    pass
-            _measurement_objects = []
-            
-            # Also clear all points
-            for pid in list(_pending_points.keys()):
-                info = _pending_points.pop(pid)
-                if info.get("marker"):
-                    try:
-                        doc.removeObject(info["marker"].Name)
-                        cleared.append(info["marker"].Name)
-                    except:
-                        pass
-            
-            for pid in list(_confirmed_points.keys()):
-                info = _confirmed_points.pop(pid)
-                if info.get("marker"):
-                    try:
-                        doc.removeObject(info["marker"].Name)
-                        cleared.append(info["marker"].Name)
-                    except:
-                        pass
-            
-            if doc:
-                doc.recompute()
-            
-            return {"success": True, "cleared": cleared}
+        # Calculate distance
+        distance = float(np.linalg.norm(info_a.xyz - info_b.xyz))
+        ax, ay, az = info_a.xyz.round(3).tolist()
+        bx, by, bz = info_b.xyz.round(3).tolist()
+        
+        # Create visual line between points
+        if doc is None:
+            doc = FreeCAD.ActiveDocument
+        
+        line_name = f"Measurement_{point_a_id}_{point_b_id}"
+        line_shape = Part.makeLine(p1, p2)
+        line_obj = doc.addObject("Part::Feature", line_name)
+        line_obj.Shape = line_shape
+        doc.recompute()
+        
+        # Style the line
+        vo = getattr(line_obj, "ViewObject", None)
+        if vo is not None:
+            vo.LineColor = (1.0, 0.0, 0.0)  # Red
+            vo.LineWidth = 3.0
+        
+        _measurement_objects.append(line_obj)
         
-        elif name == "list_tools":
-            return {"success": True, "tools": TOOLS}
+        result = {
+            "success": True,
+            GRID_CAPTURE_KEY: True,
+            "distance_mm": round(distance, 4),
+            "point_a": {
+                "id": point_a_id,
+                "coordinates": {"x": ax, "y": ay, "z": az}
+            },
+            "point_b": {
+                "id": point_b_id,
+                "coordinates": {"x": bx, "y": by, "z": bz}
+            },
+            "measurement_line": line_name
+        }
+        
+        return result
+        
+    except Exception as e:
+        return {"success": False, "error": f"Failed to measure distance: {e}"}
+
+
+def _tool_measure_distances(doc, arguments: dict) -> dict:
+    """Measure distances between many pairs of confirmed points in one pass."""
+    import numpy as np
+    
+    pairs = arguments.get("pairs")
+    if not pairs or not isinstance(pairs, list):
+        return {"success": False, "error": "pairs must be a non-empty list of [point_a, point_b]"}
+    
+    ids, coords, _tree = confirmed_points_index()
+    rows = {pid: i for i, pid in enumerate(ids)}
+    
+    index_a = []
+    index_b = []
+    for pair in pairs:
+        if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+            return {"success": False, "error": f"Invalid pair: {pair}. Expected [point_a, point_b]"}
+        for point_id in pair:
+            if not isinstance(point_id, str) or point_id not in rows:
+                return {"success": False, "error": f"Point {point_id} not found or not confirmed"}
+        index_a.append(rows[pair[0]])
+        index_b.append(rows[pair[1]])
+    
+    distances = np.round(np.linalg.norm(coords[index_a] - coords[index_b], axis=1), 4)
+    
+    return {
+        "success": True,
+        "measurements": [
+            {"point_a": a, "point_b": b, "distance_mm": d}
+            for (a, b), d in zip(pairs, distances.tolist())
+        ]
+    }
+
+
+def _tool_clear_measurements(doc, arguments: dict) -> dict:
+    """Remove all measurement lines and markers."""
+    global _measurement_objects
+    
+    # Measurement lines, then all point markers
+    names = []
+    for obj in _measurement_objects:
+        try:
+            names.append(obj.Name)
+        except Exception:
+            pass
+    names += marker_names(_pending_points) + marker_names(_confirmed_points)
+    _measurement_objects = []
+    _pending_points.clear()
+    _confirmed_points.clear()
+    
+    cleared = []
+    try:
+        cleared = remove_objects(doc, names, "Clear measurements")
+    except Exception as e:
+        FreeCAD.Console.PrintWarning(f"Failed to remove measurement objects: {e}\n")
+    
+    if doc and cleared:
+        doc.recompute()
+    
+    return {"success": True, "cleared": cleared}
+
+
+def _tool_list_tools(doc, arguments: dict) -> dict:
+    """List the available tools and their parameters."""
+    return {"success": True, "tools": TOOLS}
+
+
+# The tool schema is static, so the list_tools reply is encoded once
+_LIST_TOOLS_RESPONSE = encode_json_line({"success": True, "tools": TOOLS})
+
+# Tool name -> handler, built once so dispatch is a single dict lookup
+_TOOL_HANDLERS = {
+    "setup_dual_docs": _tool_setup_dual_docs,
+    "new_document": _tool_new_document,
+    "list_documents": _tool_list_documents,
+    "list_objects": _tool_list_objects,
+    "create_box": _tool_create_box,
+    "create_cylinder": _tool_create_cylinder,
+    "create_sphere": _tool_create_sphere,
+    "create_cone": _tool_create_cone,
+    "boolean_union": _tool_boolean_union,
+    "boolean_cut": _tool_boolean_cut,
+    "move_object": _tool_move_object,
+    "delete_object": _tool_delete_object,
+    "export_stl": _tool_export_stl,
+    "export_step": _tool_export_step,
+    "get_object_info": _tool_get_object_info,
+    "save_document": _tool_save_document,
+    "recompute": _tool_recompute,
+    "compare_to_stl": _tool_compare_to_stl,
+    "get_mesh_points": _tool_get_mesh_points,
+    "take_screenshot": _tool_take_screenshot,
+    "set_view": _tool_set_view,
+    "fit_all": _tool_fit_all,
+    "import_stl": _tool_import_stl,
+    "set_visibility": _tool_set_visibility,
+    "rotate_view": _tool_rotate_view,
+    "set_display_mode": _tool_set_display_mode,
+    "set_clipping_plane": _tool_set_clipping_plane,
+    "zoom": _tool_zoom,
+    "pan": _tool_pan,
+    "start_measurement": _tool_start_measurement,
+    "end_measurement": _tool_end_measurement,
+    "zoom_grid_region": _tool_zoom_grid_region,
+    "reset_grid_zoom": _tool_reset_grid_zoom,
+    "select_point": _tool_select_point,
+    "select_points_batch": _tool_select_points_batch,
+    "confirm_point": _tool_confirm_point,
+    "clear_point": _tool_clear_point,
+    "list_points": _tool_list_points,
+    "nearest_point": _tool_nearest_point,
+    "measure_distance": _tool_measure_distance,
+    "measure_distances": _tool_measure_distances,
+    "clear_measurements": _tool_clear_measurements,
+    "list_tools": _tool_list_tools,
+}
+
+
+# Tool name -> argument check run before the main-thread dispatch; returns
+# an error message to reject the call without queuing it on the bridge
+_PRE_DISPATCH_CHECKS = {
+    "select_point": _check_select_point,
+    "select_points_batch": _check_select_points_batch,
+}
+
+
+def execute_batch(requests: List[dict]) -> List[dict]:
+    """
+    Execute a batch of tool requests in order, with a single screenshot.
+    
+    Intermediate auto-screenshots are skipped; one capture is taken after
+    the whole batch and attached to the last successful response.
+    
+    Args:
+        requests: List of {"tool": ..., "arguments": ...} requests
+    
+    Returns:
+        List of responses, one per request
+    """
+    responses = []
+    last_success = None
+    grid = False
+    for request in requests:
+        try:
+            tool_name = request.get("tool", request.get("method", ""))
+            arguments = request.get("arguments", request.get("params", {}))
+            if tool_name == "list_tools":
+                response = {"success": True, "tools": TOOLS}
+            else:
+                response = execute_tool(tool_name, arguments, auto_screenshot=False)
+                grid = response.pop(GRID_CAPTURE_KEY, False) or grid
+                if response.get("success", False) and tool_name not in _SKIP_SCREENSHOT_TOOLS:
+                    last_success = response
+        except Exception as e:
+            response = {"success": False, "error": str(e)}
+        responses.append(response)
+    
+    if _HAS_GUI and last_success is not None:
+        screenshot = capture_response_screenshot(grid, True)
+        if screenshot:
+            last_success["screenshot"] = screenshot
+    
+    return responses
+
+
+def execute_tool(name: str, arguments: dict, auto_screenshot: bool = True) -> dict:
+    """
+    Execute a tool on the main thread.
+    
+    Args:
+        name: Tool name
+        arguments: Tool arguments
+        auto_screenshot: Append a screenshot to successful responses
+            (subject to the global auto-screenshot setting); when False, a
+            grid capture request is left under GRID_CAPTURE_KEY for the caller
+    """
+    read_only = name in _READ_ONLY_TOOLS
+    
+    def _execute():
+        global _scene_generation
+        # Bumped here on the main thread, which also builds the screenshot
+        # keys, so concurrent client threads cannot lose an increment
+        if not read_only:
+            _scene_generation += 1
+        _bbox_validated.clear()
         
+        # For most tools, use work doc in dual mode, else active document
+        if is_dual_mode():
+            doc = get_work_doc()
         else:
+            doc = FreeCAD.ActiveDocument
+        
+        handler = _TOOL_HANDLERS.get(name)
+        if handler is None:
             return {"success": False, "error": f"Unknown tool: {name}"}
+        return handler(doc, arguments)
     
-    # Execute the tool
-    result = _bridge.execute_sync(_execute)
-    
-    # Auto-append screenshot to successful responses (if GUI available)
-    if _auto_screenshot_enabled and result.get("success", False):
-        # Skip screenshot for list_tools and get_mesh_points (large data responses)
-        skip_screenshot_tools = {"list_tools", "get_mesh_points", "take_screenshot"}
-        if name not in skip_screenshot_tools:
-            # Run capture on the main thread to avoid GUI thread crashes
-            def _capture_screenshot():
-                if is_dual_mode():
-                    return capture_split_view()
-                return capture_viewport_base64()
-            
-            try:
-                screenshot = _bridge.execute_sync(_capture_screenshot)
-            except Exception as e:
-                FreeCAD.Console.PrintWarning(f"Auto screenshot failed: {e}\n")
-                screenshot = None
-            if screenshot:
-                result["screenshot"] = screenshot
+    precheck = _PRE_DISPATCH_CHECKS.get(name)
+    if precheck is not None:
+        error = precheck(arguments)
+        if error is not None:
+            return {"success": False, "error": error}
+    
+    # Execute the tool (mutating tools leave the view stale, including for
+    # captures they take themselves part-way through)
+    if name in _THREADSAFE_TOOLS:
+        result = _TOOL_HANDLERS[name](None, arguments)
+    else:
+        if not read_only:
+            mark_view_dirty()
+        result = _bridge.execute_sync(_execute)
+        if not read_only:
+            mark_view_dirty()
+    
+    # Finish file writes here, so the main thread is free while they run
+    deferred_io = result.pop(DEFERRED_IO_KEY, None)
+    if deferred_io is not None:
+        try:
+            deferred_io()
+        except Exception as e:
+            result = {"success": False, "error": f"Failed to write {result.get('path', 'file')}: {e}"}
+    
+    # Auto-append screenshot to successful responses (if GUI available); in
+    # a batch, the grid capture request is left for execute_batch
+    if not auto_screenshot:
+        return result
+    grid = result.pop(GRID_CAPTURE_KEY, False)
+    if _HAS_GUI and result.get("success", False):
+        screenshot = capture_response_screenshot(grid, name not in _SKIP_SCREENSHOT_TOOLS)
+        if screenshot:
+            result["screenshot"] = screenshot
     
     return result
 
 
 class SimpleMCPServer:
-    """Simple TCP server for MCP-like communication."""
+    """
+    Simple asyncio TCP server for MCP-like communication.
+    
+    Connections are multiplexed on one event loop; tool calls run in the
+    loop's default executor, so clients only queue at the main-thread bridge.
+    """
+    
+    # Requests carry scripts and path lists; allow lines well beyond asyncio's 64 KiB default
+    MAX_REQUEST_SIZE = 64 * 1024 * 1024
     
     def __init__(self, port: int = DEFAULT_PORT):
         self.port = port
-        self.socket = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server: Optional[asyncio.AbstractServer] = None
         self.running = False
     
     def start(self):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.socket.bind(('127.0.0.1', self.port))
-        self.socket.listen(5)
-        self.socket.settimeout(1.0)
+        """Run the server's event loop (blocks; call from a background thread)."""
+        # uvloop is optional; only this server's loop uses it, no global policy change
+        try:
+            import uvloop
+            self.loop = uvloop.new_event_loop()
+        except ImportError:
+            self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        
+        try:
+            self.loop.run_until_complete(self._serve())
+        except Exception as e:
+            if self.running:
+                FreeCAD.Console.PrintError(f"Server error: {e}\n")
+        finally:
+            self.loop.close()
+    
+    async def _serve(self):
+        self.server = await asyncio.start_server(
+            self._handle_client, '127.0.0.1', self.port, limit=self.MAX_REQUEST_SIZE
+        )
         self.running = True
         
         FreeCAD.Console.PrintMessage(f"MCP Server listening on port {self.port}\n")
         
-        while self.running:
-            try:
-                client, addr = self.socket.accept()
-                self._handle_client(client)
-            except socket.timeout:
-                continue
-            except Exception as e:
-                if self.running:
-                    FreeCAD.Console.PrintError(f"Server error: {e}\n")
+        try:
+            await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
     
-    def _handle_client(self, client):
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
         try:
-            client.settimeout(30.0)
-            data = b""
-            while True:
-                chunk = client.recv(4096)
-                if not chunk:
-                    break
-                data += chunk
-                if b"\n" in data:
-                    break
+            line = await asyncio.wait_for(reader.readline(), timeout=30.0)
             
-            if data:
-                request = json.loads(data.decode('utf-8').strip())
-                tool_name = request.get("tool", request.get("method", ""))
-                arguments = request.get("arguments", request.get("params", {}))
+            if line.strip():
+                request = decode_json(line)
                 
-                if tool_name == "list_tools":
-                    response = {"success": True, "tools": TOOLS}
+                if isinstance(request, list):
+                    # Batch: run in order, one screenshot at the end
+                    response = await self.loop.run_in_executor(None, execute_batch, request)
                 else:
-                    response = execute_tool(tool_name, arguments)
+                    tool_name = request.get("tool", request.get("method", ""))
+                    arguments = request.get("arguments", request.get("params", {}))
+                    
+                    if tool_name == "list_tools":
+                        response = None
+                    else:
+                        # execute_tool blocks on the FreeCAD main thread; keep the loop free
+                        response = await self.loop.run_in_executor(None, execute_tool, tool_name, arguments)
                 
-                client.sendall((json.dumps(response) + "\n").encode('utf-8'))
+                if response is None:
+                    writer.write(_LIST_TOOLS_RESPONSE)
+                else:
+                    writer.write(encode_json_line(response))
+                await writer.drain()
         except Exception as e:
             try:
-                client.sendall((json.dumps({"success": False, "error": str(e)}) + "\n").encode('utf-8'))
+                writer.write(encode_json_line({"success": False, "error": str(e)}))
+                await writer.drain()
             except:
                 pass
         finally:
-            client.close()
+            writer.close()
     
     def stop(self):
         self.running = False
-        if self.socket:
-            self.socket.close()
+        if self.loop and self.server and not self.loop.is_closed():
+            try:
+                self.loop.call_soon_threadsafe(self.server.close)
+            except RuntimeError:
+                # Loop already shut down
+                pass
 
 
 def start(port: int = DEFAULT_PORT, use_stdio: bool = False) -> Tuple['SimpleMCPServer', threading.Thread]:
     """Start the MCP server."""
-    global _server, _bridge, _server_thread
+    global _server, _bridge, _server_thread, _scene_observer
     
     if _server is not None:
         FreeCAD.Console.PrintWarning("MCP Server already running\n")
         return _server, _server_thread
     
     _bridge = get_bridge()
+    if _scene_observer is None:
+        _scene_observer = SceneChangeObserver()
+        FreeCAD.addDocumentObserver(_scene_observer)
     _server = SimpleMCPServer(port)
     
     _server_thread = threading.Thread(target=_server.start, daemon=True)
@@ -2620,11 +4339,16 @@ def start(port: int = DEFAULT_PORT, use_stdio: bool = False) -> Tuple['SimpleMCP
 
 def stop(server=None, thread=None):
     """Stop the MCP server."""
-    global _server, _server_thread
+    global _server, _server_thread, _scene_observer
     
     if _server:
         _server.stop()
     
+    if _scene_observer is not None:
+        FreeCAD.removeDocumentObserver(_scene_observer)
+        _scene_observer = None
+    _bbox_validated.clear()
+    
     _server = None
     _server_thread = None
     reset_bridge()